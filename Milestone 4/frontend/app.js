@@ -1,11 +1,33 @@
 const API = "https://flight-booking-simulator-ig6q.onrender.com/api";
+/* ---------------- READ-YOUR-WRITES ---------------- */
+// The API stamps writes with X-Last-Write; echoing it keeps our reads off lagging replicas
+// (a cookie would not be sent cross-origin without credentials). The stamp is only echoed for
+// X-Last-Write-Max-Age seconds (the server's staleness window), timed on this browser's clock;
+// after that reads may go to replicas again and requests skip the extra header's CORS preflight.
+function currentLastWrite() {
+  const saved = JSON.parse(localStorage.getItem("lastWrite") || "null");
+  if (saved && saved.expiresAt > Date.now()) return saved.stamp;
+  localStorage.removeItem("lastWrite");
+  return null;
+}
+function apiFetch(url, options = {}) {
+  const headers = { ...(options.headers || {}) };
+  const lastWrite = currentLastWrite();
+  if (lastWrite) headers["X-Last-Write"] = lastWrite;
+  return fetch(url, { ...options, headers }).then(res => {
+    const stamp = res.headers.get("X-Last-Write");
+    const maxAge = parseFloat(res.headers.get("X-Last-Write-Max-Age")) || 5;
+    if (stamp) localStorage.setItem("lastWrite", JSON.stringify({ stamp, expiresAt: Date.now() + maxAge * 1000 }));
+    return res;
+  });
+}
 /* ---------------- FLIGHT SEARCH ---------------- */
 function searchFlights() {
   const origin = document.getElementById("origin").value;
   const destination = document.getElementById("destination").value;
   const rawDate = document.getElementById("date").value;
   const date = new Date(rawDate).toISOString().split("T")[0];
-  fetch(`${API}/flights/search?origin=${origin}&destination=${destination}&travel_date=${date}`)
+  apiFetch(`${API}/flights/search?origin=${origin}&destination=${destination}&travel_date=${date}`)
     .then(res => res.json())
     .then(data => renderFlights(data))
     .catch(err => console.error(err));
@@ -47,7 +69,7 @@ function bookFlight() {
   const flightId = localStorage.getItem("flightId");
   const name = document.getElementById("name").value;
   const seat = document.getElementById("seat").value;
-  fetch(`${API}/bookings`, {
+  apiFetch(`${API}/bookings`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
@@ -71,7 +93,7 @@ function loadReceipt() {
     alert("Invalid booking reference");
     return;
   }
-  fetch(`${API}/bookings/${pnr}`)
+  apiFetch(`${API}/bookings/${pnr}`)
     .then(res => {
       if (!res.ok) throw new Error("Booking not found");
       return res.json();
@@ -108,7 +130,7 @@ function downloadReceipt() {
 /* ---------------- CANCEL BOOKING ---------------- */
 function cancelBooking() {
   const pnr = document.getElementById("cancelPNR").value;
-  fetch(`${API}/bookings/${pnr}`, { method: "DELETE" })
+  apiFetch(`${API}/bookings/${pnr}`, { method: "DELETE" })
     .then(res => res.json())
     .then(data => {
       document.getElementById("cancelResult").innerText =
@@ -125,7 +147,7 @@ async function makePayment() {
     return;
   }
   try {
-    const res = await fetch(`${API}/bookings/${pnr}/pay`, {
+    const res = await apiFetch(`${API}/bookings/${pnr}/pay`, {
       method: "POST"
     });
     const data = await res.json();
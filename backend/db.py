@@ -1,12 +1,55 @@
+import itertools
 import os
+import time
+from typing import Optional
+from fastapi import Request,Response
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from .metrics import TimedQueuePool,instrument_engine,instrument_pool
 DATABASE_URL = os.getenv("DATABASE_URL")
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB_ENABLED", "false").lower() in ("1", "true", "yes")
+# Pool sizing per engine: size this to the threadpool concurrency the app runs
+# with, and keep pool_size + max_overflow under the server's connection limit.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds before a pooled connection is replaced; set below MySQL's wait_timeout. -1 never recycles.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# "pessimistic" pings on every checkout (one extra round trip);
+# "optimistic" skips the ping and invalidates the pool when a statement hits a dead connection
+DB_POOL_LIVENESS = os.getenv("DB_POOL_LIVENESS", "pessimistic").lower()
+if DB_POOL_LIVENESS not in ("pessimistic", "optimistic"):
+    raise ValueError(f"DB_POOL_LIVENESS must be pessimistic or optimistic, not {DB_POOL_LIVENESS!r}")
+def pool_options(
+    url: str,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    pool_timeout: float = DB_POOL_TIMEOUT,
+    pool_recycle: int = DB_POOL_RECYCLE,
+    liveness: str = DB_POOL_LIVENESS,
+    timed: bool = True,
+) -> dict:
+    """
+    create_engine keyword arguments for the configured pool. In-memory SQLite
+    keeps its default single-connection pool, which takes no sizing.
+    """
+    options = {"pool_pre_ping": liveness == "pessimistic"}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options
+    options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout, pool_recycle=pool_recycle)
+    if timed:
+        options["poolclass"] = TimedQueuePool
+    return options
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
     echo=False,
+    pool_logging_name="primary",
+    **pool_options(DATABASE_URL),
 )
+instrument_engine(engine)
+instrument_pool(engine, "primary")
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 def get_db():
@@ -15,3 +58,103 @@ def get_db():
         yield db
     finally:
         db.close()
+# Read replicas: read-only GET endpoints use these, while bookings, payments,
+# cancellations and the simulator stay on the primary. For local testing point
+# READ_REPLICA_URLS at copies of the SQLite file (cp flights.db replica.db).
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+# Bounded staleness: a client that wrote within this window reads from the primary
+REPLICA_MAX_STALENESS_SECONDS = float(os.getenv("REPLICA_MAX_STALENESS_SECONDS", "5"))
+# The last-write stamp goes out as a cookie and a header; cross-origin clients echo the header back
+LAST_WRITE_COOKIE = "fb_last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+# Seconds a client should keep echoing X-Last-Write: the staleness window, measured on the client's clock
+LAST_WRITE_MAX_AGE_HEADER = "X-Last-Write-Max-Age"
+PRIMARY_READ_HEADER = "X-Read-Primary"
+replica_engines = []
+for i, replica_url in enumerate(READ_REPLICA_URLS):
+    replica_engine = create_engine(replica_url, echo=False, pool_logging_name=f"replica{i}", **pool_options(replica_url))
+    instrument_engine(replica_engine)
+    instrument_pool(replica_engine, f"replica{i}")
+    replica_engines.append(replica_engine)
+ReplicaSessionLocals = [sessionmaker(bind=e, autoflush=False, autocommit=False) for e in replica_engines]
+_next_replica = itertools.cycle(ReplicaSessionLocals).__next__ if ReplicaSessionLocals else None
+def wrote_recently(request: Request) -> bool:
+    try:
+        last_write = float(request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE, "0"))
+    except ValueError:
+        return False
+    return time.time() - last_write < REPLICA_MAX_STALENESS_SECONDS
+def reads_primary(request: Optional[Request]) -> bool:
+    return request is not None and bool(request.headers.get(PRIMARY_READ_HEADER) or wrote_recently(request))
+def read_session_factory(request: Optional[Request] = None) -> sessionmaker:
+    """
+    Round-robin over the replicas, or the primary when none are configured,
+    the client asked for it, or the client wrote within the staleness window.
+    """
+    if _next_replica is None or reads_primary(request):
+        return SessionLocal
+    return _next_replica()
+def get_read_db(request: Request):
+    db = read_session_factory(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+def mark_write(response: Response) -> None:
+    """
+    Pin this client's reads to the primary for the staleness window.
+    """
+    stamp = f"{time.time():.3f}"
+    response.set_cookie(LAST_WRITE_COOKIE, stamp, max_age=max(1, int(REPLICA_MAX_STALENESS_SECONDS) + 1), httponly=True, samesite="lax")
+    response.headers[LAST_WRITE_HEADER] = stamp
+    response.headers[LAST_WRITE_MAX_AGE_HEADER] = f"{REPLICA_MAX_STALENESS_SECONDS:g}"
+# Async mode: search, price, booking and history endpoints use an AsyncSession
+_ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+def async_database_url(url: str) -> str:
+    """
+    Map the sync DATABASE_URL onto its async driver (pymysql -> aiomysql, sqlite -> aiosqlite).
+    """
+    parsed = make_url(url)
+    drivername = _ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+async_engine = None
+AsyncSessionLocal = None
+async_replica_engines = []
+if ASYNC_DB_ENABLED:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+    # the async engine needs its own async-adapted pool class, so checkout waits are not timed here
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False,
+        **pool_options(ASYNC_DATABASE_URL, timed=False),
+    )
+    instrument_engine(async_engine.sync_engine)
+    instrument_pool(async_engine.sync_engine, "async")
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    for i, replica_url in enumerate(READ_REPLICA_URLS):
+        async_replica_url = async_database_url(replica_url)
+        replica_engine = create_async_engine(async_replica_url, echo=False, **pool_options(async_replica_url, timed=False))
+        instrument_engine(replica_engine.sync_engine)
+        instrument_pool(replica_engine.sync_engine, f"async_replica{i}")
+        async_replica_engines.append(replica_engine)
+AsyncReplicaSessionLocals = [async_sessionmaker(bind=e, autoflush=False, expire_on_commit=False) for e in async_replica_engines]
+_next_async_replica = itertools.cycle(AsyncReplicaSessionLocals).__next__ if AsyncReplicaSessionLocals else None
+def async_read_session_factory(request: Optional[Request] = None):
+    """
+    Async twin of read_session_factory over the same READ_REPLICA_URLS.
+    """
+    if _next_async_replica is None or reads_primary(request):
+        return AsyncSessionLocal
+    return _next_async_replica()
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+async def get_async_read_db(request: Request):
+    async with async_read_session_factory(request)() as db:
+        yield db
@@ -1,7 +1,11 @@
 from datetime import datetime
-from typing import Literal,Optional
+from typing import Literal,Optional,Sequence
 import random
+import numpy as np
 DemandLevel = Literal["low", "medium", "high"]
+_PREMIUM_AIRLINES = frozenset({"AirIndia", "Vistara", "Emirates"})
+_BUDGET_AIRLINES = frozenset({"IndiGo", "SpiceJet", "AirAsia"})
+_DEMAND_FACTORS = {"low": -0.05, "medium": 0.0, "high": +0.20}
 def _seat_factor(seats_available: int, total_seats: int) -> float:
     """
     Compute price adjustment based on remaining seats.
@@ -61,11 +65,9 @@ def _tier_factor(airline_name: str) -> float:
     Budget airlines: slight discount
     Others: no change
     """
-    premium_airlines = {"AirIndia", "Vistara", "Emirates"}
-    budget_airlines = {"IndiGo", "SpiceJet", "AirAsia"}
-    if airline_name in premium_airlines:
+    if airline_name in _PREMIUM_AIRLINES:
         return +0.10
-    elif airline_name in budget_airlines:
+    elif airline_name in _BUDGET_AIRLINES:
         return -0.05
     else:
         return 0.0
@@ -91,4 +93,53 @@ def calculate_dynamic_price(
     # clamp between 60% and 220% of base_fare. dynamic price ranges from 0.6*base_fare to 2.2*base_fare
     total_factor = max(0.6, min(total_factor, 2.2))
     dynamic_price = round(base_fare * total_factor, 2)
-    return float(dynamic_price)
\ No newline at end of file
+    return float(dynamic_price)
+def calculate_dynamic_prices(
+    base_fares: Sequence[float],
+    seats_available: Sequence[int],
+    total_seats: Sequence[int],
+    departure_times: Sequence[datetime],
+    airline_names: Sequence[str],
+    demand_levels: Optional[Sequence[Optional[DemandLevel]]] = None,
+    now: Optional[datetime] = None,
+) -> np.ndarray:
+    """
+    Batch version of calculate_dynamic_price for whole result sets.
+    Takes one column per pricing input and returns a float64 array of prices,
+    evaluating every row against a single shared "now".
+    """
+    base = np.asarray(base_fares, dtype=np.float64)
+    n = base.shape[0]
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+    seats = np.asarray(seats_available, dtype=np.float64)
+    total = np.asarray(total_seats, dtype=np.float64)
+    # seat factor: same bands as _seat_factor, 0.0 when total_seats <= 0
+    ratio = np.divide(seats, total, out=np.zeros(n), where=total > 0)
+    seat_adj = np.select([total <= 0, ratio >= 0.7, ratio >= 0.4], [0.0, -0.10, 0.0], default=+0.25)
+    # time factor: hours to departure measured from one shared "now"
+    now_dt = np.datetime64(now or datetime.now(), "us")
+    departures = np.asarray(departure_times, dtype="datetime64[us]")
+    hours = (departures - now_dt) / np.timedelta64(1, "h")
+    time_adj = np.select(
+        [hours <= 0, hours <= 24, hours <= 72, hours <= 168],
+        [0.0, +0.40, +0.20, +0.10],
+        default=0.0,)
+    # demand factor: missing levels are simulated per row like _demand_factor
+    if demand_levels is None:
+        demand_levels = [None] * n
+    demand_adj = np.fromiter(
+        (
+            _DEMAND_FACTORS.get(level if level is not None else random.choice(["low", "medium", "high"]), +0.20)
+            for level in demand_levels
+        ),
+        dtype=np.float64,
+        count=n,)
+    tier_adj = np.fromiter(
+        (+0.10 if name in _PREMIUM_AIRLINES else -0.05 if name in _BUDGET_AIRLINES else 0.0 for name in airline_names),
+        dtype=np.float64,
+        count=n,)
+    total_factor = np.clip(1.0 + seat_adj + time_adj + demand_adj + tier_adj, 0.6, 2.2)
+    # builtin round() keeps the decimal rounding of the scalar path (np.round can differ by a cent)
+    prices = np.fromiter((round(p, 2) for p in (base * total_factor).tolist()), dtype=np.float64, count=n)
+    return np.where(base <= 0, base, prices)
@@ -0,0 +1,116 @@
+from datetime import date,datetime
+from typing import Dict,Iterable,List,Set,Tuple
+from sqlalchemy import delete,insert,select
+from sqlalchemy.dialects import mysql,sqlite
+from sqlalchemy.orm import Session
+from .db import SessionLocal
+from .flight_index import FLIGHT_ROW_COLUMNS,FlightRow
+from .models import Flight,RouteDayFare
+from .price_snapshots import stored_prices
+FARE_CALENDAR_MAX_DAYS = 62
+RouteDay = Tuple[str, str, date]
+def fold_min_fares(rows: List[FlightRow], cheapest: Dict[RouteDay, dict]) -> None:
+    """
+    Keep the cheapest bookable flight per (route, day) by stored price snapshot.
+    """
+    rows = [r for r in rows if r.seats_available > 0]
+    for r, price in zip(rows, stored_prices(rows, "calendar")):
+        current = cheapest.get(r.key)
+        if current is None:
+            cheapest[r.key] = {"min_price": price, "flight_id": r.id, "flights_available": 1}
+            continue
+        current["flights_available"] += 1
+        if price < current["min_price"]:
+            current["min_price"] = price
+            current["flight_id"] = r.id
+_FARE_COLUMNS = ("min_price", "flight_id", "flights_available", "updated_at")
+def upsert_fares(db: Session, values: List[dict]) -> None:
+    """
+    INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE, so two writers that both
+    create the first row for a route/day never collide on the primary key.
+    """
+    if db.get_bind().dialect.name == "mysql":
+        stmt = mysql.insert(RouteDayFare).values(values)
+        db.execute(stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in _FARE_COLUMNS}))
+        return
+    stmt = sqlite.insert(RouteDayFare).values(values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["origin", "destination", "day"],
+        set_={c: stmt.excluded[c] for c in _FARE_COLUMNS}))
+def refresh_fare_calendar(keys: Iterable[RouteDay]) -> None:
+    """
+    Refresh route_day_fares in its own short transaction once a write has
+    committed, so bookings never hold the flight row lock while the calendar
+    is recomputed. A failure here is logged rather than raised: the write it
+    follows has already committed, and the next write to the day corrects it.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    db = SessionLocal()
+    try:
+        refresh_min_fares(db, keys)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[FARE CALENDAR ERROR] refresh of {len(keys)} route/days failed: {e}")
+    finally:
+        db.close()
+def refresh_min_fares(db: Session, keys: Iterable[RouteDay]) -> None:
+    """
+    Recompute route_day_fares for the (origin, destination, day) keys a write
+    touched, inside the caller's transaction. Days left with no bookable flight
+    lose their row. One range read per route covers all of its touched days.
+    """
+    by_route: Dict[Tuple[str, str], Set[date]] = {}
+    for origin, destination, day in set(keys):
+        by_route.setdefault((origin, destination), set()).add(day)
+    if not by_route:
+        return
+    # sessions run with autoflush=False; pending seat changes must be visible to the range read
+    db.flush()
+    updated_at = datetime.utcnow()
+    for (origin, destination), days in by_route.items():
+        rows = [
+            row
+            for row in (FlightRow(*r) for r in db.execute(
+                select(*FLIGHT_ROW_COLUMNS)
+                .where(Flight.origin == origin)
+                .where(Flight.destination == destination)
+                .where(Flight.departure_time >= datetime.combine(min(days), datetime.min.time()))
+                .where(Flight.departure_time <= datetime.combine(max(days), datetime.max.time()))))
+            if row.departure_time.date() in days]
+        cheapest: Dict[RouteDay, dict] = {}
+        fold_min_fares(rows, cheapest)
+        if cheapest:
+            upsert_fares(db, [
+                {"origin": origin, "destination": destination, "day": day, "updated_at": updated_at, **fare}
+                for (_, _, day), fare in cheapest.items()])
+        emptied = days - {day for _, _, day in cheapest}
+        if emptied:
+            db.execute(
+                delete(RouteDayFare)
+                .where(RouteDayFare.origin == origin)
+                .where(RouteDayFare.destination == destination)
+                .where(RouteDayFare.day.in_(emptied)))
+def rebuild_min_fares(db: Session, batch_size: int = 1000) -> int:
+    """
+    Recompute the whole table from the flights table in streamed chunks.
+    Returns the number of (route, day) rows written; the caller commits.
+    """
+    cheapest: Dict[RouteDay, dict] = {}
+    chunk: List[FlightRow] = []
+    for r in db.execute(select(*FLIGHT_ROW_COLUMNS).execution_options(yield_per=batch_size)):
+        chunk.append(FlightRow(*r))
+        if len(chunk) >= batch_size:
+            fold_min_fares(chunk, cheapest)
+            chunk = []
+    fold_min_fares(chunk, cheapest)
+    updated_at = datetime.utcnow()
+    db.execute(delete(RouteDayFare))
+    values = [
+        {"origin": origin, "destination": destination, "day": day, "updated_at": updated_at, **fare}
+        for (origin, destination, day), fare in cheapest.items()]
+    for start in range(0, len(values), batch_size):
+        db.execute(insert(RouteDayFare), values[start:start + batch_size])
+    return len(values)
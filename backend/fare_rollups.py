@@ -0,0 +1,111 @@
+from datetime import datetime,timedelta
+from typing import Dict,List
+from sqlalchemy import func,insert,select
+from sqlalchemy.dialects import mysql,sqlite
+from sqlalchemy.orm import Session
+from .models import FareHistory,FareRollup
+ROLLUP_RESOLUTIONS: Dict[str, timedelta] = {
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+}
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    """
+    Floor a timestamp to the start of its rollup bucket.
+    """
+    if resolution == "1m":
+        return ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+def fold_sample(buckets: Dict[tuple, dict], flight_id: int, resolution: str, recorded_at: datetime, price: float, seats_available: int) -> None:
+    """
+    Add one fare sample to its bucket in buckets, in recorded order.
+    """
+    key = (flight_id, resolution, bucket_start(recorded_at, resolution))
+    bucket = buckets.get(key)
+    if bucket is None:
+        buckets[key] = {
+            "flight_id": flight_id,
+            "resolution": resolution,
+            "bucket_start": key[2],
+            "open_price": price,
+            "high_price": price,
+            "low_price": price,
+            "close_price": price,
+            "min_seats_available": seats_available,
+            "samples": 1,
+        }
+        return
+    bucket["high_price"] = max(bucket["high_price"], price)
+    bucket["low_price"] = min(bucket["low_price"], price)
+    bucket["close_price"] = price
+    bucket["min_seats_available"] = min(bucket["min_seats_available"], seats_available)
+    bucket["samples"] += 1
+def upsert_buckets(db: Session, values: List[dict]) -> None:
+    """
+    INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE that merges partial
+    buckets into stored ones in SQL, so simulators in several workers that
+    sample the same flight in the same bucket neither lose an update nor
+    collide on uq_fare_rollups_bucket. open_price stays the first one stored.
+    """
+    if db.get_bind().dialect.name == "mysql":
+        stmt = mysql.insert(FareRollup).values(values)
+        db.execute(stmt.on_duplicate_key_update({
+            "high_price": func.greatest(FareRollup.high_price, stmt.inserted.high_price),
+            "low_price": func.least(FareRollup.low_price, stmt.inserted.low_price),
+            "close_price": stmt.inserted.close_price,
+            "min_seats_available": func.least(FareRollup.min_seats_available, stmt.inserted.min_seats_available),
+            "samples": FareRollup.samples + stmt.inserted.samples,
+        }))
+        return
+    stmt = sqlite.insert(FareRollup).values(values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["flight_id", "resolution", "bucket_start"],
+        set_={
+            "high_price": func.max(FareRollup.high_price, stmt.excluded.high_price),
+            "low_price": func.min(FareRollup.low_price, stmt.excluded.low_price),
+            "close_price": stmt.excluded.close_price,
+            "min_seats_available": func.min(FareRollup.min_seats_available, stmt.excluded.min_seats_available),
+            "samples": FareRollup.samples + stmt.excluded.samples,
+        }))
+def update_rollups(db: Session, history: List[dict], batch_size: int = 1000) -> None:
+    """
+    Fold freshly inserted fare_history rows into every rollup resolution:
+    each chunk is folded into partial buckets, then merged into the stored
+    ones with a single upsert per chunk.
+    """
+    if not history:
+        return
+    for start in range(0, len(history), batch_size):
+        buckets: Dict[tuple, dict] = {}
+        for h in history[start:start + batch_size]:
+            for resolution in ROLLUP_RESOLUTIONS:
+                fold_sample(buckets, h["flight_id"], resolution, h["recorded_at"], float(h["dynamic_price"]), h["seats_available"])
+        upsert_buckets(db, list(buckets.values()))
+def backfill_rollups(db: Session, flights_per_batch: int = 200, batch_size: int = 1000) -> int:
+    """
+    Build the rollup buckets missing for existing fare_history, e.g. history
+    recorded before rollups existed or loaded out of band. Works through the
+    flights in chunks; buckets that already exist are left as they are.
+    Returns the number of buckets inserted; the caller commits.
+    """
+    flight_ids = list(db.scalars(select(FareHistory.flight_id).where(FareHistory.flight_id.is_not(None)).distinct().order_by(FareHistory.flight_id)))
+    total = 0
+    for start in range(0, len(flight_ids), flights_per_batch):
+        chunk = flight_ids[start:start + flights_per_batch]
+        buckets: Dict[tuple, dict] = {}
+        for h in db.execute(
+                select(FareHistory.flight_id, FareHistory.recorded_at, FareHistory.dynamic_price, FareHistory.seats_available)
+                .where(FareHistory.flight_id.in_(chunk))
+                .where(FareHistory.recorded_at.is_not(None))
+                .order_by(FareHistory.flight_id, FareHistory.recorded_at, FareHistory.id)):
+            for resolution in ROLLUP_RESOLUTIONS:
+                fold_sample(buckets, h.flight_id, resolution, h.recorded_at, float(h.dynamic_price), h.seats_available)
+        existing = {
+            tuple(r)
+            for r in db.execute(
+                select(FareRollup.flight_id, FareRollup.resolution, FareRollup.bucket_start)
+                .where(FareRollup.flight_id.in_(chunk)))}
+        inserts = [bucket for key, bucket in buckets.items() if key not in existing]
+        for i in range(0, len(inserts), batch_size):
+            db.execute(insert(FareRollup), inserts[i:i + batch_size])
+        total += len(inserts)
+    return total
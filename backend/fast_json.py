@@ -0,0 +1,18 @@
+import os
+import orjson
+from fastapi.responses import Response
+# Search and price endpoints build plain dicts from SQL rows and encode them
+# here, skipping the Pydantic model + response_model re-validation round trip
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_ENABLED", "true").lower() in ("1", "true", "yes")
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+class FastJSONResponse(Response):
+    """
+    application/json response encoded with orjson. Content is trusted as-is;
+    pre-encoded bytes (e.g. from the search cache) are sent untouched.
+    """
+    media_type = "application/json"
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content)
@@ -0,0 +1,138 @@
+import os
+import threading
+from datetime import date,datetime
+from decimal import Decimal
+from typing import Dict,Iterable,List,NamedTuple,Optional,Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .models import Flight
+# The index only sees the writes of its own process (bookings, cancels, its
+# simulator ticks); other uvicorn workers' writes never reach it, so it is
+# refused when WEB_CONCURRENCY runs more than one worker. It is also served
+# from memory, bypassing read-replica routing: it reflects this process's
+# committed writes to the primary plus schedule ingests picked up by generation.
+FLIGHT_INDEX_REQUESTED = os.getenv("FLIGHT_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+FLIGHT_INDEX_ENABLED = FLIGHT_INDEX_REQUESTED and WEB_CONCURRENCY <= 1
+RouteDayKey = Tuple[str, str, date]
+class FlightRow(NamedTuple):
+    """
+    Detached copy of the Flight columns search and pricing need.
+    Attribute names match the ORM model so callers can use either.
+    priced_at orders snapshots of the same flight: every writer stamps it
+    while holding the row, so a later stamp is a later commit.
+    """
+    id: int
+    flight_no: str
+    airline_name: str
+    origin: str
+    destination: str
+    departure_time: datetime
+    arrival_time: datetime
+    duration_minutes: int
+    base_fare: Decimal
+    total_seats: int
+    seats_available: int
+    current_price: Optional[Decimal] = None
+    priced_at: Optional[datetime] = None
+    @classmethod
+    def from_flight(cls, f: Flight) -> "FlightRow":
+        return cls(
+            id=f.id,
+            flight_no=f.flight_no,
+            airline_name=f.airline_name,
+            origin=f.origin,
+            destination=f.destination,
+            departure_time=f.departure_time,
+            arrival_time=f.arrival_time,
+            duration_minutes=f.duration_minutes,
+            base_fare=f.base_fare,
+            total_seats=f.total_seats,
+            seats_available=f.seats_available,
+            current_price=f.current_price,
+            priced_at=f.priced_at,)
+    @property
+    def key(self) -> RouteDayKey:
+        return (self.origin, self.destination, self.departure_time.date())
+def is_older(row: FlightRow, current: Optional[FlightRow]) -> bool:
+    """
+    True when row is an older snapshot than current, e.g. from a writer that
+    committed first but applied later; unpriced rows count as oldest.
+    """
+    return current is not None and (row.priced_at or datetime.min) < (current.priced_at or datetime.min)
+# Column list for selecting FlightRow-shaped tuples without hydrating Flight objects
+FLIGHT_ROW_COLUMNS = [getattr(Flight, name) for name in FlightRow._fields]
+class FlightIndex:
+    """
+    In-process index of flights keyed by (origin, destination, service day).
+    Writers snapshot the rows they touch before commit and apply them after,
+    so the index never shows uncommitted seat counts.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._by_key: Dict[RouteDayKey, Dict[int, FlightRow]] = {}
+        self._rows: Dict[int, FlightRow] = {}
+    def rebuild(self, db: Session) -> int:
+        """
+        Bulk load every flight row, replacing the current contents.
+        """
+        by_key: Dict[RouteDayKey, Dict[int, FlightRow]] = {}
+        rows: Dict[int, FlightRow] = {}
+        for f in db.scalars(select(Flight)):
+            row = FlightRow.from_flight(f)
+            rows[row.id] = row
+            by_key.setdefault(row.key, {})[row.id] = row
+        with self._lock:
+            self._by_key = by_key
+            self._rows = rows
+        return len(rows)
+    def search(self, origin: str, destination: str, day: date) -> List[FlightRow]:
+        with self._lock:
+            return list(self._by_key.get((origin, destination, day), {}).values())
+    def snapshot(self, flights: Iterable[Flight]) -> List[FlightRow]:
+        """
+        Copy flight rows before commit (also fed to the route graph, so this
+        runs even when the index itself is disabled).
+        """
+        return [FlightRow.from_flight(f) for f in flights]
+    def apply(self, rows: Iterable[FlightRow]) -> None:
+        """
+        Write committed rows through to the index, skipping any older than
+        the row already held.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            for row in rows:
+                old = self._rows.get(row.id)
+                if is_older(row, old):
+                    continue
+                if old is not None and old.key != row.key:
+                    bucket = self._by_key.get(old.key, {})
+                    bucket.pop(row.id, None)
+                    if not bucket:
+                        self._by_key.pop(old.key, None)
+                self._rows[row.id] = row
+                self._by_key.setdefault(row.key, {})[row.id] = row
+    def diff(self, db: Session) -> dict:
+        """
+        Compare the index against the flights table.
+        """
+        table = {f.id: FlightRow.from_flight(f) for f in db.scalars(select(Flight))}
+        with self._lock:
+            indexed = dict(self._rows)
+        missing = sorted(set(table) - set(indexed))
+        extra = sorted(set(indexed) - set(table))
+        # priced_at may be stored with less precision than the writer's stamp, so it is not compared
+        stale = sorted(fid for fid in set(table) & set(indexed) if table[fid]._replace(priced_at=None) != indexed[fid]._replace(priced_at=None))
+        return {
+            "enabled": self.enabled,
+            "indexed_rows": len(indexed),
+            "table_rows": len(table),
+            "consistent": not (missing or extra or stale),
+            "missing": missing,
+            "extra": extra,
+            "stale": stale,
+        }
+flight_index = FlightIndex(enabled=FLIGHT_INDEX_ENABLED)
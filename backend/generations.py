@@ -0,0 +1,17 @@
+"""
+Generation counters for data written outside the API process. The schedule
+ingest CLI bumps the "flights" generation in the transaction that writes the
+flights; each API process compares it on every simulator tick and rebuilds its
+flight index, route graph and search cache when another process moved it.
+"""
+from sqlalchemy import select,update
+from sqlalchemy.orm import Session
+from .models import DataGeneration
+FLIGHTS_GENERATION = "flights"
+def bump_generation(db: Session, name: str = FLIGHTS_GENERATION) -> None:
+    """
+    Increment in the caller's transaction; the caller commits.
+    """
+    db.execute(update(DataGeneration).where(DataGeneration.name == name).values(generation=DataGeneration.generation + 1))
+def read_generation(db: Session, name: str = FLIGHTS_GENERATION) -> int:
+    return db.scalar(select(DataGeneration.generation).where(DataGeneration.name == name)) or 0
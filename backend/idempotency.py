@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime,timedelta
+from typing import NamedTuple,Optional,Tuple
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import delete,select
+from sqlalchemy.orm import Session
+from .models import IdempotencyRecord
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# Expired rows are deleted alongside every Nth recorded response
+IDEMPOTENCY_PURGE_EVERY = 1000
+class StoredResponse(NamedTuple):
+    scope: str
+    key: str
+    fingerprint: str
+    status_code: int
+    body: str
+    expires_at: datetime
+def fingerprint(payload) -> str:
+    """
+    Stable hash of a request payload, so a key reused with a different body is caught.
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+def replay_response(entry: StoredResponse) -> Response:
+    return Response(
+        content=entry.body,
+        status_code=entry.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},)
+class IdempotencyStore:
+    """
+    Completed responses by (scope, Idempotency-Key). The idempotency_keys table
+    is the source of truth: the row is written in the same transaction as the
+    booking or payment it describes, so a retry either sees the stored response
+    or collides on the primary key. A bounded LRU in front of it answers hot
+    retries without a query.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], StoredResponse]" = OrderedDict()
+        self._recorded = 0
+        self.hits = 0
+        self.misses = 0
+    def lookup(self, db: Session, scope: str, key: str, request_fingerprint: str) -> Optional[StoredResponse]:
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[(scope, key)]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end((scope, key))
+        if entry is None:
+            row = db.scalar(
+                select(IdempotencyRecord)
+                .where(IdempotencyRecord.scope == scope)
+                .where(IdempotencyRecord.key == key)
+                .where(IdempotencyRecord.expires_at > now))
+            if row is not None:
+                entry = StoredResponse(row.scope, row.key, row.fingerprint, row.status_code, row.body, row.expires_at)
+                self.remember(entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        if entry.fingerprint != request_fingerprint:
+            raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used with a different request")
+        return entry
+    def record(self, db: Session, scope: str, key: str, request_fingerprint: str, status_code: int, body: str) -> StoredResponse:
+        """
+        Stage the response row in the caller's transaction; call remember()
+        once it has committed. An expired row for the same key, not yet
+        purged, is replaced rather than colliding on the primary key.
+        """
+        now = datetime.utcnow()
+        entry = StoredResponse(scope, key, request_fingerprint, status_code, body, now + timedelta(seconds=self.ttl_seconds))
+        db.execute(
+            delete(IdempotencyRecord)
+            .where(IdempotencyRecord.scope == scope)
+            .where(IdempotencyRecord.key == key)
+            .where(IdempotencyRecord.expires_at <= now))
+        db.add(IdempotencyRecord(**entry._asdict(), created_at=now))
+        self._recorded += 1
+        if self._recorded % IDEMPOTENCY_PURGE_EVERY == 0:
+            db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= now))
+        return entry
+    def discard(self, db: Session, scope: str, key: str) -> None:
+        """
+        Delete a stored response whose outcome was undone; the caller commits.
+        """
+        db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.scope == scope).where(IdempotencyRecord.key == key))
+        with self._lock:
+            self._entries.pop((scope, key), None)
+    def remember(self, entry: StoredResponse) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(entry.scope, entry.key)] = entry
+            self._entries.move_to_end((entry.scope, entry.key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+idempotency_store = IdempotencyStore(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL_SECONDS)
@@ -1,24 +1,91 @@
-from datetime import datetime,date
-from typing import List,Literal
-from fastapi import FastAPI,Depends,HTTPException,Query
-from sqlalchemy import select,asc,desc
+from datetime import datetime,date,timedelta
+from typing import List,Literal,Optional,Union
+from fastapi import FastAPI,APIRouter,Depends,Header,HTTPException,Query,Request
+from sqlalchemy import select,update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .db import get_db
-from .models import Flight,FareHistory,Booking
-from .schemas import FlightOut,FlightWithPriceOut,FareHistoryOut,BookingRequest,BookingResponse
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import get_db,get_read_db,get_async_db,get_async_read_db,mark_write,replica_engines,LAST_WRITE_HEADER,LAST_WRITE_MAX_AGE_HEADER,ASYNC_DB_ENABLED,DB_POOL_SIZE,DB_MAX_OVERFLOW,DB_POOL_TIMEOUT,DB_POOL_RECYCLE,DB_POOL_LIVENESS
+from .models import Flight,FareHistory,FareRollup,RouteDayFare,Booking
+from .schemas import FlightOut,FlightWithPriceOut,ItineraryOut,FareHistoryOut,FareRollupOut,FareCalendarDayOut,QuoteOut,SeatMapOut,BookingRequest,BookingResponse,GroupBookingRequest
 from .dynamic_pricing import calculate_dynamic_price
 import asyncio
+import os
+from contextlib import asynccontextmanager
 import random
+import time
 from .db import SessionLocal
-from .utils import generate_pnr
+from .utils import generate_pnr,generate_pnr_async
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse,PlainTextResponse,Response,StreamingResponse
 from .db import engine
-from .models import Base
-Base.metadata.create_all(bind=engine)
+from .migrate import migrate
+from .flight_index import FLIGHT_INDEX_REQUESTED,FLIGHT_ROW_COLUMNS,WEB_CONCURRENCY,FlightRow,flight_index
+from .quotes import quote_store
+from .seat_map import seat_inventory
+from .payments import PAYMENT_QUEUE_ENABLED,PAYMENT_MAX_WAIT_SECONDS,PAYMENT_RETRY_AFTER_SECONDS,PAYABLE_STATUSES,UNSETTLED_STATUSES,PENDING as PAYMENT_PENDING,lease_expiry,payment_queue
+from .idempotency import IDEMPOTENCY_HEADER,fingerprint,idempotency_store,replay_response
+from .price_snapshots import stored_prices,reprice_flights,backfill_prices
+from .schedule_ingest import stream_mock_schedule
+from .fare_calendar import FARE_CALENDAR_MAX_DAYS,refresh_fare_calendar,rebuild_min_fares
+from .route_graph import ROUTE_GRAPH_ENABLED,MIN_LAYOVER_MINUTES,MAX_LAYOVER_MINUTES,MAX_ITINERARIES,as_leg,route_graph
+from .fast_json import FAST_JSON_ENABLED,FastJSONResponse,dumps as fast_dumps
+from .search_cache import search_cache,route_days
+from .simulator import scheduler_loop,shutdown_shard_pool,simulator_stats,sync_read_models
+from .metrics import PROMETHEUS_CONTENT_TYPE,pool_stats,render_metrics,start_request_db_stats,timed_pricing,http_requests_total,http_request_duration,http_request_db_queries,http_request_db_duration
+from .pagination import NDJSON_MEDIA_TYPE,NEXT_CURSOR_HEADER,MAX_PAGE_SIZE,encode_cursor,keyset_query,wants_ndjson,stream_ndjson,astream_ndjson
+# "lock": SELECT ... FOR UPDATE then decrement; "atomic": single conditional UPDATE
+BOOKING_STRATEGY = os.getenv("BOOKING_STRATEGY", "lock")
+HISTORY_DEFAULT_LIMIT = 500
+# Schema changes run once via "python -m backend.migrate"; set this to migrate on startup instead
+SCHEMA_AUTO_MIGRATE = os.getenv("SCHEMA_AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+# Warm-up preloads the route graph, the default searches and pool connections before the app reports ready
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "false").lower() in ("1", "true", "yes")
+STARTUP_WARMUP_DAYS = int(os.getenv("STARTUP_WARMUP_DAYS", "2"))
+startup_stats = {"ready": False, "seconds": None, "steps": {}}
+def run_startup_step(name: str, step) -> None:
+    started = time.perf_counter()
+    step()
+    elapsed = time.perf_counter() - started
+    startup_stats["steps"][name] = round(elapsed, 3)
+    print(f"[STARTUP] {name} took {elapsed * 1000:.0f} ms")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+#      Price snapshots come before the flight index so the index loads current prices.
+    started = time.perf_counter()
+    steps = [("migrate", migrate)] if SCHEMA_AUTO_MIGRATE else []
+    steps += [
+        ("data generation", sync_read_models),
+        ("price snapshots", build_price_snapshots),
+        ("flight index", build_flight_index),
+        ("fare calendar", build_fare_calendar),
+        ("route graph", build_route_graph),
+        ("payment queue", start_payment_queue),]
+    if STARTUP_WARMUP:
+        steps += [
+            ("warm route graph", lambda: build_route_graph(warm=True)),
+            ("warm search cache", warm_search_cache),
+            ("warm connection pools", warm_connection_pools),]
+    for name, step in steps:
+        run_startup_step(name, step)
+    simulator_task = asyncio.create_task(scheduler_loop())
+    startup_stats["seconds"] = round(time.perf_counter() - started, 3)
+    startup_stats["ready"] = True
+    print(f"[STARTUP] ready in {startup_stats['seconds'] * 1000:.0f} ms")
+    try:
+        yield
+    finally:
+        startup_stats["ready"] = False
+        simulator_task.cancel()
+        stop_payment_queue()
+        shutdown_shard_pool()
 app = FastAPI(
     title="Flight Booking Simulator",
     description="Core flight search & data management APIs",
     version="1.0.0",
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -26,7 +93,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LAST_WRITE_HEADER, LAST_WRITE_MAX_AGE_HEADER],
 )
+#     Per-route latency, status and database usage for /metrics
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    db_stats = start_request_db_stats()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        http_request_duration.observe(time.perf_counter() - started, method=request.method, route=route_path)
+        http_requests_total.inc(method=request.method, route=route_path, status=status)
+        http_request_db_queries.observe(db_stats["queries"], route=route_path)
+        http_request_db_duration.observe(db_stats["seconds"], route=route_path)
+#     Read-your-writes: after a successful write this client reads from the primary for a while
+@app.middleware("http")
+async def pin_reads_after_write(request: Request, call_next):
+    response = await call_next(request)
+    if replica_engines and request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        mark_write(response)
+    return response
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
 #     Health check
 @app.get("/api/health")
 def health_check():
@@ -34,25 +129,47 @@ def health_check():
         "status": "ok",
         "message": "Backend running",
         "server_time": datetime.utcnow().isoformat() + "Z",
+        "search_cache": search_cache.stats(),
+        "startup": startup_stats,
+        "simulator": simulator_stats,
+        "quotes": quote_store.stats(),
+        "seat_maps": seat_inventory.stats(),
+        "idempotency": idempotency_store.stats(),
+        "payments": payment_queue.stats(),
+        "read_replicas": len(replica_engines),
     }
-#     Retrieve ALL flights (with sorting)
+#     Retrieve ALL flights (with sorting, keyset pagination and NDJSON streaming)
 @app.get("/api/flights", response_model=List[FlightOut])
 def get_all_flights(
+    request: Request,
+    response: Response,
     sort_by: Literal["price", "duration"] = Query("price"),
     sort_order: Literal["asc", "desc"] = Query("asc"),
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; next page cursor is sent in X-Next-Cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    db: Session = Depends(get_read_db),
 ):
-    query = select(Flight)
     if sort_by == "price":
         order_column = Flight.base_fare
     else:
         order_column = Flight.duration_minutes
-    if sort_order == "asc":
-        query = query.order_by(asc(order_column))
-    else:
-        query = query.order_by(desc(order_column))
-    flights = db.scalars(query).all()
-    return flights
+    query = keyset_query(select(Flight), order_column, Flight.id, sort_order == "desc", cursor)
+    if wants_ndjson(request):
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(stream_ndjson(query, FlightOut, db.get_bind()), media_type=NDJSON_MEDIA_TYPE)
+    if limit is None:
+        return db.scalars(query).all()
+    flights = db.scalars(query.limit(limit + 1)).all()
+    return keyset_page(flights, limit, order_column.key, response)
+#     Trim a limit+1 fetch to one page and advertise the next cursor
+def keyset_page(rows, limit: int, sort_attr: str, response: Response):
+    if len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_attr), last.id)
+    return rows
 #      Search by origin, destination, date
 @app.get("/api/flights/search", response_model=List[FlightWithPriceOut])
 def search_flights(
@@ -61,27 +178,36 @@ def search_flights(
     travel_date: date = Query(..., description="Travel date in YYYY-MM-DD"),
     sort_by: Literal["price", "duration"] = Query("price"),
     sort_order: Literal["asc", "desc"] = Query("asc"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     ):
+    origin_norm, dest_norm = normalize_route(origin, destination)
+    cache_key = (origin_norm, dest_norm, travel_date, sort_by, sort_order)
+    cached_body = search_cache.get(cache_key)
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
+    generation = search_cache.generation(cache_key)
+    if flight_index.enabled:
+        flights = flight_index.search(origin_norm, dest_norm, travel_date)
+    else:
+        flights = db.execute(route_day_query(origin_norm, dest_norm, travel_date)).all()
+    return search_response(flights, cache_key, generation)
+#      Shared search helpers (used by the sync and async endpoints)
+def normalize_route(origin: str, destination: str):
     origin_norm = origin.strip().title()
     dest_norm = destination.strip().title()
     if origin_norm == dest_norm:
         raise HTTPException(status_code=400, detail="Origin and destination must be different")
+    return origin_norm, dest_norm
+def route_day_query(origin: str, destination: str, travel_date: date):
     start_dt = datetime.combine(travel_date, datetime.min.time())
     end_dt = datetime.combine(travel_date, datetime.max.time())
-    query = (select(Flight).where(Flight.origin == origin_norm).where(Flight.destination == dest_norm).where(Flight.departure_time >= start_dt).where(Flight.departure_time <= end_dt))
-    flights = db.scalars(query).all()
-    if not flights:
-        raise HTTPException(status_code=404,detail=f"No flights found from {origin_norm} to {dest_norm} on {travel_date}",)
+    return (select(*FLIGHT_ROW_COLUMNS).where(Flight.origin == origin).where(Flight.destination == destination).where(Flight.departure_time >= start_dt).where(Flight.departure_time <= end_dt))
+def batch_prices(flights, path: str) -> List[float]:
+#      Reads serve the stored price snapshot; only never-priced rows are computed here.
+    return stored_prices(flights, path)
+def price_flights(flights, path: str = "search") -> List[FlightWithPriceOut]:
     result_with_prices: List[FlightWithPriceOut] = []
-    for f in flights:
-        dyn_price = calculate_dynamic_price(
-            base_fare=float(f.base_fare),
-            seats_available=f.seats_available,
-            total_seats=f.total_seats,
-            departure_time=f.departure_time,
-            airline_name=f.airline_name,
-            demand_level=getattr(f, "demand_level", None),)
+    for f, dyn_price in zip(flights, batch_prices(flights, path)):
         result_with_prices.append(
             FlightWithPriceOut(
                 id=f.id,
@@ -96,15 +222,140 @@ def search_flights(
                 total_seats=f.total_seats,
                 seats_available=f.seats_available,
                 dynamic_price=dyn_price,))
+    return result_with_prices
+def priced_rows(flights, path: str = "search") -> List[dict]:
+#      Fast path: FlightWithPriceOut-shaped dicts (same keys and order) straight from row tuples.
+    return [
+        {
+            "id": f.id,
+            "flight_no": f.flight_no,
+            "airline_name": f.airline_name,
+            "origin": f.origin,
+            "destination": f.destination,
+            "departure_time": f.departure_time,
+            "arrival_time": f.arrival_time,
+            "duration_minutes": f.duration_minutes,
+            "base_fare": float(f.base_fare),
+            "total_seats": f.total_seats,
+            "seats_available": f.seats_available,
+            "dynamic_price": dyn_price,
+        }
+        for f, dyn_price in zip(flights, batch_prices(flights, path))]
+def search_response(flights, cache_key, generation):
+#      generation is search_cache.generation(cache_key) taken before the flights were read.
+    origin_norm, dest_norm, travel_date, sort_by, sort_order = cache_key
+    if not flights:
+        raise HTTPException(status_code=404,detail=f"No flights found from {origin_norm} to {dest_norm} on {travel_date}",)
+    if FAST_JSON_ENABLED:
+        rows = priced_rows(flights)
+        sort_key = "dynamic_price" if sort_by == "price" else "duration_minutes"
+        rows.sort(key=lambda x: x[sort_key], reverse=sort_order == "desc")
+        body = fast_dumps(rows)
+        search_cache.put(cache_key, body, generation)
+        return FastJSONResponse(body)
+    result_with_prices = price_flights(flights)
     reverse = sort_order == "desc"
     if sort_by == "price":
         result_with_prices.sort(key=lambda x: x.dynamic_price, reverse=reverse)
     else:
         result_with_prices.sort(key=lambda x: x.duration_minutes, reverse=reverse)
-    return result_with_prices
+    if not search_cache.enabled:
+        return result_with_prices
+    body = JSONResponse(content=jsonable_encoder(result_with_prices)).body
+    search_cache.put(cache_key, body, generation)
+    return Response(content=body, media_type="application/json")
+#      Connecting flights: one- and two-stop itineraries over the route graph
+@app.get("/api/flights/connections", response_model=List[ItineraryOut])
+def search_connections(
+    origin: str = Query(..., description="Origin city (e.g., Mumbai)"),
+    destination: str = Query(..., description="Destination city (e.g., Delhi)"),
+    travel_date: date = Query(..., description="Departure date of the first leg in YYYY-MM-DD"),
+    max_stops: int = Query(1, ge=0, le=2),
+    min_layover_minutes: int = Query(MIN_LAYOVER_MINUTES, ge=0),
+    max_layover_minutes: int = Query(MAX_LAYOVER_MINUTES, ge=0),
+    sort_by: Literal["price", "duration"] = Query("price"),
+    limit: int = Query(50, ge=1, le=MAX_ITINERARIES),
+    db: Session = Depends(get_read_db),
+    ):
+    origin_norm, dest_norm = normalize_route(origin, destination)
+    if min_layover_minutes > max_layover_minutes:
+        raise HTTPException(status_code=400, detail="min_layover_minutes must not exceed max_layover_minutes")
+    if not route_graph.built:
+        route_graph.rebuild(db)
+    paths = route_graph.itineraries(
+        origin_norm,
+        dest_norm,
+        travel_date,
+        max_stops,
+        timedelta(minutes=min_layover_minutes),
+        timedelta(minutes=max_layover_minutes),)
+    paths = bookable_paths(db, paths)
+    if not paths:
+        raise HTTPException(status_code=404,detail=f"No itineraries found from {origin_norm} to {dest_norm} on {travel_date}",)
+    itineraries = price_itineraries(paths)
+    sort_key = "total_price" if sort_by == "price" else "total_duration_minutes"
+    itineraries.sort(key=lambda x: (x[sort_key], x["stops"]))
+    itineraries = itineraries[:limit]
+    if FAST_JSON_ENABLED:
+        return FastJSONResponse(fast_dumps(itineraries))
+    return itineraries
+def bookable_paths(db: Session, paths) -> List[List[FlightRow]]:
+#      The graph only knows routes and times: re-read every distinct leg in one query, then drop
+#      paths with a sold-out leg or one rescheduled since the graph last saw it.
+    ids = {leg.id for path in paths for leg in path}
+    if not ids:
+        return []
+    rows = {row.id: row for row in (FlightRow(*r) for r in db.execute(select(*FLIGHT_ROW_COLUMNS).where(Flight.id.in_(ids))))}
+    bookable = []
+    for path in paths:
+        current = [rows.get(leg.id) for leg in path]
+        if all(row is not None and row.seats_available > 0 and as_leg(row) == leg for row, leg in zip(current, path)):
+            bookable.append(current)
+    return bookable
+def price_itineraries(paths) -> List[dict]:
+#      Price each distinct leg once in a single batch; an itinerary costs the sum of its legs.
+    legs = list({f.id: f for path in paths for f in path}.values())
+    priced = {row["id"]: row for row in priced_rows(legs, "connections")}
+    return [
+        {
+            "legs": [priced[f.id] for f in path],
+            "stops": len(path) - 1,
+            "layover_minutes": [int((nxt.departure_time - prev.arrival_time).total_seconds() // 60) for prev, nxt in zip(path, path[1:])],
+            "departure_time": path[0].departure_time,
+            "arrival_time": path[-1].arrival_time,
+            "total_duration_minutes": int((path[-1].arrival_time - path[0].departure_time).total_seconds() // 60),
+            "total_price": round(sum(priced[f.id]["dynamic_price"] for f in path), 2),
+        }
+        for path in paths]
+#      Fare calendar: cheapest bookable fare per day for a route, from route_day_fares
+@app.get("/api/flights/calendar", response_model=List[FareCalendarDayOut])
+def get_fare_calendar(
+    origin: str = Query(..., description="Origin city (e.g., Mumbai)"),
+    destination: str = Query(..., description="Destination city (e.g., Delhi)"),
+    start_date: date = Query(..., description="First day of the window in YYYY-MM-DD"),
+    days: int = Query(7, ge=1, le=FARE_CALENDAR_MAX_DAYS),
+    db: Session = Depends(get_read_db),
+    ):
+    origin_norm, dest_norm = normalize_route(origin, destination)
+    return db.scalars(
+        select(RouteDayFare)
+        .where(RouteDayFare.origin == origin_norm)
+        .where(RouteDayFare.destination == dest_norm)
+        .where(RouteDayFare.day >= start_date)
+        .where(RouteDayFare.day < start_date + timedelta(days=days))
+        .order_by(RouteDayFare.day)).all()
 #     Simulated external airline schedule API
 @app.get("/api/external/mock-schedule")
-def mock_airline_schedule():
+def mock_airline_schedule(
+    request: Request,
+    count: Optional[int] = Query(None, ge=1, le=1_000_000, description="Stream this many generated flights (local stand-in for a large feed)"),
+):
+    if count:
+        ndjson = wants_ndjson(request)
+        start = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+        return StreamingResponse(
+            stream_mock_schedule(count, ndjson, "Arun", start),
+            media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json",)
     return {
         "provider": "Arun",
         "generated_at": datetime.utcnow().isoformat() + "Z",
@@ -137,63 +388,146 @@ def mock_airline_schedule():
 @app.get("/api/flights/{flight_id}/price", response_model=FlightWithPriceOut)
 def get_dynamic_price_for_flight(
     flight_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    f = db.get(Flight, flight_id)
+    f = db.execute(flight_row_query(flight_id)).first()
+    return flight_price_response(f, flight_id)
+def flight_row_query(flight_id: int):
+    return select(*FLIGHT_ROW_COLUMNS).where(Flight.id == flight_id)
+def flight_price_response(f, flight_id: int):
+    if not f:
+        raise HTTPException(status_code=404, detail=f"Flight with ID {flight_id} not found")
+    if FAST_JSON_ENABLED:
+        return FastJSONResponse(priced_rows([f], "price")[0])
+    return price_flights([f], "price")[0]
+#        Seat map: layout plus a bitmap of taken seats in one small payload
+#        seats_free is what can still be sold: the bitmap also misses seats held by bookings from before
+#        seat maps and seats the simulator took off sale, so the flights counter caps it.
+@app.get("/api/flights/{flight_id}/seats", response_model=SeatMapOut)
+def get_seat_map(flight_id: int, db: Session = Depends(get_read_db)):
+    flight = db.get(Flight, flight_id)
+    if not flight:
+        raise HTTPException(status_code=404, detail=f"Flight with ID {flight_id} not found")
+    state = seat_inventory.get(db, flight)
+    return SeatMapOut(
+        flight_id=state.flight_id,
+        seat_letters=state.seat_letters,
+        rows=state.rows,
+        business_rows=state.business_rows,
+        total_seats=state.total_seats,
+        seats_free=min(state.seats_free, flight.seats_available),
+        occupied=state.encoded(),)
+#        Price quote: a short-lived price that create_booking honours in any API process
+@app.post("/api/flights/{flight_id}/quote", response_model=QuoteOut)
+def create_price_quote(flight_id: int, db: Session = Depends(get_db)):
+    f = db.execute(flight_row_query(flight_id)).first()
     if not f:
         raise HTTPException(status_code=404, detail=f"Flight with ID {flight_id} not found")
-    dyn_price = calculate_dynamic_price(
-        base_fare=float(f.base_fare),
-        seats_available=f.seats_available,
-        total_seats=f.total_seats,
-        departure_time=f.departure_time,
-        airline_name=f.airline_name,
-        demand_level=getattr(f, "demand_level", None),)
-    return FlightWithPriceOut(
-        id=f.id,
-        flight_no=f.flight_no,
-        airline_name=f.airline_name,
-        origin=f.origin,
-        destination=f.destination,
-        departure_time=f.departure_time,
-        arrival_time=f.arrival_time,
-        duration_minutes=f.duration_minutes,
-        base_fare=float(f.base_fare),
-        total_seats=f.total_seats,
-        seats_available=f.seats_available,
-        dynamic_price=dyn_price,)
-#        Fare History Endpoint
-@app.get("/api/flights/{flight_id}/history", response_model=list[FareHistoryOut])
-def get_fare_history(flight_id: int, db: Session = Depends(get_db)):
-    history = (db.query(FareHistory).filter(FareHistory.flight_id == flight_id).order_by(FareHistory.recorded_at.desc()).all())
-    if not history:
+    if f.seats_available <= 0:
+        raise HTTPException(status_code=400, detail="No seats available")
+    quote = quote_store.issue(db, flight_id, stored_prices([f], "quote")[0])
+    response = QuoteOut(token=quote.token, flight_id=flight_id, price=quote.price, expires_at=quote.expires_at)
+    db.commit()
+    return response
+#        Fare History Endpoint (raw rows or 1m/1h rollups, newest first)
+@app.get("/api/flights/{flight_id}/history", response_model=Union[list[FareHistoryOut], list[FareRollupOut]])
+def get_fare_history(
+    flight_id: int,
+    response: Response,
+    from_: Optional[datetime] = Query(None, alias="from", description="Earliest recorded_at / bucket start (inclusive)"),
+    to: Optional[datetime] = Query(None, description="Latest recorded_at / bucket start (inclusive)"),
+    resolution: Literal["raw", "1m", "1h"] = Query("raw"),
+    limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    db: Session = Depends(get_read_db),
+):
+    query, sort_attr = fare_history_query(flight_id, from_, to, resolution, cursor)
+    history = db.scalars(query.limit(limit + 1)).all()
+    if not history and cursor is None:
         raise HTTPException(status_code=404, detail="No fare history recorded for this flight.")
-    return history
+    return keyset_page(history, limit, sort_attr, response)
+#        Flight Index Consistency Check
+@app.get("/api/admin/flight-index/check")
+def check_flight_index(db: Session = Depends(get_db)):
+    if not flight_index.enabled:
+        raise HTTPException(status_code=404, detail="Flight index is disabled (set FLIGHT_INDEX_ENABLED=true with a single worker)")
+    return flight_index.diff(db)
+#        Connection pool occupancy per engine (histograms and counters are on /metrics)
+@app.get("/api/admin/db-pool")
+def get_db_pool_stats():
+    return {
+        "settings": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "liveness": DB_POOL_LIVENESS,
+        },
+        "pools": pool_stats(),
+    }
+def fare_history_query(flight_id: int, start: Optional[datetime], end: Optional[datetime], resolution: str, cursor: Optional[str]):
+#      Raw rows come from fare_history, everything else from the matching fare_rollups bucket size.
+    if resolution == "raw":
+        model, time_column = FareHistory, FareHistory.recorded_at
+        query = select(FareHistory).where(FareHistory.flight_id == flight_id)
+    else:
+        model, time_column = FareRollup, FareRollup.bucket_start
+        query = select(FareRollup).where(FareRollup.flight_id == flight_id).where(FareRollup.resolution == resolution)
+    if start is not None:
+        query = query.where(time_column >= start)
+    if end is not None:
+        query = query.where(time_column <= end)
+    return keyset_query(query, time_column, model.id, True, cursor), time_column.key
+#        Commit flight writes and push them to the search index/cache
+def commit_flight_changes(db: Session, flights, refresh_calendar=refresh_fare_calendar):
+    reprice_flights(flights)
+    index_rows = flight_index.snapshot(flights)
+    touched = route_days(flights)
+    db.commit()
+    refresh_calendar(touched)
+    flight_index.apply(index_rows)
+    search_cache.invalidate(touched)
 #        Booking Endpoint (Concurrency Safety)    
 @app.post("/api/bookings", response_model=BookingResponse)
-def create_booking(request: BookingRequest, db: Session = Depends(get_db)):
+def create_booking(
+    request: BookingRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=128),
+    ):
+    if idempotency_key is None:
+        return book_seat(db, request, BOOKING_STRATEGY)
+    idempotency = ("booking", idempotency_key, fingerprint(request.model_dump()))
+    stored = idempotency_store.lookup(db, *idempotency)
+    if stored is not None:
+        return replay_response(stored)
     try:
-        flight = (db.query(Flight).filter(Flight.id == request.flight_id).with_for_update().first())
-        if not flight:
-            raise HTTPException(status_code=404, detail="Flight not found")
-        if flight.seats_available <= 0:
-            raise HTTPException(status_code=400, detail="No seats available")
-        flight.seats_available -= 1
-        final_price = calculate_dynamic_price(
-            base_fare=float(flight.base_fare),
-            seats_available=flight.seats_available,
-            total_seats=flight.total_seats,
-            departure_time=flight.departure_time,
-            airline_name=flight.airline_name,)
-        booking = Booking(
-            pnr=generate_pnr(),
-            flight_id=flight.id,
-            passenger_name=request.passenger_name,
-            seat_no=request.seat_no,
-            price=final_price,
-            status="CONFIRMED",)
+        return book_seat(db, request, BOOKING_STRATEGY, idempotency)
+    except HTTPException:
+        # a concurrent retry with the same key may have committed first
+        stored = idempotency_store.lookup(db, *idempotency)
+        if stored is None:
+            raise
+        return replay_response(stored)
+def book_seat(db: Session, request: BookingRequest, strategy: str = "lock", idempotency: Optional[tuple] = None, refresh_calendar=refresh_fare_calendar, pnr: Optional[str] = None) -> Booking:
+#      idempotency is (scope, key, fingerprint); the stored response commits with the booking.
+#      Callers on the event loop pass a pnr drawn with generate_pnr_async, so no block refill runs here.
+    quoted_price = None
+    try:
+        # claim the quote and draw the PNR before the seat row is locked; a block refill uses its own transaction
+        if request.quote_token:
+            quoted_price = quote_store.claim(db, request.quote_token, request.flight_id)
+        pnr = pnr or generate_pnr()
+        flight = reserve_seats(db, request.flight_id, 1, strategy)
+        seats, seat_map = seat_inventory.claim(db, flight, [request.seat_no])
+        booking = build_booking(flight, request, pnr, quoted_price, seats[0])
         db.add(booking)
-        db.commit()
+        stored = None
+        if idempotency is not None:
+            stored = idempotency_store.record(db, *idempotency, 200, BookingResponse.model_validate(booking).model_dump_json())
+        commit_flight_changes(db, [flight], refresh_calendar)
+        seat_inventory.remember(seat_map)
+        if stored is not None:
+            idempotency_store.remember(stored)
         db.refresh(booking)
         return booking
     except HTTPException:
@@ -202,28 +536,198 @@ def create_booking(request: BookingRequest, db: Session = Depends(get_db)):
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Booking failed")
+#        Group Booking Endpoint (all passengers in one transaction)
+@app.post("/api/bookings/group", response_model=list[BookingResponse])
+def create_group_booking(request: GroupBookingRequest, db: Session = Depends(get_db)):
+    try:
+        pnrs = [generate_pnr() for _ in request.passengers]
+        flight = reserve_seats(db, request.flight_id, len(request.passengers), BOOKING_STRATEGY)
+        seats, seat_map = seat_inventory.claim(db, flight, [p.seat_no for p in request.passengers])
+        bookings = build_group_bookings(flight, request.passengers, pnrs, seats)
+        db.add_all(bookings)
+        # serialize before commit so the expired rows are not reloaded one by one
+        response = [BookingResponse.model_validate(b) for b in bookings]
+        commit_flight_changes(db, [flight])
+        seat_inventory.remember(seat_map)
+        return response
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"[BOOKING ERROR] group of {len(request.passengers)} on flight {request.flight_id}: {e}")
+        raise HTTPException(status_code=500, detail="Booking failed")
+def reserve_seats(db: Session, flight_id: int, count: int, strategy: str = "lock") -> Flight:
+#      Take `count` seats on a flight; the returned flight shows the seats left afterwards.
+    if strategy == "atomic":
+        return reserve_seats_atomic(db, flight_id, count)
+    flight = (db.query(Flight).filter(Flight.id == flight_id).with_for_update().first())
+    take_seats(flight, count)
+    return flight
+def check_seats(flight: Flight, count: int):
+    if not flight:
+        raise HTTPException(status_code=404, detail="Flight not found")
+    if flight.seats_available < count:
+        if count == 1 or flight.seats_available <= 0:
+            raise HTTPException(status_code=400, detail="No seats available")
+        raise HTTPException(status_code=400, detail=f"Only {flight.seats_available} seats available")
+def take_seats(flight: Flight, count: int):
+#      Decrement seats on a flight row already locked with SELECT ... FOR UPDATE.
+    check_seats(flight, count)
+    flight.seats_available -= count
+def seat_decrement(flight_id: int, count: int = 1):
+    return (update(Flight).where(Flight.id == flight_id).where(Flight.seats_available >= count).values(seats_available=Flight.seats_available - count).execution_options(synchronize_session=False))
+def reserve_seats_atomic(db: Session, flight_id: int, count: int) -> Flight:
+#      Take seats with a conditional UPDATE; the row lock is held only from the UPDATE to commit.
+    flight = db.get(Flight, flight_id)
+    check_seats(flight, count)
+    if db.get_bind().dialect.update_returning:
+        seats_left = db.scalar(seat_decrement(flight.id, count).returning(Flight.seats_available))
+    elif db.execute(seat_decrement(flight.id, count)).rowcount:
+        seats_left = db.scalar(select(Flight.seats_available).where(Flight.id == flight.id))
+    else:
+        seats_left = None
+    if seats_left is None:
+        raise HTTPException(status_code=400, detail="No seats available" if count == 1 else "Not enough seats available")
+    set_committed_value(flight, "seats_available", seats_left)
+    return flight
+def build_booking(flight: Flight, request: BookingRequest, pnr: str, quoted_price: Optional[float] = None, seat_no: Optional[str] = None) -> Booking:
+#      A valid quote fixes the price; otherwise charge the snapshot the flight was listed at.
+    if quoted_price is not None:
+        final_price = quoted_price
+    elif flight.current_price is not None:
+        final_price = float(flight.current_price)
+    else:
+        with timed_pricing("booking", 1):
+            final_price = calculate_dynamic_price(
+                base_fare=float(flight.base_fare),
+                seats_available=flight.seats_available,
+                total_seats=flight.total_seats,
+                departure_time=flight.departure_time,
+                airline_name=flight.airline_name,)
+    return Booking(
+        pnr=pnr,
+        flight_id=flight.id,
+        passenger_name=request.passenger_name,
+        seat_no=seat_no,
+        price=final_price,
+        status="CONFIRMED",)
+def build_group_bookings(flight: Flight, passengers, pnrs: List[str], seats: List[str]) -> List[Booking]:
+#      Every passenger pays the listed snapshot, like a single booking; an unpriced flight is priced once for the group.
+    if flight.current_price is not None:
+        price = float(flight.current_price)
+    else:
+        with timed_pricing("group_booking", 1):
+            price = calculate_dynamic_price(
+                base_fare=float(flight.base_fare),
+                seats_available=flight.seats_available + len(passengers),
+                total_seats=flight.total_seats,
+                departure_time=flight.departure_time,
+                airline_name=flight.airline_name,)
+    return [
+        Booking(
+            pnr=pnr,
+            flight_id=flight.id,
+            passenger_name=p.passenger_name,
+            seat_no=seat_no,
+            price=price,
+            status="CONFIRMED",)
+        for p, pnr, seat_no in zip(passengers, pnrs, seats)]
+def payment_queue_full() -> HTTPException:
+    return HTTPException(status_code=503, detail="Payment queue is full, retry later", headers={"Retry-After": str(PAYMENT_RETRY_AFTER_SECONDS)})
 #        Simulated Payment API Endpoint
 @app.post("/api/bookings/{pnr}/pay")
-def simulate_payment(pnr: str, db: Session = Depends(get_db)):
+def simulate_payment(
+    pnr: str,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=128),
+    ):
+    idempotency = ("payment", idempotency_key, fingerprint({"pnr": pnr}))
+    if idempotency_key is not None:
+        stored = idempotency_store.lookup(db, *idempotency)
+        if stored is not None:
+            return replay_response(stored)
     booking = db.query(Booking).filter(Booking.pnr == pnr).first()
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
-    payment_success = random.choice([True, False])
-    if payment_success:
-        booking.status = "PAID"
+    status_code = 200
+    previous_status = None
+    if PAYMENT_QUEUE_ENABLED:
+        # settle off the request thread: mark pending now, a queue worker claims it and commits the outcome
+        if booking.status in PAYABLE_STATUSES:
+            if not payment_queue.has_capacity():
+                raise payment_queue_full()
+            previous_status = booking.status
+            booking.status = PAYMENT_PENDING
+            booking.payment_lease_until = lease_expiry()
+        if booking.status in UNSETTLED_STATUSES:
+            status_code = 202
+    else:
+        payment_success = random.choice([True, False])
+        booking.status = "PAID" if payment_success else "PAYMENT_FAILED"
+    result = {"pnr": pnr, "status": booking.status}
+    stored = None
+    if idempotency_key is not None:
+        stored = idempotency_store.record(db, *idempotency, status_code, fast_dumps(result).decode())
+    try:
         db.commit()
-        return {"pnr": pnr, "status": "PAID"}
-    booking.status = "PAYMENT_FAILED"
-    db.commit()
-    return {"pnr": pnr, "status": "PAYMENT_FAILED"}
-#        Booking History Endpoint (All Bookings)
+    except IntegrityError:
+        # lost the race to a concurrent retry with the same key; serve its outcome
+        db.rollback()
+        stored = idempotency_store.lookup(db, *idempotency)
+        if stored is None:
+            raise
+        return replay_response(stored)
+    # submitted only after PAYMENT_PENDING is committed, so the worker's claim always finds it
+    if previous_status is not None and not payment_queue.submit(pnr, float(booking.price)):
+        # the queue filled up since the capacity check: undo the pending mark and the stored response
+        db.execute(update(Booking).where(Booking.pnr == pnr).where(Booking.status == PAYMENT_PENDING).values(status=previous_status, payment_lease_until=None))
+        if stored is not None:
+            idempotency_store.discard(db, *idempotency[:2])
+        db.commit()
+        raise payment_queue_full()
+    if stored is not None:
+        idempotency_store.remember(stored)
+    if status_code == 202:
+        return JSONResponse(content=result, status_code=202)
+    return result
+#        Payment status (poll, or long-poll with ?wait=seconds while the queue settles it)
+@app.get("/api/bookings/{pnr}/payment")
+async def get_payment_status(
+    pnr: str,
+    wait: float = Query(0, ge=0, le=PAYMENT_MAX_WAIT_SECONDS, description="Seconds to wait for a pending payment to settle"),
+    ):
+#      Async so a long-poll sleeps on the event loop instead of holding a threadpool slot.
+    status = await payment_queue.wait_async(pnr, wait)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return {"pnr": pnr, "status": status}
+#        Booking History Endpoint (All Bookings, keyset pagination and NDJSON streaming)
 @app.get("/api/bookings", response_model=list[BookingResponse])
-def get_all_bookings(db: Session = Depends(get_db)):
-    return db.query(Booking).all()
+def get_all_bookings(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; next page cursor is sent in X-Next-Cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    db: Session = Depends(get_read_db),
+):
+    query = keyset_query(select(Booking), Booking.id, Booking.id, False, cursor)
+    if wants_ndjson(request):
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(stream_ndjson(query, BookingResponse, db.get_bind()), media_type=NDJSON_MEDIA_TYPE)
+    if limit is None:
+        return db.scalars(query).all()
+    bookings = db.scalars(query.limit(limit + 1)).all()
+    return keyset_page(bookings, limit, "id", response)
 #        Get Booking By PNR
 @app.get("/api/bookings/{pnr}", response_model=BookingResponse)
-def get_booking_by_pnr(pnr: str, db: Session = Depends(get_db)):
+def get_booking_by_pnr(pnr: str, db: Session = Depends(get_read_db)):
     booking = db.query(Booking).filter(Booking.pnr == pnr).first()
+    if not booking and db.get_bind() is not engine:
+        # a replica may not have caught up with a booking made moments ago
+        with SessionLocal() as primary:
+            booking = primary.query(Booking).filter(Booking.pnr == pnr).first()
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     return booking
@@ -235,56 +739,189 @@ def cancel_booking(pnr: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Booking not found")
     if booking.status == "CANCELLED":
         return {"message": "Booking already cancelled"}
-    flight = db.query(Flight).filter(Flight.id == booking.flight_id).first()
+    # locked like a booking, so the snapshot stamped below orders after any writer that held the row first
+    flight = db.query(Flight).filter(Flight.id == booking.flight_id).with_for_update().first()
     flight.seats_available = min(flight.total_seats, flight.seats_available + 1)
+    seat_map = seat_inventory.release(db, flight, [booking.seat_no])
     booking.status = "CANCELLED"
-    db.commit()
+    commit_flight_changes(db, [flight])
+    seat_inventory.remember(seat_map)
     return {"pnr": pnr, "status": "CANCELLED"}            
-#        Background Simulator to change demand/seats    
-async def simulate_market_step():
+#        Async endpoint variants (ASYNC_DB_ENABLED=true swaps these in)
+async_router = APIRouter()
+@async_router.get("/api/flights/search", response_model=List[FlightWithPriceOut])
+async def search_flights_async(
+    origin: str = Query(..., description="Origin city (e.g., Mumbai)"),
+    destination: str = Query(..., description="Destination city (e.g., Delhi)"),
+    travel_date: date = Query(..., description="Travel date in YYYY-MM-DD"),
+    sort_by: Literal["price", "duration"] = Query("price"),
+    sort_order: Literal["asc", "desc"] = Query("asc"),
+    db: AsyncSession = Depends(get_async_read_db),
+    ):
+    origin_norm, dest_norm = normalize_route(origin, destination)
+    cache_key = (origin_norm, dest_norm, travel_date, sort_by, sort_order)
+    cached_body = search_cache.get(cache_key)
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
+    generation = search_cache.generation(cache_key)
+    if flight_index.enabled:
+        flights = flight_index.search(origin_norm, dest_norm, travel_date)
+    else:
+        flights = (await db.execute(route_day_query(origin_norm, dest_norm, travel_date))).all()
+    return search_response(flights, cache_key, generation)
+@async_router.get("/api/flights/{flight_id}/price", response_model=FlightWithPriceOut)
+async def get_dynamic_price_for_flight_async(
+    flight_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    f = (await db.execute(flight_row_query(flight_id))).first()
+    return flight_price_response(f, flight_id)
+@async_router.get("/api/flights/{flight_id}/history", response_model=Union[list[FareHistoryOut], list[FareRollupOut]])
+async def get_fare_history_async(
+    flight_id: int,
+    response: Response,
+    from_: Optional[datetime] = Query(None, alias="from", description="Earliest recorded_at / bucket start (inclusive)"),
+    to: Optional[datetime] = Query(None, description="Latest recorded_at / bucket start (inclusive)"),
+    resolution: Literal["raw", "1m", "1h"] = Query("raw"),
+    limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    query, sort_attr = fare_history_query(flight_id, from_, to, resolution, cursor)
+    history = (await db.scalars(query.limit(limit + 1))).all()
+    if not history and cursor is None:
+        raise HTTPException(status_code=404, detail="No fare history recorded for this flight.")
+    return keyset_page(history, limit, sort_attr, response)
+@async_router.post("/api/bookings", response_model=BookingResponse)
+async def create_booking_async(
+    request: BookingRequest,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=128),
+    ):
+#      The sync booking path runs on the AsyncSession's connection; only a PNR block refill and the calendar refresh leave the loop.
+    idempotency = None
+    if idempotency_key is not None:
+        idempotency = ("booking", idempotency_key, fingerprint(request.model_dump()))
+        stored = await db.run_sync(idempotency_store.lookup, *idempotency)
+        if stored is not None:
+            return replay_response(stored)
+    touched = set()
+    pnr = await generate_pnr_async()
+    try:
+        booking = await db.run_sync(lambda session: book_seat(session, request, BOOKING_STRATEGY, idempotency, touched.update, pnr))
+    except HTTPException:
+        if idempotency is None:
+            raise
+        # a concurrent retry with the same key may have committed first
+        stored = await db.run_sync(idempotency_store.lookup, *idempotency)
+        if stored is None:
+            raise
+        return replay_response(stored)
+    await asyncio.to_thread(refresh_fare_calendar, touched)
+    return booking
+@async_router.get("/api/bookings", response_model=list[BookingResponse])
+async def get_all_bookings_async(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; next page cursor is sent in X-Next-Cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    query = keyset_query(select(Booking), Booking.id, Booking.id, False, cursor)
+    if wants_ndjson(request):
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(astream_ndjson(query, BookingResponse, db.bind), media_type=NDJSON_MEDIA_TYPE)
+    if limit is None:
+        return (await db.scalars(query)).all()
+    bookings = (await db.scalars(query.limit(limit + 1))).all()
+    return keyset_page(bookings, limit, "id", response)
+def use_async_routes(app: FastAPI, router: APIRouter):
+#      Replace each sync route with its async twin, keeping route order.
+    async_routes = {(r.path, frozenset(r.methods)): r for r in router.routes}
+    app.router.routes[:] = [
+        async_routes.get((getattr(r, "path", None), frozenset(getattr(r, "methods", None) or ())), r)
+        for r in app.router.routes]
+if ASYNC_DB_ENABLED:
+    use_async_routes(app, async_router)
+def start_payment_queue():
+#      Payment workers run only in queued mode; pending payments from a previous run are picked up again.
+    if not PAYMENT_QUEUE_ENABLED:
+        return
+    payment_queue.start()
+    recovered = payment_queue.recover()
+    if recovered:
+        print(f"[PAYMENTS] re-queued {recovered} pending payments")
+def stop_payment_queue():
+    payment_queue.stop()
+def build_price_snapshots():
+#      Price any flight that has no snapshot yet (rows inserted out of band since the last migrate).
     db = SessionLocal()
     try:
-        flights = db.query(Flight).all()
-        if not flights:
-            return
-        sample_size = min(5, len(flights))
-        selected_flights = random.sample(flights, sample_size)
-        for f in selected_flights:
-            seat_change = random.randint(-5, 5)
-            f.seats_available = max(0, min(f.total_seats, f.seats_available + seat_change))
-            demand_value=None
-            if hasattr(f, "demand_level"):
-                demand_value=random.choice(["low", "medium", "high"])
-                f.demand_level=demand_value
-            final_price = calculate_dynamic_price(
-                base_fare=float(f.base_fare),
-                seats_available=f.seats_available,
-                total_seats=f.total_seats,
-                departure_time=f.departure_time,
-                airline_name=f.airline_name,
-                demand_level=demand_value,)
-            history = FareHistory(
-                flight_id=f.id,
-                recorded_at=datetime.utcnow(),
-                dynamic_price=final_price,
-                seats_available=f.seats_available,
-                demand_level=demand_value,
-            )
-            db.add(history)    
+        count = backfill_prices(db)
         db.commit()
-    except Exception as e:
-        db.rollback()
-        print(f"[SIMULATOR ERROR] {e}")
+        if count:
+            print(f"[PRICE SNAPSHOT] priced {count} flights")
+    finally:
+        db.close()
+def build_flight_index():
+#      Bulk load the route/day index before serving searches.
+    if FLIGHT_INDEX_REQUESTED and not flight_index.enabled:
+        print(f"[FLIGHT INDEX] disabled: WEB_CONCURRENCY={WEB_CONCURRENCY}, and other workers' writes never reach this process's index")
+    if not flight_index.enabled:
+        return
+    db = SessionLocal()
+    try:
+        count = flight_index.rebuild(db)
+        print(f"[FLIGHT INDEX] loaded {count} flights")
+    finally:
+        db.close()
+def build_fare_calendar():
+#      Backfill route_day_fares once; after that every write keeps it current.
+    db = SessionLocal()
+    try:
+        if db.scalar(select(RouteDayFare.day).limit(1)) is None:
+            count = rebuild_min_fares(db)
+            db.commit()
+            print(f"[FARE CALENDAR] backfilled {count} route/day fares")
+    finally:
+        db.close()
+def build_route_graph(warm: bool = False):
+#      Build the connections graph up front instead of on the first search (always during warm-up).
+    if not (ROUTE_GRAPH_ENABLED or warm) or route_graph.built:
+        return
+    db = SessionLocal()
+    try:
+        count = route_graph.rebuild(db)
+        print(f"[ROUTE GRAPH] loaded {count} flights")
+    finally:
+        db.close()
+def warm_connection_pools():
+#      Open pool_size connections on every engine so the first requests skip the connect handshake.
+    for e in [engine] + replica_engines:
+        connections = [e.connect() for _ in range(DB_POOL_SIZE)]
+        for conn in connections:
+            conn.close()
+def warm_search_cache():
+#      Price and cache the default search for every route with fares in the next STARTUP_WARMUP_DAYS days.
+    if not search_cache.enabled:
+        return
+    today = date.today()
+    db = SessionLocal()
+    try:
+        keys = db.execute(
+            select(RouteDayFare.origin, RouteDayFare.destination, RouteDayFare.day)
+            .where(RouteDayFare.day >= today)
+            .where(RouteDayFare.day < today + timedelta(days=STARTUP_WARMUP_DAYS))).all()
+        for origin, destination, day in keys:
+            cache_key = (origin, destination, day, "price", "asc")
+            generation = search_cache.generation(cache_key)
+            if flight_index.enabled:
+                flights = flight_index.search(origin, destination, day)
+            else:
+                flights = db.execute(route_day_query(origin, destination, day)).all()
+            if flights:
+                search_response(flights, cache_key, generation)
     finally:
         db.close()
-async def scheduler_loop(interval_seconds: int = 60):
-#      Runs simulate_market_step() periodically.
-    while True:
-        await simulate_market_step()
-        await asyncio.sleep(interval_seconds)
-@app.on_event("startup")
-async def start_background_simulator():
-#      Start the demand/availability simulator when FastAPI starts.
-
-    asyncio.create_task(scheduler_loop(60))    
-
+    print(f"[WARM-UP] cached {len(keys)} route/day searches")
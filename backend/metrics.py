@@ -0,0 +1,183 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable,Dict,List,Optional,Tuple
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+LabelKey = Tuple[str, ...]
+def _format_labels(names: Tuple[str, ...], values: LabelKey, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+class Gauge:
+    """
+    Point-in-time values read from a callback at scrape time.
+    """
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...], collect: Callable[[], Dict[LabelKey, float]]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.collect = collect
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+REGISTRY: List = []
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+http_requests_total = _register(Counter("http_requests_total", "HTTP responses by route and status.", ("method", "route", "status")))
+http_request_duration = _register(Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")))
+http_request_db_queries = _register(Histogram("http_request_db_queries", "Database queries issued per request.", ("route",), COUNT_BUCKETS))
+http_request_db_duration = _register(Histogram("http_request_db_duration_seconds", "Database time spent per request.", ("route",)))
+db_queries_total = _register(Counter("db_queries_total", "Database statements executed."))
+db_query_duration = _register(Histogram("db_query_duration_seconds", "Latency of individual database statements."))
+pricing_duration = _register(Histogram("pricing_duration_seconds", "Time spent in dynamic pricing per call site.", ("path",)))
+pricing_rows_total = _register(Counter("pricing_rows_total", "Rows priced per call site.", ("path",)))
+simulator_tick_duration = _register(Histogram("simulator_tick_duration_seconds", "Wall time of one market simulator tick.", (), LATENCY_BUCKETS + (30.0, 60.0)))
+simulator_flights_total = _register(Counter("simulator_flights_updated_total", "Flights updated by the market simulator."))
+payment_duration = _register(Histogram("payment_processing_duration_seconds", "Payment processor latency per queued payment."))
+payments_total = _register(Counter("payments_settled_total", "Queued payments settled, by outcome.", ("status",)))
+# Connection pools by name ("primary", "replica0", ...); gauges read engine.pool
+# at scrape time so a pool recreated by dispose() is still reported.
+_pools: Dict[str, object] = {}
+def pool_stats() -> Dict[str, dict]:
+    stats = {}
+    for name, engine in list(_pools.items()):
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            stats[name] = {"pool": type(pool).__name__}
+            continue
+        stats[name] = {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+        }
+    return stats
+def _pool_gauge(field: str) -> Callable[[], Dict[LabelKey, float]]:
+    return lambda: {(name,): s[field] for name, s in pool_stats().items() if field in s}
+db_pool_checked_out = _register(Gauge("db_pool_checked_out", "Connections currently checked out of the pool.", ("pool",), _pool_gauge("checked_out")))
+db_pool_checked_in = _register(Gauge("db_pool_checked_in", "Idle connections held by the pool.", ("pool",), _pool_gauge("checked_in")))
+db_pool_overflow = _register(Gauge("db_pool_overflow", "Connections open beyond pool_size.", ("pool",), _pool_gauge("overflow")))
+db_pool_checkout_wait = _register(Histogram("db_pool_checkout_wait_seconds", "Time to obtain a pooled connection, including the liveness ping.", ("pool",)))
+db_pool_timeouts = _register(Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout.", ("pool",)))
+db_pool_invalidations = _register(Counter("db_pool_invalidations_total", "Connections discarded as dead or broken.", ("pool",)))
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+# Per-request database accounting; the middleware installs a dict that the
+# engine hooks mutate (threadpool workers share it through the copied context).
+_request_db_stats: ContextVar[Optional[dict]] = ContextVar("request_db_stats", default=None)
+def start_request_db_stats() -> dict:
+    stats = {"queries": 0, "seconds": 0.0}
+    _request_db_stats.set(stats)
+    return stats
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - getattr(context, "_metrics_started", time.perf_counter())
+    db_queries_total.inc()
+    db_query_duration.observe(elapsed)
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["seconds"] += elapsed
+def instrument_engine(engine) -> None:
+    """
+    Count statements and database time on a sync Engine (or AsyncEngine.sync_engine).
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout took, labelled by the
+    engine's pool_logging_name. Pool events only fire once a connection has
+    been handed out, so the wait itself has to be timed around connect().
+    """
+    def connect(self):
+        name = getattr(self, "logging_name", None) or "primary"
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            db_pool_timeouts.inc(pool=name)
+            raise
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started, pool=name)
+def instrument_pool(engine, name: str) -> None:
+    """
+    Export an engine's pool occupancy and invalidations under the given name.
+    """
+    _pools[name] = engine
+    event.listen(engine.pool, "invalidate", lambda dbapi_connection, record, exception: db_pool_invalidations.inc(pool=name))
+@contextmanager
+def timed_pricing(path: str, rows: int):
+    with pricing_duration.time(path=path):
+        yield
+    pricing_rows_total.inc(rows, path=path)
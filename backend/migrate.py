@@ -0,0 +1,99 @@
+"""
+One-time schema setup, run before starting the API (the app itself never
+touches the schema on import):
+
+    python -m backend.migrate
+
+Creates missing tables and indexes, adds columns that newer models define but
+an existing database lacks (e.g. flights.current_price and priced_at), then
+backfills the derived tables: price snapshots, the fare calendar and fare
+history rollups. A random PNR key is stored once per database for processes
+that run without PNR_SECRET. The calendar and rollups are only built while their table is
+empty, so re-runs on every deploy stay cheap; pass --backfill-rollups to fill
+rollups for history loaded out of band. Only additive changes are made; safe
+to re-run.
+"""
+import argparse
+import secrets
+import time
+from typing import List
+from sqlalchemy import inspect,select,text
+from sqlalchemy.engine import Engine
+from .db import SessionLocal,engine
+from .fare_calendar import rebuild_min_fares
+from .fare_rollups import backfill_rollups
+from .models import Base,FareRollup,PnrBlock,RouteDayFare
+from .price_snapshots import backfill_prices
+from .utils import PNR_KEY_ROW
+def add_missing_columns(bind: Engine) -> List[str]:
+    """
+    ALTER TABLE ... ADD COLUMN for model columns absent from existing tables.
+    A NOT NULL column without a server default cannot be added to a populated
+    table this way and is reported instead.
+    """
+    inspector = inspect(bind)
+    existing = set(inspector.get_table_names())
+    preparer = bind.dialect.identifier_preparer
+    added = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(f"{table.name}.{column.name} is NOT NULL without a server default; migrate it by hand")
+                ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column.type.compile(bind.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+    return added
+def add_missing_indexes(bind: Engine) -> List[str]:
+    inspector = inspect(bind)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        present = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(bind)
+                created.append(index.name)
+    return created
+def migrate(bind: Engine = engine, force_rollups: bool = False) -> dict:
+    started = time.perf_counter()
+    before = set(inspect(bind).get_table_names())
+    # create_all also creates the indexes of the tables it creates
+    Base.metadata.create_all(bind=bind)
+    report = {
+        "created_tables": sorted(set(inspect(bind).get_table_names()) - before),
+        "added_columns": add_missing_columns(bind),
+        "created_indexes": add_missing_indexes(bind),
+    }
+    db = SessionLocal(bind=bind)
+    try:
+        report["pnr_key_created"] = db.get(PnrBlock, PNR_KEY_ROW) is None
+        if report["pnr_key_created"]:
+            db.add(PnrBlock(name=PNR_KEY_ROW, next_value=secrets.randbits(62)))
+        report["priced_flights"] = backfill_prices(db)
+        report["calendar_fares"] = 0
+        if db.scalar(select(RouteDayFare.day).limit(1)) is None:
+            report["calendar_fares"] = rebuild_min_fares(db)
+        report["rollup_buckets"] = 0
+        # a full fare_history scan, so only for a fresh table unless asked for
+        if force_rollups or db.scalar(select(FareRollup.id).limit(1)) is None:
+            report["rollup_buckets"] = backfill_rollups(db)
+        db.commit()
+    finally:
+        db.close()
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill-rollups", action="store_true", help="build missing fare rollups even when the table already has rows")
+    args = parser.parse_args()
+    report = migrate(force_rollups=args.backfill_rollups)
+    print("  ".join(f"{key}={value}" for key, value in report.items()))
+if __name__ == "__main__":
+    main()
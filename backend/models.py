@@ -1,4 +1,4 @@
-from sqlalchemy import Column,Integer,String,DateTime,DECIMAL,ForeignKey
+from sqlalchemy import Column,Integer,BigInteger,String,Text,Date,DateTime,DECIMAL,LargeBinary,ForeignKey,Index,UniqueConstraint,DDL,event
 from .db import Base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -15,6 +15,14 @@ class Flight(Base):
     base_fare = Column(DECIMAL(10, 2), nullable=False)
     total_seats = Column(Integer, nullable=False)
     seats_available = Column(Integer, nullable=False)
+    # Price snapshot written by the simulator and on seat changes; reads never reprice
+    current_price = Column(DECIMAL(10, 2), nullable=True)
+    priced_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        # Natural key used by schedule ingestion upserts
+        Index("ix_flights_flight_no_departure", "flight_no", "departure_time"),
+        # Band sweeps range over departure_time alone
+        Index("ix_flights_departure_time", "departure_time"),)
 class FareHistory(Base):
     __tablename__ = "fare_history"
     id = Column(Integer, primary_key=True, index=True)
@@ -24,6 +32,31 @@ class FareHistory(Base):
     seats_available = Column(Integer, nullable=False)
     demand_level = Column(String(10), nullable=True)
     flight = relationship("Flight")
+    __table_args__ = (Index("ix_fare_history_flight_recorded", "flight_id", "recorded_at"),)
+class FareRollup(Base):
+    # OHLC of dynamic_price per flight and time bucket, maintained by the simulator
+    __tablename__ = "fare_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    flight_id = Column(Integer, ForeignKey("flights.id"), nullable=False)
+    resolution = Column(String(3), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    open_price = Column(DECIMAL(10, 2), nullable=False)
+    high_price = Column(DECIMAL(10, 2), nullable=False)
+    low_price = Column(DECIMAL(10, 2), nullable=False)
+    close_price = Column(DECIMAL(10, 2), nullable=False)
+    min_seats_available = Column(Integer, nullable=False)
+    samples = Column(Integer, nullable=False, default=1)
+    __table_args__ = (UniqueConstraint("flight_id", "resolution", "bucket_start", name="uq_fare_rollups_bucket"),)
+class RouteDayFare(Base):
+    # Cheapest available dynamic price per route and service day, read by the fare calendar
+    __tablename__ = "route_day_fares"
+    origin = Column(String(50), primary_key=True)
+    destination = Column(String(50), primary_key=True)
+    day = Column(Date, primary_key=True)
+    min_price = Column(DECIMAL(10, 2), nullable=False)
+    flight_id = Column(Integer, ForeignKey("flights.id"), nullable=False)
+    flights_available = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 class Booking(Base):
     __tablename__ = "bookings"
     id = Column(Integer, primary_key=True, index=True)
@@ -33,4 +66,47 @@ class Booking(Base):
     seat_no = Column(String(5), nullable=True)
     price = Column(DECIMAL(10,2), nullable=False)
     status = Column(String(20), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)    
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)    
+    # Queued payments: the process that claimed the charge and until when; another process may take over once it lapses
+    payment_owner = Column(String(64), nullable=True)
+    payment_lease_until = Column(DateTime, nullable=True)
+    __table_args__ = (Index("ix_bookings_status_lease", "status", "payment_lease_until"),)
+class SeatMap(Base):
+    # Seat inventory per flight: bit i of `occupied` is seat i, numbered row by row across seat_letters
+    __tablename__ = "seat_maps"
+    flight_id = Column(Integer, ForeignKey("flights.id"), primary_key=True)
+    seat_letters = Column(String(10), nullable=False)
+    business_rows = Column(Integer, nullable=False)
+    total_seats = Column(Integer, nullable=False)
+    occupied = Column(LargeBinary, nullable=False)
+    version = Column(Integer, nullable=False, default=0)
+class IdempotencyRecord(Base):
+    # Stored responses for Idempotency-Key retries, written with the booking/payment they describe
+    __tablename__ = "idempotency_keys"
+    scope = Column(String(32), primary_key=True)
+    key = Column(String(128), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+class PriceQuote(Base):
+    # Outstanding price quotes; create_booking deletes the row in its own transaction when it honours one
+    __tablename__ = "price_quotes"
+    token = Column(String(48), primary_key=True)
+    flight_id = Column(Integer, ForeignKey("flights.id"), nullable=False)
+    price = Column(DECIMAL(10, 2), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+class PnrBlock(Base):
+    # Sequence source for utils.PnrAllocator; each worker claims next_value..next_value+block.
+    # The 'pnr_key' row written by migrate holds the PNR key used when PNR_SECRET is unset.
+    __tablename__ = "pnr_blocks"
+    name = Column(String(20), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+event.listen(PnrBlock.__table__, "after_create", DDL("INSERT INTO pnr_blocks (name, next_value) VALUES ('pnr', 0)"))
+class DataGeneration(Base):
+    # Bumped by writers outside the API process (schedule ingest) so API processes rebuild their in-memory read models
+    __tablename__ = "data_generations"
+    name = Column(String(20), primary_key=True)
+    generation = Column(BigInteger, nullable=False)
+event.listen(DataGeneration.__table__, "after_create", DDL("INSERT INTO data_generations (name, generation) VALUES ('flights', 0)"))
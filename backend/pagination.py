@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import datetime
+from typing import Iterator,Optional,Tuple,Type
+from fastapi import HTTPException,Request
+from pydantic import BaseModel
+from sqlalchemy import and_,asc,desc,or_
+from .db import SessionLocal
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+def encode_cursor(sort_value, row_id: int) -> str:
+    """
+    Opaque keyset cursor: the last row's sort value and id.
+    """
+    raw = json.dumps([str(sort_value), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+def decode_cursor(cursor: str, sort_column) -> Tuple[object, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        python_type = sort_column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(sort_value), int(row_id)
+        return python_type(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+def keyset_query(query, sort_column, id_column, descending: bool, cursor: Optional[str]):
+    """
+    Order by (sort_column, id) and start strictly after the cursor row.
+    """
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_column)
+        if descending:
+            query = query.where(or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id)))
+        else:
+            query = query.where(or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id)))
+    direction = desc if descending else asc
+    return query.order_by(direction(sort_column), direction(id_column))
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+def stream_ndjson(query, schema: Type[BaseModel], bind=None) -> Iterator[str]:
+    """
+    Yield NDJSON chunks from a server-side cursor.
+    Uses its own session so it outlives the request dependency, and expunges
+    every row once written so the identity map never holds the full result. Pass the
+    request session's bind to stream from the same replica.
+    """
+    db = SessionLocal(bind=bind) if bind is not None else SessionLocal()
+    try:
+        lines = []
+        for row in db.scalars(query.execution_options(yield_per=STREAM_CHUNK_SIZE)):
+            lines.append(schema.model_validate(row).model_dump_json())
+            # expunge_all would swap out the identity map the yield_per result is still loading into
+            db.expunge(row)
+            if len(lines) >= STREAM_CHUNK_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines.clear()
+        if lines:
+            yield "\n".join(lines) + "\n"
+    finally:
+        db.close()
+async def astream_ndjson(query, schema: Type[BaseModel], bind=None):
+    """
+    Async-mode twin of stream_ndjson backed by AsyncSession.stream_scalars.
+    """
+    from .db import AsyncSessionLocal
+    async with (AsyncSessionLocal(bind=bind) if bind is not None else AsyncSessionLocal()) as db:
+        lines = []
+        result = await db.stream_scalars(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        async for row in result:
+            lines.append(schema.model_validate(row).model_dump_json())
+            # expunge_all would swap out the identity map the yield_per result is still loading into
+            db.expunge(row)
+            if len(lines) >= STREAM_CHUNK_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines.clear()
+        if lines:
+            yield "\n".join(lines) + "\n"
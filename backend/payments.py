@@ -0,0 +1,304 @@
+import asyncio
+import importlib
+import os
+import queue
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime,timedelta
+from typing import Dict,List,Optional,Protocol,Tuple
+from sqlalchemy import and_,bindparam,or_,select,update
+from .db import SessionLocal
+from .metrics import payment_duration,payments_total
+from .models import Booking
+# Off by default: /pay settles inline, which is what the current frontend expects
+PAYMENT_QUEUE_ENABLED = os.getenv("PAYMENT_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+PAYMENT_WORKERS = int(os.getenv("PAYMENT_WORKERS", "8"))
+PAYMENT_QUEUE_SIZE = int(os.getenv("PAYMENT_QUEUE_SIZE", "1000"))
+PAYMENT_BATCH_SIZE = int(os.getenv("PAYMENT_BATCH_SIZE", "200"))
+PAYMENT_FLUSH_INTERVAL_SECONDS = float(os.getenv("PAYMENT_FLUSH_INTERVAL_SECONDS", "0.2"))
+PAYMENT_SIMULATED_LATENCY_SECONDS = float(os.getenv("PAYMENT_SIMULATED_LATENCY_SECONDS", "0.5"))
+# "package.module:attribute" naming a processor instance or a zero-argument factory
+PAYMENT_PROCESSOR = os.getenv("PAYMENT_PROCESSOR", "")
+# A claimed charge belongs to one process until its lease lapses; keep it above the processor's worst-case latency
+PAYMENT_LEASE_SECONDS = float(os.getenv("PAYMENT_LEASE_SECONDS", "60"))
+PAYMENT_MAX_WAIT_SECONDS = 30
+PAYMENT_POLL_INTERVAL_SECONDS = 0.5
+PAYMENT_RETRY_AFTER_SECONDS = 1
+# PENDING: queued, not yet charged; PROCESSING: claimed by payment_owner, being charged
+PENDING = "PAYMENT_PENDING"
+PROCESSING = "PAYMENT_PROCESSING"
+UNSETTLED_STATUSES = (PENDING, PROCESSING)
+PAYABLE_STATUSES = ("CONFIRMED", "PAYMENT_FAILED")
+def lease_expiry(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()) + timedelta(seconds=PAYMENT_LEASE_SECONDS)
+class PaymentProcessor(Protocol):
+    def charge(self, pnr: str, amount: float) -> bool:
+        """
+        Settle one payment; blocking is fine, each call runs on a pool worker.
+        """
+        ...
+class SimulatedProcessor:
+    """
+    Local stand-in for a payment gateway: a fixed latency and a coin flip,
+    the same outcome distribution as the inline /pay endpoint.
+    """
+    def __init__(self, latency_seconds: float = PAYMENT_SIMULATED_LATENCY_SECONDS, success_rate: float = 0.5, rng=random):
+        self.latency_seconds = latency_seconds
+        self.success_rate = success_rate
+        self.rng = rng
+    def charge(self, pnr: str, amount: float) -> bool:
+        time.sleep(self.latency_seconds)
+        return self.rng.random() < self.success_rate
+def load_processor(spec: str) -> PaymentProcessor:
+    if not spec:
+        return SimulatedProcessor()
+    module_name, _, attribute = spec.partition(":")
+    target = getattr(importlib.import_module(module_name), attribute)
+    return target() if isinstance(target, type) or not hasattr(target, "charge") else target
+class PaymentQueue:
+    """
+    Bounded job queue drained by a fixed pool of worker threads. Before
+    charging, a worker claims the booking in the database (PENDING ->
+    PROCESSING under this process's owner id and a lease), so a payment queued
+    by several processes is charged once. Outcomes go to a single writer thread
+    that commits them in batches with one executemany UPDATE, and which also
+    re-queues bookings whose lease lapsed, e.g. because their process died.
+    """
+    def __init__(self, processor: PaymentProcessor, workers: int, max_jobs: int, batch_size: int, flush_interval: float):
+        self.processor = processor
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._jobs: "queue.Queue[Optional[Tuple[str, float]]]" = queue.Queue(maxsize=max_jobs)
+        self._outcomes: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._settled = threading.Condition()
+        self._in_flight: Dict[str, float] = {}
+        self.owner: Optional[str] = None
+        self.submitted = 0
+        self.settled = 0
+        self.rejected = 0
+        self.claim_conflicts = 0
+        self.recovered = 0
+        self.flushes = 0
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+    def start(self) -> None:
+        if self.running:
+            return
+        # set here rather than at import, so forked server workers get distinct owners
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[-64:]
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._work, name=f"payment-worker-{i}", daemon=True))
+        self._threads.append(threading.Thread(target=self._write, name="payment-writer", daemon=True))
+        for thread in self._threads:
+            thread.start()
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Let queued jobs finish, flush their outcomes, then stop every thread.
+        """
+        if not self.running:
+            return
+        workers, writer = self._threads[:-1], self._threads[-1]
+        for _ in workers:
+            self._jobs.put(None)
+        for thread in workers:
+            thread.join(timeout)
+        self._outcomes.put(None)
+        writer.join(timeout)
+        self._threads = []
+    def has_capacity(self) -> bool:
+        return not self._jobs.full()
+    def submit(self, pnr: str, amount: float, timeout: Optional[float] = None) -> bool:
+        """
+        Queue a payment, waiting up to timeout for room; False when the queue
+        stays full. A pnr already in flight here is not queued twice; one
+        queued by another process too is settled by whichever claims it first.
+        """
+        with self._settled:
+            if pnr in self._in_flight:
+                return True
+            self._in_flight[pnr] = time.monotonic()
+        try:
+            self._jobs.put((pnr, amount), timeout=timeout) if timeout else self._jobs.put_nowait((pnr, amount))
+        except queue.Full:
+            with self._settled:
+                self._in_flight.pop(pnr, None)
+                self.rejected += 1
+                self._settled.notify_all()
+            return False
+        with self._settled:
+            self.submitted += 1
+        return True
+    def recover(self) -> int:
+        """
+        Re-queue unsettled bookings whose lease has lapsed: queued or claimed
+        by a process that stopped before settling them. Rows from before
+        leases existed have none and count as lapsed.
+        """
+        db = SessionLocal()
+        try:
+            lapsed = db.execute(
+                select(Booking.pnr, Booking.price)
+                .where(Booking.status.in_(UNSETTLED_STATUSES))
+                .where(or_(Booking.payment_lease_until.is_(None), Booking.payment_lease_until < datetime.utcnow()))).all()
+        finally:
+            db.close()
+        recovered = 0
+        for pnr, price in lapsed:
+            if not self.submit(pnr, float(price)):
+                break
+            recovered += 1
+        with self._settled:
+            self.recovered += recovered
+        return recovered
+    def status(self, pnr: str) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            return db.scalar(select(Booking.status).where(Booking.pnr == pnr))
+        finally:
+            db.close()
+    def wait(self, pnr: str, timeout: float) -> Optional[str]:
+        """
+        Block until the booking's payment is settled by any process, or timeout.
+        Polls the database, waking early when this process settles something.
+        Returns the last status read (None for an unknown pnr).
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.status(pnr)
+            remaining = deadline - time.monotonic()
+            if status not in UNSETTLED_STATUSES or remaining <= 0:
+                return status
+            with self._settled:
+                self._settled.wait(min(remaining, PAYMENT_POLL_INTERVAL_SECONDS))
+    async def wait_async(self, pnr: str, timeout: float) -> Optional[str]:
+        """
+        wait() for the event loop: only the status reads use a worker thread,
+        so a long-poller holds no threadpool slot while it sleeps.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status = await asyncio.to_thread(self.status, pnr)
+            remaining = deadline - time.monotonic()
+            if status not in UNSETTLED_STATUSES or remaining <= 0:
+                return status
+            await asyncio.sleep(min(remaining, PAYMENT_POLL_INTERVAL_SECONDS))
+    def _claim(self, pnr: str) -> bool:
+        """
+        Take the booking for this process: PENDING, or PROCESSING under a lapsed lease.
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            claimed = db.execute(
+                update(Booking)
+                .where(Booking.pnr == pnr)
+                .where(or_(
+                    Booking.status == PENDING,
+                    and_(Booking.status == PROCESSING, or_(Booking.payment_lease_until.is_(None), Booking.payment_lease_until < now))))
+                .values(status=PROCESSING, payment_owner=self.owner, payment_lease_until=lease_expiry(now))
+                .execution_options(synchronize_session=False)).rowcount
+            db.commit()
+            return bool(claimed)
+        except Exception as e:
+            db.rollback()
+            print(f"[PAYMENTS ERROR] claim of {pnr} failed, left for recovery: {e}")
+            return False
+        finally:
+            db.close()
+    def _work(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            pnr, amount = job
+            if not self._claim(pnr):
+                # settled, cancelled or being charged elsewhere
+                with self._settled:
+                    self._in_flight.pop(pnr, None)
+                    self.claim_conflicts += 1
+                    self._settled.notify_all()
+                continue
+            started = time.perf_counter()
+            try:
+                status = "PAID" if self.processor.charge(pnr, amount) else "PAYMENT_FAILED"
+            except Exception as e:
+                print(f"[PAYMENTS ERROR] {pnr}: {e}")
+                status = "PAYMENT_FAILED"
+            payment_duration.observe(time.perf_counter() - started)
+            payments_total.inc(status=status)
+            self._outcomes.put((pnr, status))
+    def _write(self) -> None:
+        stopping = False
+        next_recovery = time.monotonic() + PAYMENT_LEASE_SECONDS
+        while not stopping:
+            if time.monotonic() >= next_recovery:
+                next_recovery = time.monotonic() + PAYMENT_LEASE_SECONDS
+                try:
+                    self.recover()
+                except Exception as e:
+                    print(f"[PAYMENTS ERROR] recovery failed: {e}")
+            batch: List[Tuple[str, str]] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    outcome = self._outcomes.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if outcome is None:
+                    stopping = True
+                    break
+                batch.append(outcome)
+            if batch:
+                self._flush(batch)
+    def _flush(self, batch: List[Tuple[str, str]]) -> None:
+        db = SessionLocal()
+        try:
+            # only settle bookings this process still holds, so a cancellation in between wins
+            table = Booking.__table__
+            db.execute(
+                update(table)
+                .where(table.c.pnr == bindparam("b_pnr"))
+                .where(table.c.status == PROCESSING)
+                .where(table.c.payment_owner == self.owner)
+                .values(status=bindparam("b_status"), payment_owner=None, payment_lease_until=None),
+                [{"b_pnr": pnr, "b_status": status} for pnr, status in batch])
+            db.commit()
+            self.flushes += 1
+        except Exception as e:
+            db.rollback()
+            print(f"[PAYMENTS ERROR] batch write failed, bookings stay pending until their lease lapses: {e}")
+        finally:
+            db.close()
+        with self._settled:
+            for pnr, _ in batch:
+                self._in_flight.pop(pnr, None)
+            self.settled += len(batch)
+            self._settled.notify_all()
+    def stats(self) -> dict:
+        with self._settled:
+            return {
+                "enabled": PAYMENT_QUEUE_ENABLED,
+                "running": self.running,
+                "workers": self.workers,
+                "queued": self._jobs.qsize(),
+                "in_flight": len(self._in_flight),
+                "submitted": self.submitted,
+                "settled": self.settled,
+                "rejected": self.rejected,
+                "claim_conflicts": self.claim_conflicts,
+                "recovered": self.recovered,
+                "flushes": self.flushes,
+                "owner": self.owner,
+            }
+payment_queue = PaymentQueue(
+    load_processor(PAYMENT_PROCESSOR),
+    PAYMENT_WORKERS,
+    PAYMENT_QUEUE_SIZE,
+    PAYMENT_BATCH_SIZE,
+    PAYMENT_FLUSH_INTERVAL_SECONDS,)
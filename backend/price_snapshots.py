@@ -0,0 +1,102 @@
+from datetime import datetime,timedelta
+from decimal import Decimal
+from typing import List,Sequence
+from sqlalchemy import and_,bindparam,or_,select,update
+from sqlalchemy.orm import Session
+from .dynamic_pricing import calculate_dynamic_prices
+from .flight_index import FLIGHT_ROW_COLUMNS,FlightRow
+from .metrics import timed_pricing
+from .models import Flight
+# Hours to departure where _time_factor in dynamic_pricing changes band
+TIME_BAND_EDGES_HOURS = (0, 24, 72, 168)
+def as_price(value: float) -> Decimal:
+    """
+    Decimal form of a rounded price, equal to what DECIMAL(10, 2) reads back.
+    """
+    return Decimal(str(value))
+def compute_prices(flights: Sequence, path: str) -> List[float]:
+    """
+    Fresh dynamic prices for Flight objects or FlightRow-shaped rows, in one batch.
+    """
+    if not flights:
+        return []
+    with timed_pricing(path, len(flights)):
+        prices = calculate_dynamic_prices(
+            base_fares=[float(f.base_fare) for f in flights],
+            seats_available=[f.seats_available for f in flights],
+            total_seats=[f.total_seats for f in flights],
+            departure_times=[f.departure_time for f in flights],
+            airline_names=[f.airline_name for f in flights],
+            demand_levels=[getattr(f, "demand_level", None) for f in flights],)
+    return prices.tolist()
+def stored_prices(flights: Sequence, path: str) -> List[float]:
+    """
+    Read side: the snapshot from the last simulator tick or seat change.
+    Rows that were never priced (e.g. inserted since the backfill) fall back
+    to a live computation so a response never has a missing price.
+    """
+    prices = [None if f.current_price is None else float(f.current_price) for f in flights]
+    missing = [i for i, price in enumerate(prices) if price is None]
+    if missing:
+        for i, price in zip(missing, compute_prices([flights[i] for i in missing], path)):
+            prices[i] = price
+    return prices
+def reprice_flights(flights: Sequence[Flight], path: str = "snapshot") -> None:
+    """
+    Write side for seat changes: store a fresh snapshot on the ORM objects so
+    it commits together with the new seat count.
+    """
+    priced_at = datetime.utcnow()
+    for f, price in zip(flights, compute_prices(flights, path)):
+        f.current_price = as_price(price)
+        f.priced_at = priced_at
+def backfill_prices(db: Session, batch_size: int = 1000) -> int:
+    """
+    Snapshot every flight that has never been priced; the caller commits.
+    """
+    total = 0
+    while True:
+        rows = [FlightRow(*r) for r in db.execute(select(*FLIGHT_ROW_COLUMNS).where(Flight.current_price.is_(None)).limit(batch_size))]
+        if not rows:
+            return total
+        priced_at = datetime.utcnow()
+        db.execute(update(Flight), [
+            {"id": r.id, "current_price": price, "priced_at": priced_at}
+            for r, price in zip(rows, compute_prices(rows, "snapshot"))])
+        total += len(rows)
+def reprice_band_crossings(db: Session, since: datetime, now: datetime, batch_size: int = 1000) -> List[FlightRow]:
+    """
+    Re-snapshot flights whose time to departure crossed a pricing band between
+    since and now (local clock, like the pricing itself), so snapshots of
+    flights nobody books or samples still move as departure approaches.
+    Candidates are found without locks (on ix_flights_departure_time) and
+    written only while seats_available still matches what was priced, so a
+    booking committing in between keeps its own snapshot. Each batch commits
+    on its own, so row locks are held for one batch at a time. Returns the
+    rows actually written, carrying their new price.
+    """
+    crossed = or_(*[
+        and_(Flight.departure_time > since + timedelta(hours=edge), Flight.departure_time <= now + timedelta(hours=edge))
+        for edge in TIME_BAND_EDGES_HOURS])
+    table = Flight.__table__
+    write = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .where(table.c.seats_available == bindparam("b_seats"))
+        .values(current_price=bindparam("b_price"), priced_at=bindparam("b_priced_at")))
+    repriced: List[FlightRow] = []
+    last_id = 0
+    while True:
+        rows = [FlightRow(*r) for r in db.execute(
+            select(*FLIGHT_ROW_COLUMNS).where(crossed).where(Flight.id > last_id).order_by(Flight.id).limit(batch_size))]
+        if not rows:
+            return repriced
+        last_id = rows[-1].id
+        priced_at = datetime.utcnow()
+        rows = [r._replace(current_price=as_price(price), priced_at=priced_at) for r, price in zip(rows, compute_prices(rows, "band_sweep"))]
+        db.execute(write, [{"b_id": r.id, "b_seats": r.seats_available, "b_price": r.current_price, "b_priced_at": priced_at} for r in rows])
+        # a locking read by primary key sees the latest seats, not the batch's snapshot:
+        # rows whose seats moved since the read were skipped above and are not published
+        seats = dict(db.execute(select(Flight.id, Flight.seats_available).where(Flight.id.in_([r.id for r in rows])).with_for_update()).all())
+        db.commit()
+        repriced.extend(r for r in rows if seats.get(r.id) == r.seats_available)
@@ -0,0 +1,71 @@
+import os
+import secrets
+import threading
+from datetime import datetime,timedelta
+from fastapi import HTTPException
+from sqlalchemy import delete,select
+from sqlalchemy.orm import Session
+from .models import PriceQuote
+QUOTE_TTL_SECONDS = float(os.getenv("QUOTE_TTL_SECONDS", "120"))
+# Expired quotes are deleted alongside every Nth issued quote
+QUOTE_PURGE_EVERY = 1000
+class QuoteStore:
+    """
+    Outstanding price quotes in the price_quotes table, so any API process can
+    honour a quote another one issued. The token is the row's random id.
+    claim() deletes the row in the booking's transaction: the quote is used
+    up only when the booking commits, and a failed booking rolls it back.
+    """
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.redeemed = 0
+        self.rejected = 0
+    def issue(self, db: Session, flight_id: int, price: float) -> PriceQuote:
+        """
+        Stage a new quote in the caller's transaction; the caller commits.
+        """
+        now = datetime.utcnow()
+        quote = PriceQuote(token=secrets.token_urlsafe(24), flight_id=flight_id, price=price, expires_at=now + timedelta(seconds=self.ttl_seconds))
+        db.add(quote)
+        with self._lock:
+            self.issued += 1
+            purge = self.issued % QUOTE_PURGE_EVERY == 0
+        if purge:
+            db.execute(delete(PriceQuote).where(PriceQuote.expires_at <= now))
+        return quote
+    def claim(self, db: Session, token: str, flight_id: int) -> float:
+        """
+        Use up a quote for one booking in the caller's transaction and return
+        its price. An unknown, already used, expired or mismatched token is a
+        400: the booking is never silently priced at something else.
+        """
+        price = db.scalar(
+            select(PriceQuote.price)
+            .where(PriceQuote.token == token)
+            .where(PriceQuote.flight_id == flight_id)
+            .where(PriceQuote.expires_at > datetime.utcnow())
+            .with_for_update())
+        # a concurrent booking with the same token deletes the row first and this one finds nothing
+        if price is not None and db.execute(delete(PriceQuote).where(PriceQuote.token == token)).rowcount:
+            with self._lock:
+                self.redeemed += 1
+            return float(price)
+        with self._lock:
+            self.rejected += 1
+        quote = db.get(PriceQuote, token)
+        if quote is None:
+            raise HTTPException(status_code=400, detail="Unknown or already used quote token")
+        if quote.flight_id != flight_id:
+            raise HTTPException(status_code=400, detail="Quote token is for a different flight")
+        raise HTTPException(status_code=400, detail="Quote token has expired; request a new quote")
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "issued": self.issued,
+                "redeemed": self.redeemed,
+                "rejected": self.rejected,
+            }
+quote_store = QuoteStore(QUOTE_TTL_SECONDS)
@@ -0,0 +1,127 @@
+import os
+import threading
+from bisect import bisect_left
+from datetime import date,datetime,timedelta
+from typing import Dict,Iterable,List,NamedTuple,Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .models import Flight
+ROUTE_GRAPH_ENABLED = os.getenv("ROUTE_GRAPH_ENABLED", "false").lower() in ("1", "true", "yes")
+MIN_LAYOVER_MINUTES = int(os.getenv("MIN_LAYOVER_MINUTES", "45"))
+MAX_LAYOVER_MINUTES = int(os.getenv("MAX_LAYOVER_MINUTES", "360"))
+# Upper bound on the limit a connections search may ask for
+MAX_ITINERARIES = 200
+DepartureKey = Tuple[datetime, int]
+class Leg(NamedTuple):
+    """
+    A flight as the graph sees it: where and when, never seats or price.
+    """
+    id: int
+    origin: str
+    destination: str
+    departure_time: datetime
+    arrival_time: datetime
+# Column list for selecting Leg-shaped tuples
+LEG_COLUMNS = [getattr(Flight, name) for name in Leg._fields]
+def as_leg(row) -> Leg:
+    return Leg(*(getattr(row, name) for name in Leg._fields))
+class RouteGraph:
+    """
+    Airport graph for connecting-flight search. Each airport keeps its
+    outbound flights ordered by departure time, so the next leg after a
+    layover window is a bisect instead of an N-way self-join in SQL.
+    Only routes and times are held: those change by schedule ingest, which
+    every worker picks up, while seats and prices also move in other
+    processes, so callers re-read them for the legs found.
+    Built on first use (or at startup) and kept current by apply().
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[int, Leg] = {}
+        self._keys: Dict[str, List[DepartureKey]] = {}
+        self._departures: Dict[str, List[Leg]] = {}
+        self.built = False
+    def rebuild(self, db: Session) -> int:
+        rows = [Leg(*r) for r in db.execute(select(*LEG_COLUMNS))]
+        rows.sort(key=lambda r: (r.departure_time, r.id))
+        keys: Dict[str, List[DepartureKey]] = {}
+        departures: Dict[str, List[Leg]] = {}
+        for row in rows:
+            keys.setdefault(row.origin, []).append((row.departure_time, row.id))
+            departures.setdefault(row.origin, []).append(row)
+        with self._lock:
+            self._rows = {row.id: row for row in rows}
+            self._keys = keys
+            self._departures = departures
+            self.built = True
+        return len(rows)
+    def apply(self, rows: Iterable) -> None:
+        """
+        Replace committed flights (Flight or FlightRow-shaped) whose route or
+        times changed; a no-op until the graph is built.
+        """
+        if not self.built:
+            return
+        with self._lock:
+            for row in map(as_leg, rows):
+                old = self._rows.get(row.id)
+                if old == row:
+                    continue
+                if old is not None:
+                    self._remove(old)
+                key = (row.departure_time, row.id)
+                keys = self._keys.setdefault(row.origin, [])
+                index = bisect_left(keys, key)
+                keys.insert(index, key)
+                self._departures.setdefault(row.origin, []).insert(index, row)
+                self._rows[row.id] = row
+    def _remove(self, row: Leg) -> None:
+        keys = self._keys.get(row.origin, [])
+        index = bisect_left(keys, (row.departure_time, row.id))
+        if index < len(keys) and keys[index] == (row.departure_time, row.id):
+            del keys[index]
+            del self._departures[row.origin][index]
+    def _departing(self, airport: str, start: datetime, end: datetime) -> List[Leg]:
+        keys = self._keys.get(airport, [])
+        low = bisect_left(keys, (start, -1))
+        high = bisect_left(keys, (end, float("inf")))
+        return self._departures[airport][low:high]
+    def itineraries(
+        self,
+        origin: str,
+        destination: str,
+        travel_date: date,
+        max_stops: int,
+        min_layover: timedelta,
+        max_layover: timedelta,
+    ) -> List[List[Leg]]:
+        """
+        Depth-first search for itineraries whose first leg departs on
+        travel_date, with at most max_stops connections, each layover within
+        [min_layover, max_layover] and no revisited airports. Every match is
+        returned: the graph holds no seats or prices, so the caller drops
+        sold-out legs, ranks what is left and cuts to its limit afterwards.
+        """
+        day_start = datetime.combine(travel_date, datetime.min.time())
+        day_end = datetime.combine(travel_date, datetime.max.time())
+        found: List[List[Leg]] = []
+        with self._lock:
+            def extend(path: List[Leg], visited: set):
+                last = path[-1]
+                if last.destination == destination:
+                    found.append(list(path))
+                    return
+                if len(path) > max_stops:
+                    return
+                for leg in self._departing(last.destination, last.arrival_time + min_layover, last.arrival_time + max_layover):
+                    if leg.destination not in visited:
+                        path.append(leg)
+                        visited.add(leg.destination)
+                        extend(path, visited)
+                        visited.discard(leg.destination)
+                        path.pop()
+            for first in self._departing(origin, day_start, day_end):
+                if first.destination != origin:
+                    extend([first], {origin, first.destination})
+        return found
+route_graph = RouteGraph()
@@ -0,0 +1,296 @@
+"""
+Streaming ingestion of airline schedule feeds in the /api/external/mock-schedule
+format, either the JSON document ({"provider": ..., "flights": [...]}) or one
+flight object per line (NDJSON). Flights are upserted in batches keyed by
+flight_no + departure_time; the feed is never held in memory as a whole.
+
+The ingest usually runs in its own process, so it bumps the "flights" data
+generation; running API processes rebuild their flight index, route graph and
+search cache on the next simulator tick after seeing it move.
+
+    python -m backend.schedule_ingest feed.ndjson
+    python -m backend.schedule_ingest "http://localhost:8000/api/external/mock-schedule?count=100000"
+"""
+import argparse
+import io
+import json
+import time
+import urllib.request
+from datetime import datetime,timedelta
+from typing import Dict,Iterable,Iterator,List,Tuple
+from pydantic import ValidationError
+from sqlalchemy import bindparam,case,insert,select,tuple_,update
+from sqlalchemy.orm import Session
+from .db import SessionLocal
+from .fare_calendar import refresh_fare_calendar
+from .generations import bump_generation
+from .flight_index import FLIGHT_ROW_COLUMNS,FlightRow,flight_index
+from .models import Flight
+from .price_snapshots import as_price,compute_prices
+from .route_graph import route_graph
+from .schemas import ScheduleFlightIn
+from .search_cache import route_days,search_cache
+from .seat_map import cap_seats_available,resize_seat_maps
+INGEST_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\r\n"
+FlightKey = Tuple[str, datetime]
+def iter_ndjson(chunks: Iterable[str]) -> Iterator[dict]:
+    """
+    One flight object per line; blank lines are skipped.
+    """
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
+class _JSONStream:
+    """
+    Minimal pull parser over text chunks: decodes one JSON value at a time with
+    raw_decode, reading more input only when the buffered text is incomplete.
+    """
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of schedule feed")
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self._pos} of the buffered feed")
+        self._pos += 1
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the buffer edge may be cut short; make sure the token ended
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+_DECODER = json.JSONDecoder()
+def iter_feed_json(chunks: Iterable[str]) -> Iterator[dict]:
+    """
+    Yield the elements of the top-level "flights" array one by one; other
+    top-level keys (provider, generated_at) are decoded and discarded.
+    """
+    stream = _JSONStream(chunks)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "flights":
+            stream.expect("[")
+            if stream.peek() != "]":
+                while True:
+                    yield stream.value()
+                    if stream.peek() != ",":
+                        break
+                    stream.expect(",")
+            stream.expect("]")
+        else:
+            stream.value()
+        if stream.peek() != ",":
+            break
+        stream.expect(",")
+    stream.expect("}")
+def open_feed(source: str) -> Tuple[Iterator[str], bool]:
+    """
+    Text chunks from a local file or an http(s) URL, plus whether the feed is NDJSON
+    (by .ndjson/.jsonl extension or Content-Type).
+    """
+    if source.startswith(("http://", "https://")):
+        response = urllib.request.urlopen(urllib.request.Request(source, headers={"Accept": "application/json"}))
+        ndjson = "ndjson" in response.headers.get("Content-Type", "")
+        return _read_chunks(io.TextIOWrapper(response, encoding="utf-8")), ndjson
+    return _read_chunks(open(source, encoding="utf-8")), source.endswith((".ndjson", ".jsonl"))
+def _read_chunks(stream) -> Iterator[str]:
+    with stream:
+        while True:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+_MOCK_CITIES = ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Kolkata", "Hyderabad", "Pune", "Goa"]
+_MOCK_AIRLINES = ["AirIndia", "Vistara", "IndiGo", "SpiceJet", "AirAsia", "Akasa"]
+def mock_flight(i: int, start: datetime) -> dict:
+    """
+    Deterministic synthetic flight number i in the mock-schedule format.
+    """
+    origin = _MOCK_CITIES[i % len(_MOCK_CITIES)]
+    destination = _MOCK_CITIES[(i // len(_MOCK_CITIES) + i + 1) % len(_MOCK_CITIES)]
+    if destination == origin:
+        destination = _MOCK_CITIES[(i + 1) % len(_MOCK_CITIES)]
+    duration = 60 + (i * 7) % 180
+    departure = start + timedelta(minutes=(i * 37) % (14 * 24 * 60))
+    total_seats = (120, 180, 220)[i % 3]
+    return {
+        "flight_no": f"MK{i + 1}",
+        "airline_name": _MOCK_AIRLINES[i % len(_MOCK_AIRLINES)],
+        "origin": origin,
+        "destination": destination,
+        "departure_time": departure.strftime("%Y-%m-%d %H:%M:%S"),
+        "arrival_time": (departure + timedelta(minutes=duration)).strftime("%Y-%m-%d %H:%M:%S"),
+        "duration_minutes": duration,
+        "base_fare": 3000.0 + (i * 131) % 6000,
+        "total_seats": total_seats,
+        "seats_available": (i * 13) % (total_seats + 1),
+    }
+def stream_mock_schedule(count: int, ndjson: bool, provider: str, start: datetime, chunk_size: int = 500) -> Iterator[str]:
+    """
+    Generate a large feed chunk by chunk, as the JSON document or as NDJSON.
+    """
+    if not ndjson:
+        yield json.dumps({"provider": provider, "generated_at": datetime.utcnow().isoformat() + "Z"})[:-1] + ', "flights": ['
+    for offset in range(0, count, chunk_size):
+        lines = [json.dumps(mock_flight(i, start)) for i in range(offset, min(count, offset + chunk_size))]
+        if ndjson:
+            yield "\n".join(lines) + "\n"
+        else:
+            yield ("," if offset else "") + ",".join(lines)
+    if not ndjson:
+        yield "]}"
+def upsert_flights(db: Session, batch: List[ScheduleFlightIn]) -> Tuple[int, int]:
+    """
+    Insert or update one batch keyed by (flight_no, departure_time), with a
+    fresh price snapshot; later duplicates in the batch win. The feed's
+    seats_available only seeds new flights: existing flights keep their booked
+    seats and move by the change in total_seats, clamped in SQL and to the
+    seats their resized seat map can still assign. Refreshes the
+    derived read models after commit and returns (inserted, updated).
+    """
+    latest: Dict[FlightKey, ScheduleFlightIn] = {(f.flight_no, f.departure_time): f for f in batch}
+    previous = [
+        FlightRow(*r)
+        for r in db.execute(
+            select(*FLIGHT_ROW_COLUMNS)
+            .where(tuple_(Flight.flight_no, Flight.departure_time).in_(list(latest))))]
+    existing = {(r.flight_no, r.departure_time): r for r in previous}
+    new = [f for key, f in latest.items() if key not in existing]
+    priced_at = datetime.utcnow()
+    inserts = [
+        {**f.model_dump(), "current_price": as_price(price), "priced_at": priced_at}
+        for f, price in zip(new, compute_prices(new, "ingest"))]
+    updates, resizes = [], []
+    for key, f in latest.items():
+        old = existing.get(key)
+        if old is None:
+            continue
+        updates.append({"id": old.id, **f.model_dump(exclude={"seats_available"})})
+        if f.total_seats != old.total_seats:
+            resizes.append({"b_id": old.id, "b_total": f.total_seats})
+    if resizes:
+        # runs before the column update, so total_seats is still the old capacity here
+        table = Flight.__table__
+        seats = table.c.seats_available + bindparam("b_total") - table.c.total_seats
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(seats_available=case((seats < 0, 0), (seats > bindparam("b_total"), bindparam("b_total")), else_=seats)),
+            resizes)
+    if updates:
+        db.execute(update(Flight), updates)
+        resize_seat_maps(db, {r["b_id"]: r["b_total"] for r in resizes})
+        cap_seats_available(db, [u["id"] for u in updates])
+    if inserts:
+        db.execute(insert(Flight), inserts)
+    rows = [
+        FlightRow(*r)
+        for r in db.execute(
+            select(*FLIGHT_ROW_COLUMNS)
+            .where(tuple_(Flight.flight_no, Flight.departure_time).in_(list(latest))))]
+    # updated flights are priced from the seat counts they now hold, and stamped once their rows are locked
+    updated_ids = {u["id"] for u in updates}
+    repriced = [r for r in rows if r.id in updated_ids]
+    prices = {r.id: as_price(price) for r, price in zip(repriced, compute_prices(repriced, "ingest"))}
+    repriced_at = datetime.utcnow()
+    if prices:
+        db.execute(update(Flight), [{"id": flight_id, "current_price": price, "priced_at": repriced_at} for flight_id, price in prices.items()])
+    rows = [
+        r._replace(current_price=prices[r.id], priced_at=repriced_at) if r.id in prices else r._replace(priced_at=priced_at)
+        for r in rows]
+    bump_generation(db)
+    # a feed may move an existing flight to another route, so both sides are touched
+    touched = route_days(rows) | route_days(previous)
+    db.commit()
+    refresh_fare_calendar(touched)
+    flight_index.apply(rows)
+    route_graph.apply(rows)
+    search_cache.invalidate(touched)
+    return len(inserts), len(updates)
+def ingest_feed(chunks: Iterable[str], ndjson: bool = False, batch_size: int = INGEST_BATCH_SIZE) -> dict:
+    """
+    Stream a schedule feed into the flights table. Rows that fail validation
+    are counted and skipped rather than aborting the load.
+    """
+    started = time.perf_counter()
+    report = {"rows": 0, "inserted": 0, "updated": 0, "rejected": 0}
+    records = iter_ndjson(chunks) if ndjson else iter_feed_json(chunks)
+    db = SessionLocal()
+    try:
+        batch: List[ScheduleFlightIn] = []
+        for record in records:
+            report["rows"] += 1
+            try:
+                batch.append(ScheduleFlightIn.model_validate(record))
+            except ValidationError:
+                report["rejected"] += 1
+                continue
+            if len(batch) >= batch_size:
+                inserted, updated = upsert_flights(db, batch)
+                report["inserted"] += inserted
+                report["updated"] += updated
+                batch = []
+        if batch:
+            inserted, updated = upsert_flights(db, batch)
+            report["inserted"] += inserted
+            report["updated"] += updated
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows"] / elapsed, 1) if elapsed else None
+    return report
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="feed file (.json, .ndjson/.jsonl) or http(s) URL")
+    parser.add_argument("--ndjson", action="store_true", help="force NDJSON parsing")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+    chunks, ndjson = open_feed(args.source)
+    report = ingest_feed(chunks, ndjson or args.ndjson, args.batch_size)
+    print("  ".join(f"{key}={value}" for key, value in report.items()))
+if __name__ == "__main__":
+    main()
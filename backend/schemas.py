@@ -1,6 +1,6 @@
-from datetime import datetime
-from pydantic import BaseModel
-from typing import Optional
+from datetime import date,datetime
+from pydantic import BaseModel,BeforeValidator,Field,model_validator
+from typing import Annotated,List,Optional
 class FlightOut(BaseModel):
     id: int
     flight_no: str
@@ -15,8 +15,38 @@ class FlightOut(BaseModel):
     seats_available: int
     class Config:
         from_attributes = True
+def _city_name(value):
+    return value.strip().title() if isinstance(value, str) else value
+# Searches compare title-cased city names, so feeds are stored the same way
+CityName = Annotated[str, BeforeValidator(_city_name)]
+class ScheduleFlightIn(BaseModel):
+    flight_no: str = Field(..., max_length=10)
+    airline_name: str
+    origin: CityName
+    destination: CityName
+    departure_time: datetime
+    arrival_time: datetime
+    duration_minutes: int = Field(..., gt=0)
+    base_fare: float = Field(..., gt=0)
+    total_seats: int = Field(..., gt=0)
+    seats_available: int = Field(..., ge=0)
+    @model_validator(mode="after")
+    def check_schedule(self):
+        if self.seats_available > self.total_seats:
+            raise ValueError("seats_available must not exceed total_seats")
+        if self.arrival_time <= self.departure_time:
+            raise ValueError("arrival_time must be after departure_time")
+        return self
 class FlightWithPriceOut(FlightOut):
     dynamic_price: float
+class ItineraryOut(BaseModel):
+    legs: List[FlightWithPriceOut]
+    stops: int
+    layover_minutes: List[int]
+    departure_time: datetime
+    arrival_time: datetime
+    total_duration_minutes: int
+    total_price: float
 class FareHistoryOut(BaseModel):
     recorded_at: datetime
     dynamic_price: float
@@ -24,10 +54,54 @@ class FareHistoryOut(BaseModel):
     demand_level: Optional[str]
     class Config:
         from_attributes = True
+class FareRollupOut(BaseModel):
+    resolution: str
+    bucket_start: datetime
+    open_price: float
+    high_price: float
+    low_price: float
+    close_price: float
+    min_seats_available: int
+    samples: int
+    class Config:
+        from_attributes = True
+class FareCalendarDayOut(BaseModel):
+    day: date
+    min_price: float
+    flight_id: int
+    flights_available: int
+    class Config:
+        from_attributes = True
+class SeatMapOut(BaseModel):
+    flight_id: int
+    seat_letters: str
+    rows: int
+    business_rows: int
+    total_seats: int
+    # bookable seats: the flight's seats_available, never more than the bitmap's free seats
+    seats_free: int
+    # base64 bitmap, bit i (least significant first within each byte) set when seat i is taken
+    occupied: str
+def _blank_to_none(value):
+    return None if isinstance(value, str) and not value.strip() else value
+# The frontend sends an empty seat field as ""; blank means "assign one", like an omitted seat
+SeatNo = Annotated[Optional[str], BeforeValidator(_blank_to_none)]
 class BookingRequest(BaseModel):
     flight_id: int
     passenger_name: str
-    seat_no: Optional[str] = None
+    seat_no: SeatNo = None
+    quote_token: Optional[str] = None
+class QuoteOut(BaseModel):
+    token: str
+    flight_id: int
+    price: float
+    expires_at: datetime
+class GroupPassenger(BaseModel):
+    passenger_name: str
+    seat_no: SeatNo = None
+class GroupBookingRequest(BaseModel):
+    flight_id: int
+    passengers: List[GroupPassenger] = Field(..., min_length=1, max_length=9)
 class BookingResponse(BaseModel):
     pnr: str
     flight_id: int
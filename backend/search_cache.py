@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict,Iterable,Optional,Set,Tuple
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "30"))
+RouteDay = Tuple[str, str, date]
+SearchKey = Tuple[str, str, date, str, str]
+class SearchCache:
+    """
+    Bounded LRU of serialized, priced search responses with a TTL.
+    Entries are also dropped when a write touches a flight on their route/day.
+    Every invalidation also bumps that route/day's generation (clear() bumps
+    all of them): a reader takes generation() before it reads flights and
+    passes it to put(), which skips a response a write has overtaken since.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[SearchKey, Tuple[float, bytes]]" = OrderedDict()
+        self._by_route_day: Dict[RouteDay, Set[SearchKey]] = {}
+        self._generations: Dict[RouteDay, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+    def get(self, key: SearchKey) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, body = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+    def generation(self, key: SearchKey) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._generations.get(key[:3], 0)
+    def put(self, key: SearchKey, body: bytes, generation: Tuple[int, int]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(key[:3], 0)):
+                self.stale_puts += 1
+                return
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, body)
+            self._by_route_day.setdefault(key[:3], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+    def invalidate(self, route_days: Iterable[RouteDay]) -> None:
+        """
+        Drop every cached response for the given (origin, destination, day) keys.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            for route_day in set(route_days):
+                self._generations[route_day] = self._generations.get(route_day, 0) + 1
+                for key in self._by_route_day.pop(route_day, ()):
+                    if self._entries.pop(key, None) is not None:
+                        self.invalidations += 1
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._epoch += 1
+            self._generations.clear()
+            self._entries.clear()
+            self._by_route_day.clear()
+    def _drop(self, key: SearchKey) -> None:
+        self._entries.pop(key, None)
+        keys = self._by_route_day.get(key[:3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_route_day[key[:3]]
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts,
+            }
+def route_days(flights) -> Set[RouteDay]:
+    """
+    (origin, destination, service day) keys touched by the given flights.
+    """
+    return {(f.origin, f.destination, f.departure_time.date()) for f in flights}
+search_cache = SearchCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS)
@@ -0,0 +1,254 @@
+import base64
+import os
+import threading
+import time
+from typing import Callable,Dict,List,NamedTuple,Optional,Tuple
+from fastapi import HTTPException
+from sqlalchemy import bindparam,insert,select,update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import Booking,Flight,SeatMap
+SEAT_MAP_CACHE_TTL_SECONDS = float(os.getenv("SEAT_MAP_CACHE_TTL_SECONDS", "5"))
+SEAT_LETTERS = "ABCDEF"
+# One business row per this many seats, at the front of the cabin
+SEATS_PER_BUSINESS_ROW = 60
+class SeatMapState(NamedTuple):
+    flight_id: int
+    seat_letters: str
+    business_rows: int
+    total_seats: int
+    occupied: int
+    version: int
+    @property
+    def rows(self) -> int:
+        return -(-self.total_seats // len(self.seat_letters))
+    @property
+    def seats_free(self) -> int:
+        return self.total_seats - bin(self.occupied).count("1")
+    def label(self, index: int) -> str:
+        row, column = divmod(index, len(self.seat_letters))
+        return f"{row + 1}{self.seat_letters[column]}"
+    def index(self, seat_no: str) -> int:
+        """
+        Bit index of a seat like "12C"; 400 for anything outside this layout.
+        """
+        label = seat_no.strip().upper()
+        row, letter = label[:-1], label[-1:]
+        if not row.isdigit() or not letter or letter not in self.seat_letters:
+            raise HTTPException(status_code=400, detail=f"Invalid seat {seat_no!r}")
+        index = (int(row) - 1) * len(self.seat_letters) + self.seat_letters.index(letter)
+        if int(row) < 1 or index >= self.total_seats:
+            raise HTTPException(status_code=400, detail=f"Seat {label} does not exist on this flight")
+        return index
+    def bitmap(self) -> bytes:
+        return self.occupied.to_bytes((self.total_seats + 7) // 8, "little")
+    def encoded(self) -> str:
+        return base64.b64encode(self.bitmap()).decode()
+def seat_layout(total_seats: int) -> Tuple[str, int]:
+    return SEAT_LETTERS, total_seats // SEATS_PER_BUSINESS_ROW
+def first_free(occupied: int, total_seats: int) -> Optional[int]:
+    """
+    Lowest clear bit below total_seats, found with integer ops rather than a seat scan.
+    """
+    lowest = ~occupied & (occupied + 1)
+    index = lowest.bit_length() - 1
+    return index if index < total_seats else None
+class SeatInventory:
+    """
+    Seat maps by flight. The seat_maps row is the source of truth: every change
+    is a versioned UPDATE in the booking's transaction, tried first against the
+    cached bitmap and, when another writer got there first, once more against
+    the row re-read with FOR UPDATE. A cached map may predate another process's
+    change, so a result it calls a no-op or a refusal is only trusted once the
+    row has been re-read. Call remember() after the commit so the cache moves
+    to the new version.
+    """
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[float, SeatMapState]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+    def get(self, db: Session, flight: Flight) -> SeatMapState:
+        """
+        Seat map for reads; a flight without a seat_maps row yet is derived
+        from its bookings without writing, so this works on a read replica.
+        """
+        state = self._cached(flight.id, self.ttl_seconds)
+        if state is None:
+            state = self._load(db, flight, create=False)
+            self.remember(state)
+        return state
+    def claim(self, db: Session, flight: Flight, requested: List[Optional[str]]) -> Tuple[List[str], SeatMapState]:
+        """
+        Take one seat per entry: the named seat (409 if taken) or, for None,
+        the first free one. Named seats are taken first so auto-assignment
+        never grabs a seat someone in the same request asked for.
+        """
+        def take(state: SeatMapState):
+            occupied = state.occupied
+            indexes: List[Optional[int]] = [None] * len(requested)
+            for i, seat_no in enumerate(requested):
+                if seat_no is None:
+                    continue
+                index = state.index(seat_no)
+                if occupied >> index & 1:
+                    raise HTTPException(status_code=409, detail=f"Seat {state.label(index)} is already taken")
+                occupied |= 1 << index
+                indexes[i] = index
+            for i, index in enumerate(indexes):
+                if index is None:
+                    index = first_free(occupied, state.total_seats)
+                    if index is None:
+                        raise HTTPException(status_code=400, detail="No seats available")
+                    occupied |= 1 << index
+                    indexes[i] = index
+            return occupied, [state.label(index) for index in indexes]
+        return self._change(db, flight, take)
+    def release(self, db: Session, flight: Flight, seat_nos: List[Optional[str]]) -> Optional[SeatMapState]:
+        """
+        Free seats on cancellation. Seat numbers outside the layout (free-form
+        values from before seat maps existed) are ignored.
+        """
+        def free(state: SeatMapState):
+            occupied = state.occupied
+            for seat_no in seat_nos:
+                try:
+                    occupied &= ~(1 << state.index(seat_no))
+                except (HTTPException, AttributeError):
+                    continue
+            return occupied, None
+        _, state = self._change(db, flight, free)
+        return state
+    def remember(self, state: Optional[SeatMapState]) -> None:
+        if state is None:
+            return
+        with self._lock:
+            self._entries[state.flight_id] = (time.monotonic(), state)
+    def _cached(self, flight_id: int, max_age: Optional[float] = None) -> Optional[SeatMapState]:
+        with self._lock:
+            entry = self._entries.get(flight_id)
+            if entry is None or (max_age is not None and time.monotonic() - entry[0] > max_age):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+    def _change(self, db: Session, flight: Flight, change: Callable[[SeatMapState], tuple]):
+        state = self._cached(flight.id)
+        fresh = state is None
+        if fresh:
+            state = self._load(db, flight, create=True)
+        for attempt in range(2):
+            try:
+                occupied, result = change(state)
+            except HTTPException:
+                if fresh:
+                    raise
+                # e.g. a seat another process has since released; decide against the row
+                state, fresh = self._load(db, flight, create=True), True
+                continue
+            if occupied == state.occupied:
+                if fresh:
+                    return result, state
+                # e.g. releasing a seat another process took after this cache was filled
+                state, fresh = self._load(db, flight, create=True), True
+                continue
+            updated = state._replace(occupied=occupied, version=state.version + 1)
+            table = SeatMap.__table__
+            rowcount = db.execute(
+                update(table)
+                .where(table.c.flight_id == flight.id)
+                .where(table.c.version == state.version)
+                .values(occupied=updated.bitmap(), version=updated.version)).rowcount
+            if rowcount:
+                return result, updated
+            self.conflicts += 1
+            state, fresh = self._load(db, flight, create=True), True
+        raise HTTPException(status_code=409, detail="Seat map changed concurrently, please retry")
+    def _load(self, db: Session, flight: Flight, create: bool) -> SeatMapState:
+        query = select(SeatMap).where(SeatMap.flight_id == flight.id).execution_options(populate_existing=True)
+        row = db.scalar(query.with_for_update() if create else query)
+        if row is not None:
+            return SeatMapState(row.flight_id, row.seat_letters, row.business_rows, row.total_seats, int.from_bytes(row.occupied, "little"), row.version)
+        state = self._from_bookings(db, flight)
+        if not create:
+            return state
+        try:
+            with db.begin_nested():
+                db.execute(insert(SeatMap).values(
+                    flight_id=state.flight_id,
+                    seat_letters=state.seat_letters,
+                    business_rows=state.business_rows,
+                    total_seats=state.total_seats,
+                    occupied=state.bitmap(),
+                    version=state.version,))
+        except IntegrityError:
+            # another booking created it first
+            return self._load(db, flight, create=True)
+        return state
+    def _from_bookings(self, db: Session, flight: Flight) -> SeatMapState:
+        """
+        Initial map for a flight: seats already held by live bookings.
+        """
+        seat_letters, business_rows = seat_layout(flight.total_seats)
+        state = SeatMapState(flight.id, seat_letters, business_rows, flight.total_seats, 0, 0)
+        occupied = 0
+        for seat_no in db.scalars(
+                select(Booking.seat_no)
+                .where(Booking.flight_id == flight.id)
+                .where(Booking.status != "CANCELLED")
+                .where(Booking.seat_no.is_not(None))):
+            try:
+                occupied |= 1 << state.index(seat_no)
+            except HTTPException:
+                continue
+        return state._replace(occupied=occupied)
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "flights": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "conflicts": self.conflicts,
+            }
+seat_inventory = SeatInventory(SEAT_MAP_CACHE_TTL_SECONDS)
+def resize_seat_maps(db: Session, totals: Dict[int, int]) -> None:
+    """
+    Carry a capacity change over to existing seat maps. Seats past the new
+    capacity drop out of the map; the version bump makes cached maps reload.
+    """
+    if not totals:
+        return
+    changes = []
+    for row in db.scalars(select(SeatMap).where(SeatMap.flight_id.in_(list(totals))).with_for_update()):
+        total_seats = totals[row.flight_id]
+        state = SeatMapState(row.flight_id, row.seat_letters, seat_layout(total_seats)[1], total_seats, int.from_bytes(row.occupied, "little") & ((1 << total_seats) - 1), row.version + 1)
+        changes.append({"b_id": state.flight_id, "business_rows": state.business_rows, "total_seats": total_seats, "occupied": state.bitmap(), "version": state.version})
+    if changes:
+        table = SeatMap.__table__
+        db.execute(update(table).where(table.c.flight_id == bindparam("b_id")), changes)
+def cap_seats_available(db: Session, flight_ids: List[int]) -> Dict[int, int]:
+    """
+    Lower seats_available to the free seats in each flight's seat map, so the
+    counter never sells a seat the map cannot assign. Run it with the flight
+    rows already locked (bookings lock the flight before its seat map), after
+    anything that moves the counter or the capacity. Returns the capped counts.
+    """
+    if not flight_ids:
+        return {}
+    caps = {}
+    for flight_id, total_seats, occupied, seats_available in db.execute(
+            select(SeatMap.flight_id, SeatMap.total_seats, SeatMap.occupied, Flight.seats_available)
+            .join(Flight, Flight.id == SeatMap.flight_id)
+            .where(SeatMap.flight_id.in_(flight_ids))):
+        free = total_seats - bin(int.from_bytes(occupied, "little")).count("1")
+        if seats_available > free:
+            caps[flight_id] = free
+    if caps:
+        table = Flight.__table__
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(seats_available=bindparam("b_seats")),
+            [{"b_id": flight_id, "b_seats": seats} for flight_id, seats in caps.items()])
+    return caps
@@ -0,0 +1,342 @@
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime,timedelta
+from functools import partial
+from typing import List,Optional,Set,Tuple
+from sqlalchemy import bindparam,case,func,insert,select,update
+from sqlalchemy.orm import Session
+from .db import SessionLocal,engine
+from .dynamic_pricing import calculate_dynamic_prices
+from .fare_calendar import refresh_fare_calendar
+from .fare_rollups import update_rollups
+from .generations import read_generation
+from .metrics import simulator_flights_total,simulator_tick_duration,timed_pricing
+from .flight_index import FLIGHT_ROW_COLUMNS,FlightRow,flight_index
+from .models import FareHistory,Flight
+from .price_snapshots import TIME_BAND_EDGES_HOURS,as_price,reprice_band_crossings
+from .route_graph import route_graph
+from .search_cache import RouteDay,route_days,search_cache
+from .seat_map import cap_seats_available
+# Each tick touches max(SIMULATOR_SAMPLE_SIZE, SIMULATOR_FRACTION * fleet) flights
+SIMULATOR_SAMPLE_SIZE = int(os.getenv("SIMULATOR_SAMPLE_SIZE", "5"))
+SIMULATOR_FRACTION = float(os.getenv("SIMULATOR_FRACTION", "0"))
+SIMULATOR_INTERVAL_SECONDS = float(os.getenv("SIMULATOR_INTERVAL_SECONDS", "60"))
+SIMULATOR_BATCH_SIZE = 1000
+# SIMULATOR_SHARDS > 0 switches to the deterministic multi-process mode seeded by SIMULATOR_SEED
+SIMULATOR_SHARDS = int(os.getenv("SIMULATOR_SHARDS", "0"))
+SIMULATOR_SEED = int(os.getenv("SIMULATOR_SEED", "0"))
+simulator_stats = {
+    "ticks": 0,
+    "last_tick_ms": None,
+    "last_tick_flights": 0,
+    "last_tick_at": None,
+    "errors": 0,
+    "band_repriced": 0,
+    "read_model_rebuilds": 0,
+}
+# Flights generation this process's read models reflect; None until startup records it
+_flights_generation: Optional[int] = None
+# Local time the last band sweep covered up to; None until the first sweep
+_band_swept_at: Optional[datetime] = None
+def sample_flight_ids(db: Session, sample_size: int, fraction: float, rng=random) -> List[int]:
+    """
+    Pick random flight ids in SQL terms: draw candidate ids between min(id) and
+    max(id) and keep the ones that exist, so no Flight rows are hydrated.
+    Gaps in the id range can make the sample slightly smaller than requested.
+    """
+    low, high, count = db.execute(select(func.min(Flight.id), func.max(Flight.id), func.count(Flight.id))).one()
+    if not count:
+        return []
+    wanted = min(count, max(sample_size, round(fraction * count)))
+    candidates = rng.sample(range(low, high + 1), min(high - low + 1, wanted))
+    ids: List[int] = []
+    for start in range(0, len(candidates), SIMULATOR_BATCH_SIZE):
+        chunk = candidates[start:start + SIMULATOR_BATCH_SIZE]
+        ids.extend(db.scalars(select(Flight.id).where(Flight.id.in_(chunk))))
+    return ids
+def run_market_step(
+    sample_size: int = SIMULATOR_SAMPLE_SIZE,
+    fraction: float = SIMULATOR_FRACTION,
+    rng=random,
+) -> int:
+    """
+    One simulator tick: nudge seats on a sample of flights, reprice them in one
+    batch, and write the changes with bulk UPDATE / bulk INSERT.
+    Blocking; returns the number of flights touched.
+    """
+    db = SessionLocal()
+    try:
+        ids = sorted(sample_flight_ids(db, sample_size, fraction, rng))
+        if not ids:
+            return 0
+        deltas = [rng.randint(-5, 5) for _ in ids]
+        demand_values = [None] * len(ids)
+        if hasattr(Flight, "demand_level"):
+            demand_values = [rng.choice(["low", "medium", "high"]) for _ in ids]
+        rows = write_market_rows(db, ids, deltas, demand_values, datetime.utcnow())
+        db.commit()
+        refresh_fare_calendar(route_days(rows))
+        flight_index.apply(rows)
+        search_cache.invalidate(route_days(rows))
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+def write_market_rows(
+    db: Session,
+    ids: List[int],
+    deltas: List[int],
+    demand_values: List[Optional[str]],
+    recorded_at: datetime,
+    now: Optional[datetime] = None,
+) -> List[FlightRow]:
+    """
+    Nudge seats_available by a delta per flight, then reprice the resulting
+    rows in one batch and stage the price snapshots, fare history and rollups;
+    the caller commits. The seat change is relative and clamped in SQL, so a
+    booking that commits after the sample was drawn is never overwritten, and
+    it never rises past the seats the flight's seat map can still assign.
+    Returns the updated rows, in id order, carrying their new price snapshot.
+    """
+    table = Flight.__table__
+    seats = table.c.seats_available + bindparam("b_delta")
+    nudge = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(seats_available=case((seats < 0, 0), (seats > table.c.total_seats, table.c.total_seats), else_=seats)))
+    changes = sorted(zip(ids, deltas, demand_values))
+    rows: List[FlightRow] = []
+    for start in range(0, len(changes), SIMULATOR_BATCH_SIZE):
+        chunk = changes[start:start + SIMULATOR_BATCH_SIZE]
+        db.execute(nudge, [{"b_id": flight_id, "b_delta": delta} for flight_id, delta, _ in chunk])
+        cap_seats_available(db, [c[0] for c in chunk])
+        # the rows are locked by the UPDATE until commit, so this read is what gets priced
+        rows.extend(FlightRow(*r) for r in db.execute(select(*FLIGHT_ROW_COLUMNS).where(Flight.id.in_([c[0] for c in chunk]))))
+    rows.sort(key=lambda r: r.id)
+    # stamped once the rows are locked, so it orders this write after any booking that held them first
+    priced_at = datetime.utcnow()
+    demand_by_id = {flight_id: demand_value for flight_id, _, demand_value in changes}
+    demand_values = [demand_by_id[r.id] for r in rows]
+    with timed_pricing("simulator", len(rows)):
+        final_prices = calculate_dynamic_prices(
+            base_fares=[float(r.base_fare) for r in rows],
+            seats_available=[r.seats_available for r in rows],
+            total_seats=[r.total_seats for r in rows],
+            departure_times=[r.departure_time for r in rows],
+            airline_names=[r.airline_name for r in rows],
+            demand_levels=demand_values,
+            now=now,)
+    prices = final_prices.tolist()
+    rows = [r._replace(current_price=as_price(price), priced_at=priced_at) for r, price in zip(rows, prices)]
+    updates = [{"id": r.id, "current_price": r.current_price, "priced_at": priced_at} for r in rows]
+    if hasattr(Flight, "demand_level"):
+        for u, demand_value in zip(updates, demand_values):
+            u["demand_level"] = demand_value
+    history = [
+        {
+            "flight_id": r.id,
+            "recorded_at": recorded_at,
+            "dynamic_price": price,
+            "seats_available": r.seats_available,
+            "demand_level": demand_value,
+        }
+        for r, demand_value, price in zip(rows, demand_values, prices)]
+    for start in range(0, len(rows), SIMULATOR_BATCH_SIZE):
+        db.execute(update(Flight), updates[start:start + SIMULATOR_BATCH_SIZE])
+        db.execute(insert(FareHistory), history[start:start + SIMULATOR_BATCH_SIZE])
+    update_rollups(db, history, SIMULATOR_BATCH_SIZE)
+    return rows
+def shard_rng(seed: int, tick: int, shard: int) -> random.Random:
+    """
+    Independent, reproducible stream per (seed, tick, shard); string seeds hash
+    the same way in every process, unlike hash() of a tuple.
+    """
+    return random.Random(f"{seed}:{tick}:{shard}")
+def _init_shard_worker():
+#      Forked workers must not reuse the parent's pooled connections.
+    engine.dispose(close=False)
+def shard_ranges(low: int, high: int, shards: int) -> List[Tuple[int, int]]:
+    """
+    Split the id range [low, high] into `shards` contiguous [start, end) ranges.
+    """
+    size = -(-(high - low + 1) // shards)
+    return [(low + i * size, min(high + 1, low + (i + 1) * size)) for i in range(shards)]
+def run_shard_step(
+    shard: int,
+    id_range: Tuple[int, int],
+    seed: int,
+    tick: int,
+    fraction: float,
+    clock: Optional[datetime] = None,
+    collect_rows: bool = False,
+) -> Tuple[int, Set[RouteDay], List[FlightRow]]:
+    """
+    One tick for the flights with start <= id < end, run in a worker process;
+    the primary key range is an index scan of only this shard's rows.
+    Flights are visited in id order and every draw comes from the shard's own
+    RNG, so the same seed, tick, starting data and clock always produce the same
+    seat changes, demand levels and prices. Commits once per batch.
+    Returns (flights touched, route/days touched, touched rows if collect_rows).
+    """
+    rng = shard_rng(seed, tick, shard)
+    start_id, end_id = id_range
+    recorded_at = clock or datetime.utcnow()
+    touched, keys, collected = 0, set(), []
+    db = SessionLocal()
+    try:
+        ids = [
+            flight_id
+            for flight_id in db.scalars(select(Flight.id).where(Flight.id >= start_id).where(Flight.id < end_id).order_by(Flight.id))
+            if rng.random() < fraction]
+        for start in range(0, len(ids), SIMULATOR_BATCH_SIZE):
+            chunk = ids[start:start + SIMULATOR_BATCH_SIZE]
+            deltas = [rng.randint(-5, 5) for _ in chunk]
+            demand_values = [rng.choice(["low", "medium", "high"]) for _ in chunk]
+            rows = write_market_rows(db, chunk, deltas, demand_values, recorded_at, now=clock)
+            db.commit()
+            touched += len(rows)
+            keys |= route_days(rows)
+            if collect_rows:
+                collected.extend(rows)
+        return touched, keys, collected
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+_shard_pool: Optional[ProcessPoolExecutor] = None
+def shard_pool(shards: int) -> ProcessPoolExecutor:
+    global _shard_pool
+    if _shard_pool is None:
+        _shard_pool = ProcessPoolExecutor(max_workers=shards, initializer=_init_shard_worker)
+    return _shard_pool
+def shutdown_shard_pool() -> None:
+    global _shard_pool
+    if _shard_pool is not None:
+        _shard_pool.shutdown(wait=True, cancel_futures=True)
+        _shard_pool = None
+def run_sharded_step(
+    tick: int,
+    shards: int = SIMULATOR_SHARDS,
+    seed: int = SIMULATOR_SEED,
+    fraction: float = SIMULATOR_FRACTION,
+    clock: Optional[datetime] = None,
+) -> int:
+    """
+    Fan one tick out over the shard pool, then refresh the shared derived state
+    (fare calendar, flight index, search cache) once in this process.
+    Shards own disjoint id ranges, so workers never contend on a row.
+    Blocking; returns the number of flights touched.
+    """
+    db = SessionLocal()
+    try:
+        low, high, fleet = db.execute(select(func.min(Flight.id), func.max(Flight.id), func.count(Flight.id))).one()
+    finally:
+        db.close()
+    if not fleet:
+        return 0
+    if fraction <= 0:
+        fraction = min(1.0, SIMULATOR_SAMPLE_SIZE / fleet)
+    # the route graph holds no seats or prices, so only the flight index needs the rows
+    collect_rows = flight_index.enabled
+    pool = shard_pool(shards)
+    results = list(pool.map(run_shard_step, *zip(*[
+        (shard, id_range, seed, tick, fraction, clock, collect_rows) for shard, id_range in enumerate(shard_ranges(low, high, shards))])))
+    touched = sum(count for count, _, _ in results)
+    keys = set().union(*(shard_keys for _, shard_keys, _ in results))
+    rows = [row for _, _, shard_rows in results for row in shard_rows]
+    refresh_fare_calendar(keys)
+    flight_index.apply(rows)
+    search_cache.invalidate(keys)
+    return touched
+def run_band_sweep(now: Optional[datetime] = None) -> int:
+    """
+    Reprice every flight whose time-to-departure band changed since the last
+    sweep, whether or not this tick sampled it. The first sweep in a process
+    looks back over the widest band, which covers any snapshot older than it.
+    Blocking; returns the number of flights repriced.
+    """
+    global _band_swept_at
+    now = now or datetime.now()
+    since = _band_swept_at or now - timedelta(hours=max(TIME_BAND_EDGES_HOURS))
+    db = SessionLocal()
+    try:
+        # commits batch by batch
+        rows = reprice_band_crossings(db, since, now, SIMULATOR_BATCH_SIZE)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    _band_swept_at = now
+    keys = route_days(rows)
+    refresh_fare_calendar(keys)
+    flight_index.apply(rows)
+    search_cache.invalidate(keys)
+    return len(rows)
+def sync_read_models() -> bool:
+    """
+    Rebuild the flight index, route graph and search cache when another process
+    (a schedule ingest) moved the flights generation. The first call only
+    records the generation, so startup calls it before building them.
+    Blocking; returns True when the read models were rebuilt.
+    """
+    global _flights_generation
+    db = SessionLocal()
+    try:
+        generation = read_generation(db)
+        if _flights_generation is None or generation == _flights_generation:
+            _flights_generation = generation
+            return False
+        # the generation is read first, so a bump during the rebuild triggers another one next tick
+        if flight_index.enabled:
+            flight_index.rebuild(db)
+        if route_graph.built:
+            route_graph.rebuild(db)
+        search_cache.clear()
+        _flights_generation = generation
+        return True
+    finally:
+        db.close()
+async def simulate_market_step():
+    """
+    Run one tick in the default executor so the event loop keeps serving requests.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    tick = simulator_stats["ticks"]
+    if SIMULATOR_SHARDS > 0:
+        step = partial(run_sharded_step, tick)
+    else:
+        step = run_market_step
+    try:
+        if await loop.run_in_executor(None, sync_read_models):
+            simulator_stats["read_model_rebuilds"] += 1
+        touched = await loop.run_in_executor(None, step)
+        simulator_stats["band_repriced"] += await loop.run_in_executor(None, run_band_sweep)
+    except Exception as e:
+        # shards commit batch by batch, so a failed tick may be half applied; the
+        # next one moves on to a new seed instead of replaying the same draws
+        simulator_stats["ticks"] = tick + 1
+        simulator_stats["errors"] += 1
+        print(f"[SIMULATOR ERROR] tick {tick}: {e}")
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    simulator_tick_duration.observe(elapsed_ms / 1000)
+    simulator_flights_total.inc(touched)
+    simulator_stats.update(
+        ticks=tick + 1,
+        last_tick_ms=round(elapsed_ms, 2),
+        last_tick_flights=touched,
+        last_tick_at=datetime.utcnow().isoformat() + "Z",)
+    print(f"[SIMULATOR] tick updated {touched} flights in {elapsed_ms:.1f} ms")
+async def scheduler_loop(interval_seconds: Optional[float] = None):
+#      Runs simulate_market_step() periodically.
+    while True:
+        await simulate_market_step()
+        await asyncio.sleep(interval_seconds or SIMULATOR_INTERVAL_SECONDS)
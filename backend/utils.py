@@ -1,6 +1,100 @@
-import random
+import asyncio
+import hashlib
+import hmac
+import os
 import string
+import threading
+from sqlalchemy import select,update
+PNR_ALPHABET = string.ascii_uppercase + string.digits
+PNR_LENGTH = 8
+PNR_SPACE = len(PNR_ALPHABET) ** PNR_LENGTH
+# 36^8 == 6^8 * 6^8, so a balanced Feistel network over two halves mod 6^8 is
+# a permutation of the whole PNR space: distinct sequence numbers always give
+# distinct PNRs, and without the key they cannot be predicted from each other
+_PNR_HALF = 6 ** 8
+_PNR_ROUNDS = 6
+PNR_BLOCK_SIZE = int(os.getenv("PNR_BLOCK_SIZE", "1000"))
+# Every process that allocates PNRs must use the same key. Without PNR_SECRET
+# the random per-database key that migrate stores in pnr_blocks is used.
+PNR_SECRET = os.getenv("PNR_SECRET", "").encode()
+PNR_KEY_ROW = "pnr_key"
+def _pnr_round(key: bytes, round_no: int, half: int) -> int:
+    digest = hmac.new(key, f"{round_no}:{half}".encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], "big") % _PNR_HALF
+def encode_pnr(sequence: int, key: bytes) -> str:
+    left, right = divmod(sequence % PNR_SPACE, _PNR_HALF)
+    for round_no in range(_PNR_ROUNDS):
+        left, right = right, (left + _pnr_round(key, round_no, right)) % _PNR_HALF
+    value = left * _PNR_HALF + right
+    chars = []
+    for _ in range(PNR_LENGTH):
+        value, digit = divmod(value, len(PNR_ALPHABET))
+        chars.append(PNR_ALPHABET[digit])
+    return "".join(reversed(chars))
+class PnrAllocator:
+    """
+    Hands out PNRs from per-process blocks of a database sequence.
+    Each refill atomically bumps pnr_blocks.next_value by block_size in its own
+    short transaction, so workers never overlap and no booking needs a retry.
+    Sequence numbers are encrypted with the shared PNR key before encoding.
+    """
+    def __init__(self, block_size: int = PNR_BLOCK_SIZE, name: str = "pnr"):
+        self.block_size = block_size
+        self.name = name
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._key = PNR_SECRET
+    def _claim_block(self) -> int:
+        from .db import SessionLocal
+        from .models import PnrBlock
+        db = SessionLocal()
+        try:
+            bump = update(PnrBlock).where(PnrBlock.name == self.name).values(next_value=PnrBlock.next_value + self.block_size)
+            if db.get_bind().dialect.update_returning:
+                end = db.scalar(bump.returning(PnrBlock.next_value))
+            else:
+                db.execute(bump)
+                end = db.scalar(select(PnrBlock.next_value).where(PnrBlock.name == self.name))
+            if end is None:
+                raise RuntimeError(f"pnr_blocks row {self.name!r} is missing")
+            if end > PNR_SPACE:
+                raise RuntimeError("PNR sequence exhausted")
+            if not self._key:
+                stored = db.scalar(select(PnrBlock.next_value).where(PnrBlock.name == PNR_KEY_ROW))
+                if stored is None:
+                    raise RuntimeError("PNR key is missing; set PNR_SECRET or run python -m backend.migrate")
+                self._key = str(stored).encode()
+            db.commit()
+            return end - self.block_size
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    def allocate(self) -> str:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._claim_block()
+                self._end = self._next + self.block_size
+            sequence = self._next
+            self._next += 1
+        return encode_pnr(sequence, self._key)
+    async def allocate_async(self) -> str:
+        """
+        allocate() for the event loop: a PNR from the current block is taken
+        in place, and only a block refill (a blocking DB round-trip) moves to a thread.
+        """
+        with self._lock:
+            sequence = None
+            if self._next < self._end:
+                sequence = self._next
+                self._next += 1
+        if sequence is None:
+            return await asyncio.to_thread(self.allocate)
+        return encode_pnr(sequence, self._key)
+pnr_allocator = PnrAllocator()
 def generate_pnr() -> str:
-    letters = string.ascii_uppercase
-    digits = string.digits
-    return "".join(random.choices(letters + digits, k=8))
\ No newline at end of file
+    return pnr_allocator.allocate()
+async def generate_pnr_async() -> str:
+    return await pnr_allocator.allocate_async()
@@ -0,0 +1,96 @@
+"""
+Booking throughput on one hot flight: SELECT ... FOR UPDATE ("lock") versus a
+single conditional UPDATE ("atomic").
+
+    python -m benchmarks.booking_contention --workers 16 --seats 2000
+
+Point --database-url (or DATABASE_URL) at MySQL to measure real row-lock
+contention. Without it a throwaway SQLite file is used, where every writer
+serializes on the database lock, so only the relative numbers are meaningful.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime,timedelta
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--seats", type=int, default=1000)
+    parser.add_argument("--oversubscribe", type=float, default=1.1, help="attempts per seat, >1 exercises the sold-out path")
+    parser.add_argument("--strategies", nargs="+", default=["lock", "atomic"], choices=["lock", "atomic"])
+    return parser.parse_args()
+def seed_hot_flight(SessionLocal, Flight, seats: int) -> int:
+    db = SessionLocal()
+    try:
+        departure = datetime.now() + timedelta(days=2)
+        flight = Flight(
+            flight_no="HOT1",
+            airline_name="IndiGo",
+            origin="Mumbai",
+            destination="Delhi",
+            departure_time=departure,
+            arrival_time=departure + timedelta(minutes=130),
+            duration_minutes=130,
+            base_fare=5000,
+            total_seats=seats,
+            seats_available=seats,)
+        db.add(flight)
+        db.commit()
+        return flight.id
+    finally:
+        db.close()
+def run_strategy(strategy: str, args) -> dict:
+    from fastapi import HTTPException
+    from backend.db import SessionLocal
+    from backend.main import book_seat
+    from backend.migrate import migrate
+    from backend.models import Booking,Flight
+    from backend.schemas import BookingRequest
+    migrate()
+    flight_id = seed_hot_flight(SessionLocal, Flight, args.seats)
+    attempts = int(args.seats * args.oversubscribe)
+    outcomes = {"booked": 0, "sold_out": 0, "errors": 0}
+    def attempt(i: int) -> str:
+        db = SessionLocal()
+        try:
+            book_seat(db, BookingRequest(flight_id=flight_id, passenger_name=f"Passenger {i}"), strategy)
+            return "booked"
+        except HTTPException as e:
+            return "sold_out" if e.status_code == 400 else "errors"
+        finally:
+            db.close()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for outcome in pool.map(attempt, range(attempts)):
+            outcomes[outcome] += 1
+    elapsed = time.perf_counter() - started
+    db = SessionLocal()
+    try:
+        seats_left = db.get(Flight, flight_id).seats_available
+        sold = db.query(Booking).filter(Booking.flight_id == flight_id).count()
+    finally:
+        db.close()
+    return {
+        "strategy": strategy,
+        "attempts": attempts,
+        "seconds": round(elapsed, 3),
+        "bookings_per_second": round(outcomes["booked"] / elapsed, 1),
+        **outcomes,
+        "seats_left": seats_left,
+        "consistent": sold + seats_left == args.seats,
+    }
+def main():
+    args = parse_args()
+    if not args.database_url:
+        args.database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "booking_contention.db")
+    # backend.db builds its engine at import time, so the URL must be set first
+    os.environ["DATABASE_URL"] = args.database_url
+    print(f"database: {args.database_url}  workers: {args.workers}  seats: {args.seats}")
+    for strategy in args.strategies:
+        result = run_strategy(strategy, args)
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+if __name__ == "__main__":
+    main()
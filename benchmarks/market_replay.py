@@ -0,0 +1,76 @@
+"""
+Replay market churn with the sharded simulator: a fixed seed, shard count and
+simulated clock always produce the same fare-history stream.
+
+    python -m benchmarks.market_replay --flights 1000000 --shards 8 --ticks 10 --fraction 0.05
+
+--verify reseeds and replays twice and compares fare_history digests.
+Point --database-url at MySQL for a realistic run; on SQLite the shard
+workers serialize on the database write lock.
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime,timedelta
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--flights", type=int, default=20000, help="seed this many flights first; 0 replays the existing data")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--fraction", type=float, default=0.05, help="share of each shard's flights changed per tick")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2025, 11, 1), help="simulated clock at tick 0")
+    parser.add_argument("--interval", type=float, default=60, help="simulated seconds between ticks")
+    parser.add_argument("--verify", action="store_true")
+    return parser.parse_args()
+def history_digest(start: datetime) -> str:
+    from sqlalchemy import select
+    from backend.db import SessionLocal
+    from backend.models import FareHistory
+    digest = hashlib.sha256()
+    db = SessionLocal()
+    try:
+        query = (
+            select(FareHistory.flight_id, FareHistory.recorded_at, FareHistory.dynamic_price, FareHistory.seats_available, FareHistory.demand_level)
+            .where(FareHistory.recorded_at >= start)
+            .order_by(FareHistory.flight_id, FareHistory.recorded_at))
+        for row in db.execute(query.execution_options(yield_per=10000)):
+            digest.update(repr(tuple(row)).encode())
+    finally:
+        db.close()
+    return digest.hexdigest()
+def replay(args) -> str:
+    from benchmarks.seed import seed_database
+    from backend.simulator import run_sharded_step
+    if args.flights:
+        seed_database(args.flights, 0, 0, seed=args.seed)
+    total = 0
+    started = time.perf_counter()
+    for tick in range(args.ticks):
+        clock = args.start + timedelta(seconds=tick * args.interval)
+        tick_started = time.perf_counter()
+        touched = run_sharded_step(tick, args.shards, args.seed, args.fraction, clock)
+        total += touched
+        print(f"tick {tick}: {touched} flights in {(time.perf_counter() - tick_started) * 1000:.0f} ms")
+    elapsed = time.perf_counter() - started
+    digest = history_digest(args.start)
+    print(f"{total} flight updates in {elapsed:.2f} s ({total / elapsed:.0f}/s)  digest={digest[:16]}")
+    return digest
+def main():
+    args = parse_args()
+    if not args.database_url:
+        args.database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "market_replay.db")
+    # backend.db builds its engine at import time, so the URL must be set first
+    os.environ["DATABASE_URL"] = args.database_url
+    print(f"database: {args.database_url}  shards: {args.shards}  seed: {args.seed}")
+    first = replay(args)
+    if args.verify:
+        if not args.flights:
+            raise SystemExit("--verify needs --flights so both runs start from the same data")
+        second = replay(args)
+        print("deterministic" if first == second else "MISMATCH")
+if __name__ == "__main__":
+    main()
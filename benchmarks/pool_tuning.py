@@ -0,0 +1,92 @@
+"""
+Connection pool settings under thread concurrency: each worker checks out a
+connection, runs one indexed lookup, holds the connection for --hold-ms of
+simulated request work and returns it. Reports throughput, checkout wait
+percentiles and pool timeouts per configuration.
+
+    python -m benchmarks.pool_tuning --workers 32 --configs 5:10:pessimistic 5:10:optimistic 32:0:optimistic
+
+A configuration is pool_size:max_overflow:liveness. Point --database-url at
+MySQL to see the real cost of the pessimistic ping; on SQLite it is a local
+function call and only the queueing effect of pool sizing shows.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--flights", type=int, default=2000, help="seed this many flights first; 0 uses the existing data")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--hold-ms", type=float, default=5, help="time each request keeps its connection")
+    parser.add_argument("--pool-timeout", type=float, default=30)
+    parser.add_argument("--pool-recycle", type=int, default=-1)
+    parser.add_argument("--configs", nargs="+", default=["5:10:pessimistic", "5:10:optimistic", "16:16:pessimistic", "16:16:optimistic", "32:0:optimistic"])
+    return parser.parse_args()
+def run_config(config: str, args) -> dict:
+    from sqlalchemy import create_engine,exc,select
+    from benchmarks.run import percentile
+    from backend.db import pool_options
+    from backend.models import Flight
+    pool_size, max_overflow, liveness = config.split(":")
+    engine = create_engine(args.database_url, **pool_options(
+        args.database_url,
+        pool_size=int(pool_size),
+        max_overflow=int(max_overflow),
+        pool_timeout=args.pool_timeout,
+        pool_recycle=args.pool_recycle,
+        liveness=liveness,
+        timed=False,))
+    waits, timeouts, peak = [], [0], [0]
+    lock = threading.Lock()
+    def request(i: int) -> None:
+        started = time.perf_counter()
+        try:
+            conn = engine.connect()
+        except exc.TimeoutError:
+            with lock:
+                timeouts[0] += 1
+            return
+        waited = time.perf_counter() - started
+        try:
+            conn.execute(select(Flight.id, Flight.seats_available).where(Flight.id == i % max(1, args.flights) + 1)).first()
+            with lock:
+                waits.append(waited)
+                peak[0] = max(peak[0], engine.pool.checkedout())
+            time.sleep(args.hold_ms / 1000)
+        finally:
+            conn.close()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    waits_ms = sorted(w * 1000 for w in waits)
+    return {
+        "config": config,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(waits) / elapsed, 1),
+        "wait_p50_ms": round(percentile(waits_ms, 50), 3),
+        "wait_p99_ms": round(percentile(waits_ms, 99), 3),
+        "timeouts": timeouts[0],
+        "peak_checked_out": peak[0],
+    }
+def main():
+    args = parse_args()
+    if not args.database_url:
+        args.database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "pool_tuning.db")
+    # backend.db builds its engine at import time, so the URL must be set first
+    os.environ["DATABASE_URL"] = args.database_url
+    print(f"database: {args.database_url}  workers: {args.workers}  hold: {args.hold_ms} ms")
+    if args.flights:
+        from benchmarks.seed import seed_database
+        seed_database(args.flights, 0, 0)
+    for config in args.configs:
+        result = run_config(config, args)
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+if __name__ == "__main__":
+    main()
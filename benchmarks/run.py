@@ -0,0 +1,170 @@
+"""
+Latency and throughput benchmark for the booking API.
+
+Seeds a SQLite database, then drives search, price, history, book, pay and
+cancel either in-process (ASGI transport, no sockets) or against a local
+uvicorn server, and reports requests/s and p50/p95/p99 latency per endpoint.
+
+    python -m benchmarks.run --flights 5000 --requests 500 --concurrency 16
+    python -m benchmarks.run --mode uvicorn --save baselines/main.json
+    python -m benchmarks.run --compare baselines/main.json
+
+Needs httpx (and uvicorn for --mode uvicorn) on top of backend/requirements.txt.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict,List
+ENDPOINTS = ["search", "price", "history", "book", "pay", "cancel"]
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+def summarize(latencies_ms: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies_ms)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+    }
+async def run_phase(client, make_request, count: int, concurrency: int) -> dict:
+    """
+    Fire `count` requests with at most `concurrency` in flight; make_request(i)
+    returns (method, url, kwargs). Non-2xx/404 responses count as errors.
+    """
+    latencies: List[float] = []
+    errors = 0
+    bodies = []
+    queue = iter(range(count))
+    async def worker():
+        nonlocal errors
+        for i in queue:
+            method, url, kwargs = make_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400 and response.status_code != 404:
+                errors += 1
+            elif response.status_code < 300:
+                bodies.append(response)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = summarize(latencies, errors, elapsed)
+    result["_responses"] = bodies
+    return result
+async def drive(client, info: dict, args) -> Dict[str, dict]:
+    rng = random.Random(args.seed)
+    flight_ids = info["flight_ids"]
+    routes = info["routes"]
+    results: Dict[str, dict] = {}
+    def search(i):
+        origin, destination, day = rng.choice(routes)
+        return "GET", "/api/flights/search", {"params": {"origin": origin, "destination": destination, "travel_date": day}}
+    def price(i):
+        return "GET", f"/api/flights/{rng.choice(flight_ids)}/price", {}
+    def history(i):
+        return "GET", f"/api/flights/{rng.choice(flight_ids)}/history", {"params": {"limit": 50}}
+    def book(i):
+        return "POST", "/api/bookings", {"json": {"flight_id": rng.choice(flight_ids), "passenger_name": f"Bench {i}"}}
+    for name, make_request in (("search", search), ("price", price), ("history", history), ("book", book)):
+        results[name] = await run_phase(client, make_request, args.requests, args.concurrency)
+    pnrs = [r.json()["pnr"] for r in results["book"]["_responses"]]
+    if pnrs:
+        results["pay"] = await run_phase(client, lambda i: ("POST", f"/api/bookings/{pnrs[i % len(pnrs)]}/pay", {}), len(pnrs), args.concurrency)
+        results["cancel"] = await run_phase(client, lambda i: ("DELETE", f"/api/bookings/{pnrs[i]}", {}), len(pnrs), args.concurrency)
+    for result in results.values():
+        result.pop("_responses", None)
+    return results
+async def run_inprocess(info: dict, args) -> Dict[str, dict]:
+    import httpx
+    from backend.main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, info, args)
+async def run_uvicorn(info: dict, args) -> Dict[str, dict]:
+    import httpx
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=dict(os.environ),)
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/api/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not become healthy")
+            return await drive(client, info, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+def print_results(results: Dict[str, dict], baseline: Dict[str, dict] = None):
+    print(f"{'endpoint':<10}{'requests':>9}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name in ENDPOINTS:
+        r = results.get(name)
+        if r is None:
+            continue
+        print(f"{name:<10}{r['requests']:>9}{r['errors']:>8}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+        base = (baseline or {}).get(name)
+        if base:
+            deltas = [
+                f"{key}: {(r[key] - base[key]) / base[key] * 100:+.1f}%"
+                for key in ("rps", "p50_ms", "p95_ms", "p99_ms") if base[key]]
+            print(f"{'':<10}vs baseline  " + "  ".join(deltas))
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    parser.add_argument("--flights", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=5)
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args()
+    if not args.database_url:
+        args.database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    # backend.db builds its engine at import time, so the URL must be set first
+    os.environ["DATABASE_URL"] = args.database_url
+    from .seed import seed_database
+    info = seed_database(args.flights, args.history, args.bookings, seed=args.seed)
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    results = asyncio.run(runner(info, args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["results"]
+    print(f"mode={args.mode} flights={args.flights} requests={args.requests} concurrency={args.concurrency}")
+    print_results(results, baseline)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        meta = {k: v for k, v in vars(args).items() if k not in ("save", "compare")}
+        meta["recorded_at"] = datetime.utcnow().isoformat() + "Z"
+        with open(args.save, "w") as fh:
+            json.dump({"meta": meta, "results": results}, fh, indent=2)
+        print(f"baseline saved to {args.save}")
+if __name__ == "__main__":
+    main()
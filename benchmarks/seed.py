@@ -0,0 +1,106 @@
+"""
+Seed a database with a synthetic schedule for benchmarking.
+
+    python -m benchmarks.seed --database-url sqlite:///bench.db --flights 20000 --history 10 --bookings 50000
+"""
+import argparse
+import os
+import random
+from datetime import datetime,timedelta
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Kolkata", "Hyderabad", "Pune", "Goa"]
+AIRLINES = ["AirIndia", "Vistara", "Emirates", "IndiGo", "SpiceJet", "AirAsia", "Akasa"]
+BATCH_SIZE = 5000
+def seed_database(flights: int, history_per_flight: int, bookings: int, days: int = 14, seed: int = 0) -> dict:
+    """
+    Drop and recreate the schema on backend.db.engine, bulk insert rows, then
+    run backend.migrate as a deploy would (price snapshots, fare calendar,
+    rollups and the PNR key bookings need).
+    DATABASE_URL must be set before this module's caller imports backend.
+    Returns the ids and routes the load generator needs.
+    """
+    from sqlalchemy import insert
+    from backend.db import Base,SessionLocal,engine
+    from backend import models
+    from backend.migrate import migrate
+    rng = random.Random(seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    start_day = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    flight_rows = []
+    for i in range(flights):
+        origin, destination = rng.sample(CITIES, 2)
+        departure = start_day + timedelta(days=rng.randrange(days), minutes=rng.randrange(0, 24 * 60, 5))
+        duration = rng.randrange(60, 240, 5)
+        total_seats = rng.choice([120, 180, 220])
+        flight_rows.append({
+            "id": i + 1,
+            "flight_no": f"BM{i + 1}",
+            "airline_name": rng.choice(AIRLINES),
+            "origin": origin,
+            "destination": destination,
+            "departure_time": departure,
+            "arrival_time": departure + timedelta(minutes=duration),
+            "duration_minutes": duration,
+            "base_fare": rng.randrange(2500, 12000, 25),
+            "total_seats": total_seats,
+            "seats_available": rng.randint(total_seats // 4, total_seats),
+        })
+    db = SessionLocal()
+    try:
+        for start in range(0, len(flight_rows), BATCH_SIZE):
+            db.execute(insert(models.Flight), flight_rows[start:start + BATCH_SIZE])
+        history_rows = []
+        now = datetime.utcnow()
+        for f in flight_rows:
+            for step in range(history_per_flight):
+                history_rows.append({
+                    "flight_id": f["id"],
+                    "recorded_at": now - timedelta(minutes=step),
+                    "dynamic_price": f["base_fare"] * rng.uniform(0.6, 2.2),
+                    "seats_available": f["seats_available"],
+                    "demand_level": None,
+                })
+            if len(history_rows) >= BATCH_SIZE:
+                db.execute(insert(models.FareHistory), history_rows)
+                history_rows = []
+        if history_rows:
+            db.execute(insert(models.FareHistory), history_rows)
+        booking_rows = []
+        for i in range(bookings):
+            f = flight_rows[rng.randrange(flights)]
+            booking_rows.append({
+                "pnr": f"SEED{i:08d}",
+                "flight_id": f["id"],
+                "passenger_name": f"Seed Passenger {i}",
+                "seat_no": None,
+                "price": f["base_fare"],
+                "status": "CONFIRMED",
+                "created_at": now,
+            })
+            if len(booking_rows) >= BATCH_SIZE:
+                db.execute(insert(models.Booking), booking_rows)
+                booking_rows = []
+        if booking_rows:
+            db.execute(insert(models.Booking), booking_rows)
+        db.commit()
+    finally:
+        db.close()
+    migrate()
+    return {
+        "flight_ids": [f["id"] for f in flight_rows],
+        "routes": sorted({(f["origin"], f["destination"], f["departure_time"].date().isoformat()) for f in flight_rows}),
+    }
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///bench.db"))
+    parser.add_argument("--flights", type=int, default=5000)
+    parser.add_argument("--history", type=int, default=5, help="fare_history rows per flight")
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    info = seed_database(args.flights, args.history, args.bookings, args.days, args.seed)
+    print(f"seeded {len(info['flight_ids'])} flights on {len(info['routes'])} route/days into {args.database_url}")
+if __name__ == "__main__":
+    main()
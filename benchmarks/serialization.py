@@ -0,0 +1,59 @@
+"""
+Micro-benchmark: search response serialization, Pydantic path versus the
+row-tuple + orjson fast path. Prices are fixed so both encoders see the same
+input and their output is checked byte for byte.
+
+    python -m benchmarks.serialization --rows 500 --repeat 200
+"""
+import argparse
+import os
+import time
+from datetime import datetime,timedelta
+from decimal import Decimal
+def make_rows(count: int):
+    from backend.flight_index import FlightRow
+    departure = datetime(2025, 11, 25, 6, 0)
+    return [
+        FlightRow(
+            id=i + 1,
+            flight_no=f"FB{i + 1}",
+            airline_name=["AirIndia", "IndiGo", "Vistara", "Akasa"][i % 4],
+            origin="Mumbai",
+            destination="Delhi",
+            departure_time=departure + timedelta(minutes=5 * i),
+            arrival_time=departure + timedelta(minutes=5 * i + 130),
+            duration_minutes=130 + i % 60,
+            base_fare=Decimal("4999.50") + i,
+            total_seats=180,
+            seats_available=i % 180,)
+        for i in range(count)]
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    # importing backend.main builds the engine; an in-memory database is enough here
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    import backend.main as api
+    rows = make_rows(args.rows)
+    prices = [float(r.base_fare) * 1.1 for r in rows]
+    api.batch_prices = lambda flights, path: prices[:len(flights)]
+    def pydantic_path() -> bytes:
+        return JSONResponse(content=jsonable_encoder(api.price_flights(rows))).body
+    def fast_path() -> bytes:
+        return api.fast_dumps(api.priced_rows(rows))
+    identical = pydantic_path() == fast_path()
+    slow_ms = timed(pydantic_path, args.repeat)
+    fast_ms = timed(fast_path, args.repeat)
+    print(f"rows={args.rows} repeat={args.repeat} byte_identical={identical}")
+    print(f"pydantic+json  {slow_ms:8.3f} ms/response")
+    print(f"rows+orjson    {fast_ms:8.3f} ms/response  ({slow_ms / fast_ms:.1f}x faster)")
+if __name__ == "__main__":
+    main()
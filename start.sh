@@ -0,0 +1,6 @@
+#!/bin/sh
+# Start command for the backend (use it as the Render start command): apply
+# pending schema changes, then serve the API. Run from the repository root.
+set -e
+python -m backend.migrate
+exec uvicorn backend.main:app --host 0.0.0.0 --port "${PORT:-8000}"
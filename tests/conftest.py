@@ -0,0 +1,52 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime,timedelta
+import pytest
+# backend.db builds its engines at import time, so the test database is configured first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+@pytest.fixture(scope="session")
+def schema():
+    from backend.migrate import migrate
+    migrate()
+@pytest.fixture
+def db(schema):
+    from backend.db import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+@pytest.fixture
+def async_session(schema):
+#      The async engine in backend.db only exists with ASYNC_DB_ENABLED, so tests build their own.
+    from sqlalchemy.ext.asyncio import async_sessionmaker,create_async_engine
+    from backend.db import DATABASE_URL,async_database_url
+    engine = create_async_engine(async_database_url(DATABASE_URL))
+    yield async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+@pytest.fixture
+def make_flight(db):
+    from backend.models import Flight
+    from backend.price_snapshots import reprice_flights
+    count = [0]
+    def make(**overrides) -> Flight:
+        count[0] += 1
+        departure = datetime.now().replace(microsecond=0) + timedelta(days=10, minutes=count[0])
+        values = {
+            "flight_no": f"T{count[0]}",
+            "airline_name": "IndiGo",
+            "origin": "Mumbai",
+            "destination": "Delhi",
+            "departure_time": departure,
+            "arrival_time": departure + timedelta(minutes=120),
+            "duration_minutes": 120,
+            "base_fare": 5000,
+            "total_seats": 120,
+            "seats_available": 120,
+            **overrides,
+        }
+        flight = Flight(**values)
+        reprice_flights([flight])
+        db.add(flight)
+        db.commit()
+        return flight
+    return make
@@ -0,0 +1,43 @@
+import asyncio
+from datetime import datetime,timedelta
+import pytest
+from fastapi import HTTPException
+from backend.fare_calendar import refresh_fare_calendar
+from backend.idempotency import REPLAYED_HEADER
+from backend.models import Booking,Flight,IdempotencyRecord,RouteDayFare
+from backend.schemas import BookingRequest
+def book(async_session, request, key):
+    from backend.main import create_booking_async
+    async def run():
+        async with async_session() as session:
+            return await create_booking_async(request, db=session, idempotency_key=key)
+    return asyncio.run(run())
+def test_async_booking_records_and_purges_idempotency_keys(db, make_flight, async_session, monkeypatch):
+    monkeypatch.setattr("backend.idempotency.IDEMPOTENCY_PURGE_EVERY", 1)
+    expired = datetime.utcnow() - timedelta(minutes=1)
+    db.add(IdempotencyRecord(scope="booking", key="expired", fingerprint="x", status_code=200, body="{}", expires_at=expired, created_at=expired))
+    db.commit()
+    request = BookingRequest(flight_id=make_flight().id, passenger_name="Asha")
+    booking = book(async_session, request, "async-key")
+    db.expire_all()
+    keys = {r.key for r in db.query(IdempotencyRecord).filter(IdempotencyRecord.scope == "booking")}
+    assert "async-key" in keys and "expired" not in keys
+    replay = book(async_session, request, "async-key")
+    assert replay.headers[REPLAYED_HEADER] == "true"
+    assert db.query(Booking).filter(Booking.flight_id == request.flight_id).count() == 1
+    assert booking.pnr in replay.body.decode()
+def test_async_booking_shares_the_sync_booking_path(db, make_flight, async_session):
+    flight = make_flight(origin="Nagpur", destination="Indore", seats_available=1)
+    key = ("Nagpur", "Indore", flight.departure_time.date())
+    refresh_fare_calendar([key])
+    assert db.get(RouteDayFare, key) is not None
+    request = BookingRequest(flight_id=flight.id, passenger_name="Ravi")
+    booking = book(async_session, request, None)
+    assert booking.seat_no == "1A" and booking.price == float(flight.current_price)
+    db.expire_all()
+    assert db.get(Flight, flight.id).seats_available == 0
+    # the sold-out day leaves the fare calendar once the booking has committed
+    assert db.get(RouteDayFare, key) is None
+    with pytest.raises(HTTPException) as error:
+        book(async_session, request, None)
+    assert error.value.status_code == 400
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.models import FareHistory
+@pytest.fixture
+def async_client(async_session, monkeypatch):
+    # the app's routes with ASYNC_DB_ENABLED's async twins swapped in, on the test's async engine
+    from backend import main
+    app = FastAPI()
+    app.router.routes[:] = list(main.app.router.routes)
+    main.use_async_routes(app, main.async_router)
+    monkeypatch.setattr("backend.db.AsyncSessionLocal", async_session)
+    with TestClient(app) as client:
+        yield client
+def test_async_routes_replace_their_sync_twins(async_client):
+    from backend import main
+    endpoints = {(r.path, frozenset(r.methods)): r.endpoint for r in async_client.app.router.routes if hasattr(r, "methods")}
+    assert endpoints[("/api/flights/search", frozenset({"GET"}))] is main.search_flights_async
+    assert endpoints[("/api/flights/{flight_id}/price", frozenset({"GET"}))] is main.get_dynamic_price_for_flight_async
+    assert endpoints[("/api/flights/{flight_id}/history", frozenset({"GET"}))] is main.get_fare_history_async
+    assert endpoints[("/api/bookings", frozenset({"POST"}))] is main.create_booking_async
+def test_async_search_and_price(async_client, make_flight):
+    flight = make_flight(origin="Surat", destination="Ranchi")
+    params = {"origin": "surat", "destination": "ranchi", "travel_date": str(flight.departure_time.date())}
+    found = async_client.get("/api/flights/search", params=params)
+    assert found.status_code == 200
+    assert [f["id"] for f in found.json()] == [flight.id]
+    price = async_client.get(f"/api/flights/{flight.id}/price")
+    assert price.status_code == 200
+    assert price.json()["dynamic_price"] == float(flight.current_price)
+    assert async_client.get("/api/flights/0/price").status_code == 404
+def test_async_history_pages(async_client, db, make_flight):
+    flight = make_flight()
+    db.add_all([FareHistory(flight_id=flight.id, recorded_at=datetime(2026, 11, 1, 8, minute), dynamic_price=5000 + minute, seats_available=100) for minute in range(3)])
+    db.commit()
+    first = async_client.get(f"/api/flights/{flight.id}/history", params={"limit": 2})
+    assert first.status_code == 200
+    assert [row["dynamic_price"] for row in first.json()] == [5002.0, 5001.0]
+    rest = async_client.get(f"/api/flights/{flight.id}/history", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [row["dynamic_price"] for row in rest.json()] == [5000.0]
+    assert async_client.get(f"/api/flights/{make_flight().id}/history").status_code == 404
+    # the shared database's fare history is expected to be rolled up already
+    db.query(FareHistory).filter(FareHistory.flight_id == flight.id).delete()
+    db.commit()
+def test_async_booking_refills_pnr_blocks_off_the_event_loop(async_client, make_flight, monkeypatch):
+    from backend.utils import PnrAllocator,pnr_allocator
+    claim_block = PnrAllocator._claim_block
+    on_loop = []
+    def watched(self):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return claim_block(self)
+    monkeypatch.setattr(PnrAllocator, "_claim_block", watched)
+    # start from an exhausted block so both bookings refill
+    monkeypatch.setattr(pnr_allocator, "block_size", 1)
+    monkeypatch.setattr(pnr_allocator, "_end", pnr_allocator._next)
+    flight = make_flight()
+    for name in ("Asha", "Ravi"):
+        assert async_client.post("/api/bookings", json={"flight_id": flight.id, "passenger_name": name}).status_code == 200
+    assert on_loop and not any(on_loop)
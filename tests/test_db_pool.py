@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine,text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from backend.db import pool_options
+from backend.metrics import TimedQueuePool,db_pool_checkout_wait,db_pool_timeouts
+def test_liveness_modes_set_the_checkout_ping():
+    url = "postgresql://app@db/flights"
+    assert pool_options(url, liveness="pessimistic")["pool_pre_ping"] is True
+    assert pool_options(url, liveness="optimistic")["pool_pre_ping"] is False
+def test_pool_sizing_is_passed_through():
+    options = pool_options("mysql+pymysql://app@db/flights", pool_size=20, max_overflow=0, pool_timeout=2.5, pool_recycle=280)
+    assert options["pool_size"] == 20 and options["max_overflow"] == 0
+    assert options["pool_timeout"] == 2.5 and options["pool_recycle"] == 280
+    assert options["poolclass"] is TimedQueuePool
+    assert "poolclass" not in pool_options("mysql+aiomysql://app@db/flights", timed=False)
+def test_in_memory_sqlite_takes_no_sizing():
+    assert pool_options("sqlite://", liveness="optimistic") == {"pool_pre_ping": False}
+    assert pool_options("sqlite:///:memory:") == {"pool_pre_ping": True}
+def test_unknown_liveness_is_refused_at_startup():
+    import os,subprocess,sys
+    env = {**os.environ, "DB_POOL_LIVENESS": "sometimes"}
+    result = subprocess.run([sys.executable, "-c", "import backend.db"], env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "DB_POOL_LIVENESS must be pessimistic or optimistic" in result.stderr
+def test_exhausted_pool_times_out_and_counts_the_wait(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(url, pool_logging_name="pooltest", **pool_options(url, pool_size=1, max_overflow=0, pool_timeout=0.05))
+    try:
+        with engine.connect() as held:
+            held.execute(text("select 1"))
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+    finally:
+        engine.dispose()
+    assert db_pool_timeouts._values[("pooltest",)] == 1
+    counts, total = db_pool_checkout_wait._values[("pooltest",)]
+    # the free checkout and the one that waited out pool_timeout
+    assert sum(counts) == 2
+    assert total[0] >= 0.05
+def test_db_pool_endpoint_reports_settings_and_occupancy():
+    from fastapi.testclient import TestClient
+    from backend import db
+    from backend.main import app
+    body = TestClient(app).get("/api/admin/db-pool").json()
+    assert body["settings"] == {
+        "pool_size": db.DB_POOL_SIZE,
+        "max_overflow": db.DB_MAX_OVERFLOW,
+        "pool_timeout": db.DB_POOL_TIMEOUT,
+        "pool_recycle": db.DB_POOL_RECYCLE,
+        "liveness": db.DB_POOL_LIVENESS,
+    }
+    primary = body["pools"]["primary"]
+    assert primary["pool"] == "TimedQueuePool"
+    assert primary["size"] == db.DB_POOL_SIZE
+    assert primary["checked_out"] >= 0
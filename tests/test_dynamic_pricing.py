@@ -0,0 +1,33 @@
+from datetime import datetime,timedelta
+import pytest
+from backend import dynamic_pricing
+from backend.dynamic_pricing import calculate_dynamic_price,calculate_dynamic_prices
+NOW = datetime(2025, 11, 1, 12, 0, 0)
+AIRLINES = ["AirIndia", "Vistara", "Emirates", "IndiGo", "SpiceJet", "AirAsia", "Akasa"]
+# (seats_available, total_seats): every seat band, its edges and total_seats <= 0
+SEATS = [(180, 180), (126, 180), (125, 180), (72, 180), (71, 180), (0, 180), (5, 0)]
+# hours to departure: departed, each band and the band edges
+HOURS = [-5, 0, 1, 24, 24.5, 72, 100, 168, 169, 500]
+DEMAND = ["low", "medium", "high"]
+BASE_FARES = [0.0, 1234.55, 4999.99, 8000.0]
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+@pytest.fixture
+def fixed_now(monkeypatch):
+    monkeypatch.setattr(dynamic_pricing, "datetime", FixedDatetime)
+def test_batch_matches_scalar_pricing(fixed_now):
+    rows = [
+        (base, seats, total, NOW + timedelta(hours=hours), airline, demand)
+        for base in BASE_FARES
+        for seats, total in SEATS
+        for hours in HOURS
+        for airline in AIRLINES
+        for demand in DEMAND]
+    base, seats, total, departures, airlines, demands = map(list, zip(*rows))
+    batch = calculate_dynamic_prices(base, seats, total, departures, airlines, demands, now=NOW)
+    scalar = [calculate_dynamic_price(*row) for row in rows]
+    assert batch.tolist() == scalar
+def test_batch_pricing_of_empty_input():
+    assert calculate_dynamic_prices([], [], [], [], [], now=NOW).tolist() == []
@@ -0,0 +1,26 @@
+from datetime import datetime
+from backend.fare_calendar import refresh_fare_calendar,upsert_fares
+from backend.models import Flight,RouteDayFare
+def calendar_row(db, flight):
+    db.expire_all()
+    return db.get(RouteDayFare, (flight.origin, flight.destination, flight.departure_time.date()))
+def test_upsert_of_an_existing_day_updates_it(db, make_flight):
+    flight = make_flight(origin="Pune", destination="Goa")
+    values = {"origin": "Pune", "destination": "Goa", "day": flight.departure_time.date(), "min_price": 4000,
+              "flight_id": flight.id, "flights_available": 1, "updated_at": datetime.utcnow()}
+    # a second writer creating the same first row for the day must not hit the primary key
+    upsert_fares(db, [values])
+    upsert_fares(db, [{**values, "min_price": 3500}])
+    db.commit()
+    assert float(calendar_row(db, flight).min_price) == 3500
+def test_refresh_after_commit_follows_seat_changes(db, make_flight):
+    flight = make_flight(origin="Pune", destination="Kochi")
+    key = ("Pune", "Kochi", flight.departure_time.date())
+    refresh_fare_calendar([key])
+    row = calendar_row(db, flight)
+    assert row.flight_id == flight.id
+    assert float(row.min_price) == float(flight.current_price)
+    db.get(Flight, flight.id).seats_available = 0
+    db.commit()
+    refresh_fare_calendar([key])
+    assert calendar_row(db, flight) is None
@@ -0,0 +1,76 @@
+from datetime import datetime
+import pytest
+from backend.fare_rollups import backfill_rollups
+from backend.models import FareHistory,FareRollup
+@pytest.fixture
+def fare_tables(db):
+    # backfills scan all of fare_history, so start from empty tables whatever earlier tests wrote
+    db.query(FareRollup).delete()
+    db.query(FareHistory).delete()
+    db.commit()
+    return db
+def test_backfill_builds_missing_rollups_from_history(fare_tables, make_flight):
+    db = fare_tables
+    flight = make_flight()
+    samples = [
+        (datetime(2025, 11, 1, 10, 0, 5), 5000, 100),
+        (datetime(2025, 11, 1, 10, 0, 40), 5600, 98),
+        (datetime(2025, 11, 1, 10, 1, 10), 4800, 97),
+        (datetime(2025, 11, 1, 11, 30, 0), 5200, 99),]
+    db.add_all([
+        FareHistory(flight_id=flight.id, recorded_at=at, dynamic_price=price, seats_available=seats, demand_level=None)
+        for at, price, seats in samples])
+    db.commit()
+    assert backfill_rollups(db) == 5
+    db.commit()
+    rollups = {
+        (r.resolution, r.bucket_start): r
+        for r in db.query(FareRollup).filter(FareRollup.flight_id == flight.id)}
+    first_hour = rollups[("1h", datetime(2025, 11, 1, 10))]
+    assert (float(first_hour.open_price), float(first_hour.high_price), float(first_hour.low_price), float(first_hour.close_price)) == (5000, 5600, 4800, 4800)
+    assert (first_hour.min_seats_available, first_hour.samples) == (97, 3)
+    first_minute = rollups[("1m", datetime(2025, 11, 1, 10, 0))]
+    assert (float(first_minute.close_price), first_minute.samples) == (5600, 2)
+    assert sorted(key for key in rollups if key[0] == "1m") == [
+        ("1m", datetime(2025, 11, 1, 10, 0)),
+        ("1m", datetime(2025, 11, 1, 10, 1)),
+        ("1m", datetime(2025, 11, 1, 11, 30)),]
+    # re-running leaves existing buckets alone
+    assert backfill_rollups(db) == 0
+def test_migrate_backfills_rollups_only_when_empty_or_asked(fare_tables, make_flight):
+    from backend.migrate import migrate
+    db = fare_tables
+    flight = make_flight()
+    db.add(FareHistory(flight_id=flight.id, recorded_at=datetime(2025, 11, 2, 9, 0), dynamic_price=5000, seats_available=90, demand_level=None))
+    db.commit()
+    # an empty fare_rollups table is backfilled on every run
+    assert migrate()["rollup_buckets"] == 2
+    assert migrate()["rollup_buckets"] == 0
+    db.add(FareHistory(flight_id=flight.id, recorded_at=datetime(2025, 11, 2, 12, 0), dynamic_price=5000, seats_available=90, demand_level=None))
+    db.commit()
+    # once it has rows, only when asked
+    assert migrate()["rollup_buckets"] == 0
+    assert migrate(force_rollups=True)["rollup_buckets"] == 2
+    assert db.query(FareRollup).filter(FareRollup.flight_id == flight.id).count() == 4
+def test_ticks_from_two_workers_merge_into_one_bucket(fare_tables, make_flight):
+    from backend.db import SessionLocal
+    from backend.fare_rollups import update_rollups
+    flight = make_flight()
+    ticks = [
+        [{"flight_id": flight.id, "recorded_at": datetime(2025, 11, 3, 10, 0, 5), "dynamic_price": 5000.0, "seats_available": 100}],
+        # a second worker's tick in the same bucket, with two samples of the flight in one chunk
+        [{"flight_id": flight.id, "recorded_at": datetime(2025, 11, 3, 10, 0, 20), "dynamic_price": 5600.0, "seats_available": 98},
+         {"flight_id": flight.id, "recorded_at": datetime(2025, 11, 3, 10, 0, 40), "dynamic_price": 4800.0, "seats_available": 99}],]
+    for history in ticks:
+        worker = SessionLocal()
+        try:
+            update_rollups(worker, history)
+            worker.commit()
+        finally:
+            worker.close()
+    db = fare_tables
+    rollups = {r.resolution: r for r in db.query(FareRollup).filter(FareRollup.flight_id == flight.id)}
+    assert sorted(rollups) == ["1h", "1m"]
+    for r in rollups.values():
+        assert (float(r.open_price), float(r.high_price), float(r.low_price), float(r.close_price)) == (5000, 5600, 4800, 4800)
+        assert (r.min_seats_available, r.samples) == (98, 3)
@@ -0,0 +1,36 @@
+from datetime import datetime,timedelta
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from backend import main
+from backend.fast_json import FastJSONResponse,dumps
+from backend.flight_index import FlightRow
+from backend.schemas import ItineraryOut
+def rows():
+    departure = datetime(2026, 11, 2, 6, 5, 30, 250000)
+    return [
+        FlightRow(1, "FB1", "IndiGo", "Mumbai", "Delhi", departure, departure + timedelta(minutes=130), 130, Decimal("4999.50"), 180, 0, Decimal("6123.45")),
+        FlightRow(2, "FB2", "Vistara ✈ Café", "Mumbai", "Delhi", departure + timedelta(hours=3), departure + timedelta(hours=5), 120, Decimal("5000"), 180, 179, Decimal("5500.10")),
+        FlightRow(3, "FB3", "Akasa", "Delhi", "Goa", departure + timedelta(hours=4), departure + timedelta(hours=6, minutes=15), 135, Decimal("3210.99"), 120, 57, Decimal("0.07")),]
+def pydantic_bytes(content) -> bytes:
+    return JSONResponse(content=jsonable_encoder(content)).body
+def test_search_rows_encode_byte_for_byte_like_the_pydantic_path():
+    flights = rows()
+    assert dumps(main.priced_rows(flights)) == pydantic_bytes(main.price_flights(flights))
+def test_itineraries_encode_byte_for_byte_like_the_response_model():
+    flights = rows()
+    itineraries = main.price_itineraries([[flights[0]], [flights[1], flights[2]]])
+    assert dumps(itineraries) == pydantic_bytes([ItineraryOut.model_validate(i) for i in itineraries])
+def test_pre_encoded_bytes_are_sent_untouched():
+    body = b'[{"id":1}]'
+    assert FastJSONResponse(body).body is body
+def test_price_endpoint_bytes_match_with_the_fast_path_off(make_flight, monkeypatch):
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    flight = make_flight(airline_name="Café Air")
+    fast = client.get(f"/api/flights/{flight.id}/price")
+    monkeypatch.setattr(main, "FAST_JSON_ENABLED", False)
+    slow = client.get(f"/api/flights/{flight.id}/price")
+    assert fast.status_code == slow.status_code == 200
+    assert fast.content == slow.content
+    assert fast.headers["content-type"] == slow.headers["content-type"] == "application/json"
@@ -0,0 +1,27 @@
+from datetime import datetime,timedelta
+from backend.flight_index import FlightIndex,FlightRow
+from backend.route_graph import RouteGraph,as_leg
+def row(seats_available, priced_at) -> FlightRow:
+    departure = datetime(2026, 11, 2, 9, 0)
+    return FlightRow(1, "T1", "IndiGo", "Mumbai", "Delhi", departure, departure + timedelta(hours=2), 120, 5000, 120, seats_available, None, priced_at)
+def test_apply_keeps_the_newer_snapshot():
+    earlier, later = datetime(2026, 11, 1, 8, 0), datetime(2026, 11, 1, 8, 0, 1)
+    index, graph = FlightIndex(enabled=True), RouteGraph()
+    graph.built = True
+    for target in (index, graph):
+        # the later writer applies first, then the one that committed before it
+        target.apply([row(29, later)])
+        target.apply([row(30, earlier)])
+        target.apply([row(28, later)])
+    assert [r.seats_available for r in index.search("Mumbai", "Delhi", row(0, None).departure_time.date())] == [28]
+    # the graph keeps only the route and times, which none of these changed
+    assert graph._rows[1] == as_leg(row(28, later))
+    assert len(graph._departures["Mumbai"]) == 1
+def test_index_is_refused_with_several_workers():
+    import os,subprocess,sys
+    check = "from backend.flight_index import FLIGHT_INDEX_ENABLED; print(FLIGHT_INDEX_ENABLED)"
+    def enabled(workers):
+        env = {**os.environ, "FLIGHT_INDEX_ENABLED": "true", "WEB_CONCURRENCY": workers}
+        return subprocess.run([sys.executable, "-c", check], env=env, capture_output=True, text=True, check=True).stdout.strip()
+    assert enabled("1") == "True"
+    assert enabled("4") == "False"
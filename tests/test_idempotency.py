@@ -0,0 +1,20 @@
+from datetime import datetime,timedelta
+from fastapi.testclient import TestClient
+from backend.idempotency import IDEMPOTENCY_HEADER,REPLAYED_HEADER
+from backend.models import IdempotencyRecord
+def expire(db, scope, key):
+    expired = datetime.utcnow() - timedelta(minutes=1)
+    db.add(IdempotencyRecord(scope=scope, key=key, fingerprint="old", status_code=200, body="{}", expires_at=expired, created_at=expired))
+    db.commit()
+def test_expired_keys_can_be_reused(db, make_flight):
+    from backend.main import app
+    client = TestClient(app)
+    expire(db, "booking", "reused-booking")
+    expire(db, "payment", "reused-payment")
+    body = {"flight_id": make_flight().id, "passenger_name": "Nisha"}
+    booking = client.post("/api/bookings", json=body, headers={IDEMPOTENCY_HEADER: "reused-booking"})
+    assert booking.status_code == 200
+    replay = client.post("/api/bookings", json=body, headers={IDEMPOTENCY_HEADER: "reused-booking"})
+    assert replay.headers[REPLAYED_HEADER] == "true" and replay.json()["pnr"] == booking.json()["pnr"]
+    payment = client.post(f"/api/bookings/{booking.json()['pnr']}/pay", headers={IDEMPOTENCY_HEADER: "reused-payment"})
+    assert payment.status_code == 200
@@ -0,0 +1,43 @@
+import re
+from backend.metrics import Histogram
+def sample(text, name, **labels):
+    # value of one sample line, with labels in any order
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            found = dict(re.findall(r'(\w+)="([^"]*)"', line.split(" ")[0]))
+            if found == {k: str(v) for k, v in labels.items()}:
+                return float(line.rsplit(" ", 1)[1])
+    return None
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, route="/a")
+    text = "\n".join(histogram.render())
+    assert "# TYPE latency_seconds histogram" in text
+    assert sample(text, "latency_seconds_bucket", route="/a", le="0.1") == 1
+    assert sample(text, "latency_seconds_bucket", route="/a", le="1.0") == 3
+    assert sample(text, "latency_seconds_bucket", route="/a", le="+Inf") == 4
+    assert sample(text, "latency_seconds_count", route="/a") == 4
+    assert sample(text, "latency_seconds_sum", route="/a") == 4.05
+def test_metrics_endpoint_reports_requests_by_route_template(make_flight):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    client = TestClient(app)
+    flight = make_flight()
+    before = sample(client.get("/metrics").text, "http_requests_total", method="GET", route="/api/flights/{flight_id}/price", status=200) or 0
+    for _ in range(2):
+        assert client.get(f"/api/flights/{flight.id}/price").status_code == 200
+    assert client.get("/api/flights/0/price").status_code == 404
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    route = "/api/flights/{flight_id}/price"
+    # labelled by the route template, not the concrete flight id
+    assert sample(text, "http_requests_total", method="GET", route=route, status=200) == before + 2
+    assert sample(text, "http_requests_total", method="GET", route=route, status=404) >= 1
+    assert sample(text, "http_request_duration_seconds_count", method="GET", route=route) >= 3
+    assert f'route="/api/flights/{flight.id}/price"' not in text
+    # every price lookup issues at least one query, counted per request
+    assert sample(text, "http_request_db_queries_bucket", route=route, le="0") == 0
+    assert sample(text, "db_queries_total") > 0
+    assert sample(text, "db_pool_checked_out", pool="primary") is not None
@@ -0,0 +1,60 @@
+import asyncio
+import json
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+import backend.pagination as pagination
+from backend.models import Flight
+from backend.pagination import decode_cursor,encode_cursor,keyset_query,stream_ndjson
+from backend.schemas import FlightOut
+def test_cursor_round_trips_decimal_and_datetime():
+    price, departure = Decimal("4999.50"), datetime(2026, 11, 2, 9, 30, 15, 250000)
+    assert decode_cursor(encode_cursor(price, 7), Flight.current_price) == (price, 7)
+    assert decode_cursor(encode_cursor(departure, 8), Flight.departure_time) == (departure, 8)
+    with pytest.raises(HTTPException) as invalid:
+        decode_cursor("not-a-cursor", Flight.departure_time)
+    assert invalid.value.status_code == 400
+def priced_flights(db, make_flight):
+    flights = [make_flight() for _ in range(5)]
+    # ties on price, so the id breaks them
+    for flight, price in zip(flights, ("100.50", "99.99", "100.50", "101.00", "100.50")):
+        flight.current_price = Decimal(price)
+    db.commit()
+    return flights
+def pages(db, ids, sort_column, descending, limit=2):
+    seen, cursor = [], None
+    while True:
+        query = keyset_query(select(Flight).where(Flight.id.in_(ids)), sort_column, Flight.id, descending, cursor)
+        rows = db.scalars(query.limit(limit)).all()
+        if not rows:
+            return seen
+        seen += [r.id for r in rows]
+        cursor = encode_cursor(getattr(rows[-1], sort_column.key), rows[-1].id)
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_visit_every_row_once(db, make_flight, descending):
+    flights = priced_flights(db, make_flight)
+    ids = [f.id for f in flights]
+    for sort_column in (Flight.current_price, Flight.departure_time):
+        expected = [f.id for f in sorted(flights, key=lambda f: (getattr(f, sort_column.key), f.id), reverse=descending)]
+        assert pages(db, ids, sort_column, descending) == expected
+def test_ndjson_streams_in_chunks(db, make_flight, monkeypatch):
+    monkeypatch.setattr(pagination, "STREAM_CHUNK_SIZE", 2)
+    ids = [make_flight().id for _ in range(5)]
+    query = select(Flight).where(Flight.id.in_(ids)).order_by(Flight.id)
+    chunks = list(stream_ndjson(query, FlightOut))
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    assert [json.loads(line)["id"] for line in "".join(chunks).splitlines()] == ids
+def test_async_ndjson_streams_in_chunks(make_flight, async_session, monkeypatch):
+    import backend.db
+    monkeypatch.setattr(pagination, "STREAM_CHUNK_SIZE", 2)
+    monkeypatch.setattr(backend.db, "AsyncSessionLocal", async_session)
+    ids = [make_flight().id for _ in range(3)]
+    query = select(Flight).where(Flight.id.in_(ids)).order_by(Flight.id)
+    async def collect():
+        return [chunk async for chunk in pagination.astream_ndjson(query, FlightOut)]
+    chunks = asyncio.run(collect())
+    assert [chunk.count("\n") for chunk in chunks] == [2, 1]
+    assert [json.loads(line)["id"] for line in "".join(chunks).splitlines()] == ids
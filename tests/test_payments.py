@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime,timedelta
+import pytest
+from fastapi import HTTPException
+from backend.models import Booking
+from backend.payments import PENDING,PROCESSING,PaymentQueue
+class CountingProcessor:
+    def __init__(self):
+        self.charges = []
+        self._lock = threading.Lock()
+    def charge(self, pnr: str, amount: float) -> bool:
+        with self._lock:
+            self.charges.append(pnr)
+        return True
+def make_booking(db, flight, pnr, status=PENDING):
+    booking = Booking(pnr=pnr, flight_id=flight.id, passenger_name="Meera", price=5000, status=status)
+    db.add(booking)
+    db.commit()
+    return booking
+def test_claim_is_exclusive_until_the_lease_lapses(db, make_flight):
+    booking = make_booking(db, make_flight(), "PAYCLAIM1")
+    first, second = PaymentQueue(CountingProcessor(), 1, 10, 10, 0.05), PaymentQueue(CountingProcessor(), 1, 10, 10, 0.05)
+    first.owner, second.owner = "first", "second"
+    assert first._claim(booking.pnr)
+    assert not second._claim(booking.pnr)
+    db.expire_all()
+    assert (booking.status, booking.payment_owner) == (PROCESSING, "first")
+    booking.payment_lease_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert second._claim(booking.pnr)
+def test_payment_queued_by_two_processes_is_charged_once(db, make_flight):
+    booking = make_booking(db, make_flight(), "PAYTWICE1")
+    processor = CountingProcessor()
+    queues = [PaymentQueue(processor, 2, 10, 10, 0.05) for _ in range(2)]
+    for payment_queue in queues:
+        payment_queue.start()
+        assert payment_queue.submit(booking.pnr, 5000)
+    queues[0].wait(booking.pnr, 5)
+    for payment_queue in queues:
+        payment_queue.stop()
+    db.expire_all()
+    assert processor.charges == [booking.pnr]
+    assert (booking.status, booking.payment_owner) == ("PAID", None)
+def test_full_queue_restores_the_booking(db, make_flight, monkeypatch):
+    from backend import main
+    booking = make_booking(db, make_flight(), "PAYFULL01", status="CONFIRMED")
+    monkeypatch.setattr(main, "PAYMENT_QUEUE_ENABLED", True)
+    monkeypatch.setattr(main.payment_queue, "submit", lambda pnr, amount: False)
+    with pytest.raises(HTTPException) as error:
+        main.simulate_payment(booking.pnr, db, "pay-full")
+    assert error.value.status_code == 503 and error.value.headers["Retry-After"]
+    db.expire_all()
+    assert booking.status == "CONFIRMED"
+    assert main.idempotency_store.lookup(db, "payment", "pay-full", "") is None
+def test_payment_status_long_poll_does_not_hold_a_worker_thread(db, make_flight, monkeypatch):
+    import asyncio
+    from backend import main
+    booking = make_booking(db, make_flight(), "PAYPOLL01")
+    monkeypatch.setattr(main.payment_queue, "wait", None)
+    async def settle_later():
+        await asyncio.sleep(0.2)
+        booking.status = "PAID"
+        await asyncio.to_thread(db.commit)
+    async def poll():
+        settle = asyncio.create_task(settle_later())
+        result = await main.get_payment_status(booking.pnr, wait=5)
+        await settle
+        return result
+    assert asyncio.run(poll()) == {"pnr": booking.pnr, "status": "PAID"}
+    with pytest.raises(HTTPException):
+        asyncio.run(main.get_payment_status("NOPE00001", wait=0))
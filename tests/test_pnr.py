@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from backend.utils import PNR_ALPHABET,PNR_LENGTH,PnrAllocator,encode_pnr
+def test_two_allocators_hand_out_distinct_pnrs_across_blocks(schema):
+    # two API processes, refilling every third PNR so most calls cross a block boundary
+    first, second = PnrAllocator(block_size=3), PnrAllocator(block_size=3)
+    pnrs = []
+    for _ in range(10):
+        pnrs += [first.allocate(), second.allocate(), second.allocate()]
+    assert len(set(pnrs)) == len(pnrs)
+    assert all(len(pnr) == PNR_LENGTH and set(pnr) <= set(PNR_ALPHABET) for pnr in pnrs)
+def test_refill_after_another_allocator_skips_its_block(schema):
+    first, second = PnrAllocator(block_size=2), PnrAllocator(block_size=2)
+    first_block = [first.allocate(), first.allocate()]
+    second_block = [second.allocate(), second.allocate()]
+    # the first allocator's refill lands after the block the second one claimed
+    refill = [first.allocate(), first.allocate()]
+    assert len(set(first_block + second_block + refill)) == 6
+def test_concurrent_allocations_are_distinct(schema):
+    allocators = [PnrAllocator(block_size=5) for _ in range(2)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pnrs = list(pool.map(lambda i: allocators[i % 2].allocate(), range(200)))
+    assert len(set(pnrs)) == 200
+def test_encoding_is_a_bijection_on_nearby_sequences():
+    assert len({encode_pnr(i, b"key") for i in range(10000)}) == 10000
+def test_pnrs_differ_across_keys():
+    # a fresh database starts its sequence at 0, so only the key separates deployments
+    first = [encode_pnr(i, b"first-key") for i in range(1000)]
+    second = [encode_pnr(i, b"second-key") for i in range(1000)]
+    assert first == [encode_pnr(i, b"first-key") for i in range(1000)]
+    assert not set(first) & set(second)
+def test_allocator_uses_the_key_stored_by_migrate(db):
+    from backend.models import PnrBlock
+    from backend.utils import PNR_KEY_ROW
+    allocator = PnrAllocator(block_size=1)
+    pnr = allocator.allocate()
+    sequence = db.get(PnrBlock, "pnr").next_value - 1
+    assert pnr == encode_pnr(sequence, str(db.get(PnrBlock, PNR_KEY_ROW).next_value).encode())
@@ -0,0 +1,86 @@
+from datetime import datetime,timedelta
+from decimal import Decimal
+from backend.models import Flight
+from backend.price_snapshots import reprice_band_crossings
+def test_band_crossing_reprices_only_flights_that_crossed(db, make_flight):
+    now = datetime.now().replace(microsecond=0)
+    crossed = make_flight(departure_time=now + timedelta(hours=23))
+    steady = make_flight(departure_time=now + timedelta(hours=50))
+    for flight in (crossed, steady):
+        flight.current_price = Decimal("1.00")
+    db.commit()
+    rows = reprice_band_crossings(db, now - timedelta(hours=2), now)
+    db.commit()
+    db.expire_all()
+    assert [r.id for r in rows] == [crossed.id]
+    assert db.get(Flight, crossed.id).current_price == rows[0].current_price > 1
+    assert db.get(Flight, steady.id).current_price == Decimal("1.00")
+def test_booking_charges_the_listed_snapshot(make_flight):
+    from backend.main import build_booking
+    from backend.schemas import BookingRequest
+    flight = make_flight()
+    request = BookingRequest(flight_id=flight.id, passenger_name="Asha")
+    assert build_booking(flight, request, "PNR00001").price == float(flight.current_price)
+    assert build_booking(flight, request, "PNR00002", quoted_price=4321.0).price == 4321.0
+def test_band_crossing_skips_a_flight_booked_while_pricing(db, make_flight, monkeypatch):
+    from backend import price_snapshots
+    from backend.db import SessionLocal
+    now = datetime.now().replace(microsecond=0)
+    flight = make_flight(departure_time=now + timedelta(hours=23, minutes=30), seats_available=30)
+    compute = price_snapshots.compute_prices
+    def book_during_pricing(rows, path):
+        # a booking commits between the sweep's read and its write
+        other = SessionLocal()
+        booked = other.get(Flight, flight.id)
+        booked.seats_available = 29
+        booked.current_price = Decimal("7777.00")
+        other.commit()
+        other.close()
+        return compute(rows, path)
+    monkeypatch.setattr(price_snapshots, "compute_prices", book_during_pricing)
+    rows = reprice_band_crossings(db, now - timedelta(hours=1), now)
+    db.commit()
+    db.expire_all()
+    assert flight.id not in [r.id for r in rows]
+    assert (db.get(Flight, flight.id).seats_available, db.get(Flight, flight.id).current_price) == (29, Decimal("7777.00"))
+def test_group_booking_charges_every_passenger_the_listed_snapshot(make_flight):
+    from backend.main import build_group_bookings
+    from backend.schemas import GroupPassenger
+    flight = make_flight()
+    passengers = [GroupPassenger(passenger_name=f"P{i}") for i in range(6)]
+    bookings = build_group_bookings(flight, passengers, [f"GRP0000{i}" for i in range(6)], [f"1{c}" for c in "ABCDEF"])
+    assert {b.price for b in bookings} == {float(flight.current_price)}
+    flight.current_price = None
+    assert len({b.price for b in build_group_bookings(flight, passengers, [f"GRP1000{i}" for i in range(6)], ["1A"] * 6)}) == 1
+def test_band_crossing_commits_batch_by_batch(db, make_flight, monkeypatch):
+    from backend import price_snapshots
+    from backend.db import SessionLocal
+    # a window well past every other test's flights
+    since = datetime.now().replace(microsecond=0) + timedelta(days=60)
+    now = since + timedelta(hours=1)
+    first = make_flight(departure_time=now + timedelta(hours=24))
+    second = make_flight(departure_time=now + timedelta(hours=72))
+    for flight in (first, second):
+        flight.current_price = Decimal("1.00")
+    db.commit()
+    compute = price_snapshots.compute_prices
+    calls = []
+    def fail_second_batch(rows, path):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError("pricing failed")
+        return compute(rows, path)
+    monkeypatch.setattr(price_snapshots, "compute_prices", fail_second_batch)
+    try:
+        reprice_band_crossings(db, since, now, batch_size=1)
+    except RuntimeError:
+        db.rollback()
+    other = SessionLocal()
+    try:
+        assert other.get(Flight, first.id).current_price > 1
+        assert other.get(Flight, second.id).current_price == Decimal("1.00")
+    finally:
+        other.close()
+def test_band_sweep_has_a_departure_time_index():
+    indexes = {tuple(c.name for c in index.columns) for index in Flight.__table__.indexes}
+    assert ("departure_time",) in indexes
@@ -0,0 +1,58 @@
+from datetime import datetime,timedelta
+import pytest
+from fastapi import HTTPException
+from backend.models import PriceQuote
+from backend.quotes import QuoteStore
+def store(ttl_seconds=60) -> QuoteStore:
+    return QuoteStore(ttl_seconds=ttl_seconds)
+def rejection(quote_store, db, token, flight_id) -> str:
+    with pytest.raises(HTTPException) as error:
+        quote_store.claim(db, token, flight_id)
+    db.rollback()
+    assert error.value.status_code == 400
+    return error.value.detail
+def test_quote_is_redeemed_once(db, make_flight):
+    flight = make_flight()
+    quote_store = store()
+    token = quote_store.issue(db, flight.id, 4321.0).token
+    db.commit()
+    assert quote_store.claim(db, token, flight.id) == 4321.0
+    db.commit()
+    assert "already used" in rejection(quote_store, db, token, flight.id)
+def test_failed_booking_keeps_its_quote(db, make_flight):
+    flight = make_flight()
+    quote_store = store()
+    token = quote_store.issue(db, flight.id, 4321.0).token
+    db.commit()
+    assert quote_store.claim(db, token, flight.id) == 4321.0
+    # the booking's transaction rolls back, and the claim with it
+    db.rollback()
+    assert quote_store.claim(db, token, flight.id) == 4321.0
+    db.commit()
+def test_quote_issued_by_another_process_is_honoured(db, make_flight):
+    flight = make_flight()
+    token = store().issue(db, flight.id, 4321.0).token
+    db.commit()
+    assert store().claim(db, token, flight.id) == 4321.0
+    db.commit()
+def test_expired_unknown_and_mismatched_quotes_are_rejected(db, make_flight):
+    flight = make_flight()
+    quote_store = store()
+    token = quote_store.issue(db, flight.id, 4321.0).token
+    db.commit()
+    assert "different flight" in rejection(quote_store, db, token, flight.id + 1)
+    assert "Unknown" in rejection(quote_store, db, "not-a-quote", flight.id)
+    db.get(PriceQuote, token).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert "expired" in rejection(quote_store, db, token, flight.id)
+    assert quote_store.stats()["rejected"] == 3
+def test_booking_with_a_quote_charges_the_quoted_price(make_flight):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    client = TestClient(app)
+    flight = make_flight()
+    quote = client.post(f"/api/flights/{flight.id}/quote").json()
+    booking = {"flight_id": flight.id, "passenger_name": "Asha", "quote_token": quote["token"]}
+    response = client.post("/api/bookings", json=booking)
+    assert response.status_code == 200 and response.json()["price"] == quote["price"]
+    assert client.post("/api/bookings", json=booking).status_code == 400
@@ -0,0 +1,52 @@
+import os
+import tempfile
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from starlette.responses import Response
+from backend.db import LAST_WRITE_COOKIE,LAST_WRITE_HEADER,LAST_WRITE_MAX_AGE_HEADER,REPLICA_MAX_STALENESS_SECONDS,get_read_db,mark_write,wrote_recently
+from backend.migrate import migrate
+from backend.models import Booking
+def request_with(headers) -> Request:
+    return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+def test_last_write_stamp_is_sent_and_honoured_as_a_header():
+    response = Response()
+    mark_write(response)
+    stamp = response.headers[LAST_WRITE_HEADER]
+    assert LAST_WRITE_COOKIE in response.headers["set-cookie"]
+    assert float(response.headers[LAST_WRITE_MAX_AGE_HEADER]) == REPLICA_MAX_STALENESS_SECONDS
+    assert wrote_recently(request_with({LAST_WRITE_HEADER: stamp}))
+    assert not wrote_recently(request_with({LAST_WRITE_HEADER: "0"}))
+    assert not wrote_recently(request_with({}))
+def test_pnr_lookup_falls_back_to_the_primary(db, make_flight):
+    from backend.main import app
+    db.add(Booking(pnr="LAGGING01", flight_id=make_flight().id, passenger_name="Kiran", price=5000, status="CONFIRMED"))
+    db.commit()
+    # an empty database stands in for a replica that has not caught up yet
+    replica = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "replica.db"))
+    migrate(bind=replica)
+    ReplicaSession = sessionmaker(bind=replica)
+    def replica_db():
+        with ReplicaSession() as session:
+            yield session
+    app.dependency_overrides[get_read_db] = replica_db
+    try:
+        client = TestClient(app)
+        assert client.get("/api/bookings/LAGGING01").json()["passenger_name"] == "Kiran"
+        assert client.get("/api/bookings/MISSING01").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_read_db)
+        replica.dispose()
+def test_async_reads_follow_the_replica_rules(monkeypatch):
+    import backend.db as db_module
+    primary, replica = object(), object()
+    monkeypatch.setattr(db_module, "AsyncSessionLocal", primary)
+    monkeypatch.setattr(db_module, "_next_async_replica", lambda: replica)
+    assert db_module.async_read_session_factory(request_with({})) is replica
+    assert db_module.async_read_session_factory(request_with({db_module.PRIMARY_READ_HEADER: "1"})) is primary
+    response = Response()
+    mark_write(response)
+    assert db_module.async_read_session_factory(request_with({LAST_WRITE_HEADER: response.headers[LAST_WRITE_HEADER]})) is primary
+    monkeypatch.setattr(db_module, "_next_async_replica", None)
+    assert db_module.async_read_session_factory(request_with({})) is primary
@@ -0,0 +1,40 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from backend.db import SessionLocal
+from backend.main import reserve_seats_atomic
+from backend.models import Flight
+def sell_elsewhere(flight_id: int, seats_available: int):
+    # another worker sells seats after this session loaded the flight
+    with SessionLocal() as other:
+        other.execute(update(Flight).where(Flight.id == flight_id).values(seats_available=seats_available))
+        other.commit()
+@pytest.fixture(params=[True, False], ids=["returning", "rowcount"])
+def update_returning(request, db, monkeypatch):
+    monkeypatch.setattr(db.get_bind().dialect, "update_returning", request.param)
+    return request.param
+def test_reserve_takes_several_seats(db, make_flight, update_returning):
+    flight = make_flight(seats_available=5)
+    assert reserve_seats_atomic(db, flight.id, 3).seats_available == 2
+    db.commit()
+    db.expire_all()
+    assert db.get(Flight, flight.id).seats_available == 2
+def test_reserve_refuses_a_flight_sold_out_since_it_was_loaded(db, make_flight, update_returning):
+    flight = make_flight(seats_available=1)
+    sell_elsewhere(flight.id, 0)
+    # the stale copy still shows a seat, so only the conditional UPDATE can refuse
+    assert db.get(Flight, flight.id).seats_available == 1
+    with pytest.raises(HTTPException) as refused:
+        reserve_seats_atomic(db, flight.id, 1)
+    assert (refused.value.status_code, refused.value.detail) == (400, "No seats available")
+def test_reserve_refuses_more_seats_than_are_left(db, make_flight, update_returning):
+    flight = make_flight(seats_available=5)
+    sell_elsewhere(flight.id, 2)
+    with pytest.raises(HTTPException) as refused:
+        reserve_seats_atomic(db, flight.id, 3)
+    assert (refused.value.status_code, refused.value.detail) == (400, "Not enough seats available")
+    db.rollback()
+    db.expire_all()
+    # a refused group takes nothing
+    assert db.get(Flight, flight.id).seats_available == 2
+    assert reserve_seats_atomic(db, flight.id, 2).seats_available == 0
@@ -0,0 +1,95 @@
+import json
+from datetime import date,datetime,timedelta
+from backend.flight_index import FlightRow
+from backend.route_graph import RouteGraph
+TRAVEL_DATE = date(2026, 11, 2)
+def leg(flight_id, origin, destination, departs, minutes, seats_available=10) -> FlightRow:
+    departure = datetime.combine(TRAVEL_DATE, datetime.strptime(departs, "%H:%M").time())
+    return FlightRow(flight_id, f"T{flight_id}", "IndiGo", origin, destination, departure, departure + timedelta(minutes=minutes), minutes, 5000, 120, seats_available)
+def network() -> RouteGraph:
+    graph = RouteGraph()
+    graph.built = True
+    graph.apply([
+        leg(1, "Mumbai", "Bengaluru", "09:00", 120),
+        leg(2, "Mumbai", "Bengaluru", "14:00", 120),
+        leg(3, "Mumbai", "Delhi", "08:00", 120),
+        leg(4, "Delhi", "Bengaluru", "11:00", 150),
+        # 20 minutes after leg 3 lands
+        leg(5, "Delhi", "Bengaluru", "10:20", 150),
+        # 7 hours after leg 3 lands, 4.5 hours after leg 9
+        leg(6, "Delhi", "Bengaluru", "17:00", 150),
+        leg(7, "Mumbai", "Hyderabad", "08:00", 90),
+        leg(9, "Hyderabad", "Delhi", "10:30", 120),
+        # back to Mumbai in time for leg 2
+        leg(10, "Delhi", "Mumbai", "11:00", 120),])
+    return graph
+def search(graph, max_stops, min_minutes=45, max_minutes=360):
+    found = graph.itineraries("Mumbai", "Bengaluru", TRAVEL_DATE, max_stops, timedelta(minutes=min_minutes), timedelta(minutes=max_minutes))
+    return sorted(tuple(r.id for r in path) for path in found)
+def test_max_stops_bounds_the_connections():
+    graph = network()
+    assert search(graph, 0) == [(1,), (2,)]
+    assert search(graph, 1) == [(1,), (2,), (3, 4)]
+    assert search(graph, 2) == [(1,), (2,), (3, 4), (7, 9, 6)]
+def test_layovers_outside_the_window_are_skipped():
+    graph = network()
+    assert (3, 5) not in search(graph, 1) and (3, 6) not in search(graph, 1)
+    assert (3, 5) in search(graph, 1, min_minutes=15)
+    assert (3, 6) in search(graph, 1, max_minutes=480)
+def test_paths_never_revisit_an_airport():
+    # Mumbai -> Delhi -> Mumbai -> Bengaluru fits every layover window
+    assert (3, 10, 2) not in search(network(), 3)
+def test_seat_changes_leave_the_graph_alone():
+    # sold-out legs are dropped by the caller, which re-reads seats
+    graph = network()
+    graph.apply([leg(1, "Mumbai", "Bengaluru", "09:00", 120, seats_available=0)])
+    assert (1,) in search(graph, 0)
+def connections(graph, monkeypatch, db, origin, destination, travel_date, **params):
+    from backend import main
+    monkeypatch.setattr(main, "route_graph", graph)
+    query = {"max_stops": 1, "min_layover_minutes": 45, "max_layover_minutes": 360, "sort_by": "price", "limit": 50, **params}
+    response = main.search_connections(origin=origin, destination=destination, travel_date=travel_date, db=db, **query)
+    return json.loads(response.body) if hasattr(response, "body") else response
+def test_legs_are_re_read_for_seats_price_and_schedule(db, make_flight, monkeypatch):
+    from decimal import Decimal
+    from backend.models import Flight
+    day = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0) + timedelta(days=90)
+    direct = make_flight(origin="Kochi", destination="Indore", departure_time=day, arrival_time=day + timedelta(hours=3))
+    first = make_flight(origin="Kochi", destination="Nagpur", departure_time=day, arrival_time=day + timedelta(hours=2))
+    second = make_flight(origin="Nagpur", destination="Indore", departure_time=day + timedelta(hours=3), arrival_time=day + timedelta(hours=4))
+    graph = RouteGraph()
+    graph.built = True
+    graph.apply([direct, first, second])
+    assert len(connections(graph, monkeypatch, db, "kochi", "indore", day.date())) == 2
+    # another worker sells out a leg and reprices the direct flight; this graph never hears of it
+    db.get(Flight, second.id).seats_available = 0
+    db.get(Flight, direct.id).current_price = Decimal("4321.00")
+    db.commit()
+    body = connections(graph, monkeypatch, db, "kochi", "indore", day.date())
+    assert [[l["id"] for l in i["legs"]] for i in body] == [[direct.id]]
+    assert body[0]["total_price"] == 4321.0
+    # a leg rescheduled since the graph last saw it is dropped rather than shown at the old time
+    db.get(Flight, second.id).seats_available = 10
+    db.get(Flight, second.id).departure_time = day + timedelta(hours=5)
+    db.commit()
+    body = connections(graph, monkeypatch, db, "kochi", "indore", day.date())
+    assert [[l["id"] for l in i["legs"]] for i in body] == [[direct.id]]
+def test_cheapest_itinerary_past_the_limit_is_returned(db, monkeypatch):
+    from backend.models import Flight
+    from backend.route_graph import MAX_ITINERARIES
+    day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=95)
+    # more direct flights than any limit, the cheapest departing last
+    count = MAX_ITINERARIES + 20
+    flights = [
+        Flight(flight_no=f"AB{i}", airline_name="IndiGo", origin="Agra", destination="Bhopal", departure_time=day + timedelta(minutes=6 * i),
+               arrival_time=day + timedelta(minutes=6 * i + 90), duration_minutes=90, base_fare=5000, total_seats=120, seats_available=120,
+               current_price=9000 - i, priced_at=datetime.utcnow())
+        for i in range(1, count + 1)]
+    db.add_all(flights)
+    db.commit()
+    graph = RouteGraph()
+    graph.built = True
+    graph.apply(flights)
+    assert len(graph.itineraries("Agra", "Bhopal", day.date(), 0, timedelta(minutes=45), timedelta(minutes=360))) == count
+    body = connections(graph, monkeypatch, db, "agra", "bhopal", day.date(), max_stops=0, limit=3)
+    assert [itinerary["legs"][0]["id"] for itinerary in body] == [f.id for f in flights[::-1][:3]]
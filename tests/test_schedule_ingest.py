@@ -0,0 +1,98 @@
+import json
+from datetime import datetime,timedelta
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import select
+from backend.generations import read_generation
+from backend.models import Flight
+from backend.schedule_ingest import ingest_feed,iter_feed_json,iter_ndjson,upsert_flights
+from backend.schemas import ScheduleFlightIn
+def feed_row(flight, **overrides) -> ScheduleFlightIn:
+    values = {name: getattr(flight, name) for name in ScheduleFlightIn.model_fields}
+    return ScheduleFlightIn(**{**values, **overrides})
+def test_reingest_keeps_booked_seats(db, make_flight):
+    flight = make_flight(seats_available=100)
+    generation = read_generation(db)
+    assert upsert_flights(db, [feed_row(flight, seats_available=120, base_fare=6000)]) == (0, 1)
+    db.expire_all()
+    assert db.get(Flight, flight.id).seats_available == 100
+    assert float(db.get(Flight, flight.id).base_fare) == 6000
+    assert read_generation(db) == generation + 1
+def test_reingest_moves_seats_by_capacity_change(db, make_flight):
+    grown = make_flight(seats_available=100)
+    shrunk = make_flight(seats_available=10)
+    upsert_flights(db, [feed_row(grown, total_seats=150, seats_available=150), feed_row(shrunk, total_seats=100, seats_available=100)])
+    db.expire_all()
+    assert db.get(Flight, grown.id).seats_available == 130
+    assert db.get(Flight, shrunk.id).seats_available == 0
+    assert db.get(Flight, shrunk.id).total_seats == 100
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+FEED_FLIGHTS = [
+    {"flight_no": "AB1", "airline_name": "Air \"Quoted\" \\ Co", "origin": "Mumbai", "destination": "Delhi", "base_fare": 4999.5, "total_seats": 180},
+    {"flight_no": "AB2", "airline_name": "Café Air ✈", "origin": "Pune", "destination": "Goa", "base_fare": 12, "total_seats": 1200000},
+    {"flight_no": "AB3", "airline_name": "", "origin": "a\nb", "destination": "x/y", "base_fare": 1e3, "total_seats": 0},]
+def test_json_feed_parses_across_every_chunk_boundary():
+    text = json.dumps({"provider": "mock", "flights": FEED_FLIGHTS, "generated_at": "2026-11-02T00:00:00Z"}, indent=1)
+    # ensure_ascii escapes (\\u00e9, \\") land on every possible boundary at one of these sizes
+    assert "\\u00e9" in text and '\\"' in text
+    for size in range(1, 17):
+        assert list(iter_feed_json(chunked(text, size))) == FEED_FLIGHTS
+    raw = json.dumps({"flights": FEED_FLIGHTS}, ensure_ascii=False)
+    assert list(iter_feed_json(chunked(raw, 3))) == FEED_FLIGHTS
+    assert list(iter_feed_json(["{}"])) == [] and list(iter_feed_json(['{"flights": []}'])) == []
+def test_ndjson_feed_skips_blank_lines_and_handles_a_missing_final_newline():
+    text = "\r\n".join(json.dumps(f) for f in FEED_FLIGHTS[:2]) + "\n\n  \n" + json.dumps(FEED_FLIGHTS[2])
+    for size in (1, 5, 64):
+        assert list(iter_ndjson(chunked(text, size))) == FEED_FLIGHTS
+@pytest.mark.parametrize("text", [
+    '{"flights": [{"flight_no": "AB1"}',
+    '{"flights": [{"flight_no": "AB1"} {"flight_no": "AB2"}]}',
+    '{"flights": [{"flight_no": "AB1\\',
+    '["flights"]',
+    '{"flights": [tru]}',
+    '',])
+def test_malformed_json_feed_raises(text):
+    with pytest.raises(ValueError):
+        list(iter_feed_json(chunked(text, 4)))
+def test_malformed_ndjson_line_raises():
+    with pytest.raises(ValueError):
+        list(iter_ndjson(['{"flight_no": "AB1"}\n{"flight_no": ', '\n']))
+def feed_record(flight_no, departure, **overrides) -> dict:
+    return {
+        "flight_no": flight_no,
+        "airline_name": "IndiGo",
+        "origin": " nashik ",
+        "destination": "BHOPAL",
+        "departure_time": departure.strftime("%Y-%m-%d %H:%M:%S"),
+        "arrival_time": (departure + timedelta(minutes=90)).strftime("%Y-%m-%d %H:%M:%S"),
+        "duration_minutes": 90,
+        "base_fare": 4000.0,
+        "total_seats": 120,
+        "seats_available": 120,
+        **overrides,
+    }
+def test_ingest_feed_inserts_then_updates_and_rejects_invalid_rows(db):
+    departure = datetime.now().replace(microsecond=0) + timedelta(days=30)
+    records = [feed_record("IN1", departure), feed_record("IN2", departure)]
+    invalid = [
+        feed_record("IN3", departure, seats_available=121),
+        feed_record("IN4", departure, arrival_time=departure.strftime("%Y-%m-%d %H:%M:%S")),]
+    feed = json.dumps({"provider": "mock", "flights": records + invalid})
+    report = ingest_feed(chunked(feed, 7), batch_size=1)
+    assert (report["rows"], report["inserted"], report["updated"], report["rejected"]) == (4, 2, 0, 2)
+    stored = db.scalars(select(Flight).where(Flight.flight_no.in_(["IN1", "IN2", "IN3", "IN4"])).where(Flight.departure_time == departure)).all()
+    assert sorted(f.flight_no for f in stored) == ["IN1", "IN2"]
+    assert {(f.origin, f.destination) for f in stored} == {("Nashik", "Bhopal")}
+    # the same flights again, as NDJSON, update in place
+    feed = "\n".join(json.dumps(feed_record(r["flight_no"], departure, base_fare=4500.0)) for r in records)
+    report = ingest_feed(chunked(feed, 5), ndjson=True)
+    assert (report["inserted"], report["updated"], report["rejected"]) == (0, 2, 0)
+    db.expire_all()
+    assert [float(f.base_fare) for f in db.scalars(select(Flight).where(Flight.departure_time == departure).where(Flight.origin == "Nashik"))] == [4500.0, 4500.0]
+def test_schedule_rows_are_validated():
+    departure = datetime(2026, 11, 2, 9, 0)
+    with pytest.raises(ValidationError, match="total_seats"):
+        ScheduleFlightIn.model_validate(feed_record("V1", departure, seats_available=121))
+    with pytest.raises(ValidationError, match="departure_time"):
+        ScheduleFlightIn.model_validate(feed_record("V1", departure, arrival_time="2026-11-02 08:00:00"))
@@ -0,0 +1,94 @@
+import random
+from datetime import date
+import backend.search_cache as search_cache_module
+from backend.search_cache import SearchCache,search_cache
+def key(day, origin="Mumbai", destination="Delhi"):
+    return (origin, destination, day, "price", "asc")
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(search_cache_module.time, "monotonic", lambda: now[0])
+    cache = SearchCache(max_entries=4, ttl_seconds=30)
+    cache.put(key(date(2026, 11, 2)), b"[]", cache.generation(key(date(2026, 11, 2))))
+    now[0] += 29
+    assert cache.get(key(date(2026, 11, 2))) == b"[]"
+    now[0] += 1
+    assert cache.get(key(date(2026, 11, 2))) is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchCache(max_entries=2, ttl_seconds=30)
+    first, second, third = (key(date(2026, 11, day)) for day in (1, 2, 3))
+    cache.put(first, b"1", cache.generation(first))
+    cache.put(second, b"2", cache.generation(second))
+    # reading the first entry makes the second the least recently used
+    assert cache.get(first) == b"1"
+    cache.put(third, b"3", cache.generation(third))
+    assert cache.get(second) is None
+    assert cache.get(first) == b"1" and cache.get(third) == b"3"
+    assert cache.stats()["evictions"] == 1
+    # the evicted key no longer counts against its route/day
+    cache.invalidate([second[:3]])
+    assert cache.stats()["invalidations"] == 0
+def test_put_after_an_invalidation_is_skipped():
+    cache = SearchCache(max_entries=4, ttl_seconds=30)
+    route_day, other = key(date(2026, 11, 2)), key(date(2026, 11, 3))
+    # a search reads flights, a booking commits and invalidates, then the search stores what it read
+    generation, other_generation = cache.generation(route_day), cache.generation(other)
+    cache.invalidate([route_day[:3]])
+    cache.put(route_day, b"stale", generation)
+    cache.put(other, b"fresh", other_generation)
+    assert cache.get(route_day) is None
+    assert cache.get(other) == b"fresh"
+    assert cache.stats()["stale_puts"] == 1
+    # a clear overtakes every read in flight
+    generation = cache.generation(route_day)
+    cache.clear()
+    cache.put(route_day, b"stale", generation)
+    assert cache.get(route_day) is None
+    cache.put(route_day, b"fresh", cache.generation(route_day))
+    assert cache.get(route_day) == b"fresh"
+def test_search_racing_a_booking_does_not_cache_its_read(make_flight, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend import main
+    client = TestClient(main.app)
+    flight = make_flight(origin="Pune", destination="Goa")
+    cache_key = key(flight.departure_time.date(), flight.origin, flight.destination)
+    real_search_response = main.search_response
+    def book_before_storing(flights, cache_key, generation):
+        # the booking commits after the search read its flights
+        assert client.post("/api/bookings", json={"flight_id": flight.id, "passenger_name": "Ravi"}).status_code == 200
+        return real_search_response(flights, cache_key, generation)
+    monkeypatch.setattr(main, "search_response", book_before_storing)
+    params = {"origin": flight.origin, "destination": flight.destination, "travel_date": str(cache_key[2])}
+    assert client.get("/api/flights/search", params=params).status_code == 200
+    assert search_cache.get(cache_key) is None
+def cached_search(client, flight):
+    cache_key = key(flight.departure_time.date(), flight.origin, flight.destination)
+    response = client.get("/api/flights/search", params={"origin": flight.origin, "destination": flight.destination, "travel_date": str(cache_key[2])})
+    assert response.status_code == 200
+    assert search_cache.get(cache_key) is not None
+    return cache_key, next(f for f in response.json() if f["id"] == flight.id)
+def test_booking_and_cancellation_evict_their_route_day(make_flight):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    client = TestClient(app)
+    flight, other = make_flight(origin="Pune", destination="Kochi"), make_flight(origin="Pune", destination="Jaipur")
+    cache_key, listed = cached_search(client, flight)
+    other_key, _ = cached_search(client, other)
+    pnr = client.post("/api/bookings", json={"flight_id": flight.id, "passenger_name": "Meera"}).json()["pnr"]
+    assert search_cache.get(cache_key) is None
+    assert search_cache.get(other_key) is not None
+    _, booked = cached_search(client, flight)
+    assert booked["seats_available"] == listed["seats_available"] - 1
+    assert client.delete(f"/api/bookings/{pnr}").status_code == 200
+    assert search_cache.get(cache_key) is None
+    _, cancelled = cached_search(client, flight)
+    assert cancelled["seats_available"] == listed["seats_available"]
+def test_simulator_tick_evicts_the_route_days_it_touched(make_flight):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.simulator import run_market_step
+    flight = make_flight(origin="Pune", destination="Chennai")
+    cache_key, _ = cached_search(TestClient(app), flight)
+    # a sample as large as the fleet touches every flight
+    assert run_market_step(sample_size=10 ** 6, rng=random.Random(1)) > 0
+    assert search_cache.get(cache_key) is None
@@ -0,0 +1,82 @@
+from backend.models import SeatMap
+from backend.seat_map import SEAT_MAP_CACHE_TTL_SECONDS,SeatInventory
+def committed(db, inventory, state):
+    db.commit()
+    inventory.remember(state)
+    return state
+def stored_bits(db, flight) -> int:
+    db.expire_all()
+    return int.from_bytes(db.get(SeatMap, flight.id).occupied, "little")
+def test_release_through_a_stale_cache_reaches_the_row(db, make_flight):
+    flight = make_flight()
+    # two API processes, each with its own cache
+    first, second = SeatInventory(SEAT_MAP_CACHE_TTL_SECONDS), SeatInventory(SEAT_MAP_CACHE_TTL_SECONDS)
+    seats, state = second.claim(db, flight, ["1A"])
+    committed(db, second, state)
+    seats, state = first.claim(db, flight, ["1B"])
+    committed(db, first, state)
+    assert stored_bits(db, flight) == 0b11
+    # the second cache still shows only 1A taken
+    committed(db, second, second.release(db, flight, ["1B"]))
+    assert stored_bits(db, flight) == 0b01
+    # and the first cache still shows 1B taken
+    seats, state = first.claim(db, flight, ["1B"])
+    committed(db, first, state)
+    assert seats == ["1B"]
+    assert stored_bits(db, flight) == 0b11
+def test_blank_seat_numbers_are_auto_assigned(make_flight):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    client = TestClient(app)
+    flight = make_flight()
+    for seat_no in ("", "   "):
+        response = client.post("/api/bookings", json={"flight_id": flight.id, "passenger_name": "Isha", "seat_no": seat_no})
+        assert response.status_code == 200
+    assert response.json()["seat_no"] == "1B"
+    group = client.post("/api/bookings/group", json={"flight_id": flight.id, "passengers": [
+        {"passenger_name": "Dev", "seat_no": ""}, {"passenger_name": "Anu", "seat_no": "1C"}]})
+    assert [b["seat_no"] for b in group.json()] == ["1D", "1C"]
+def test_simulator_never_raises_seats_past_the_seat_map(db, make_flight):
+    from datetime import datetime
+    from backend.simulator import write_market_rows
+    flight = make_flight(total_seats=12, seats_available=10)
+    inventory = SeatInventory(SEAT_MAP_CACHE_TTL_SECONDS)
+    committed(db, inventory, inventory.claim(db, flight, ["1A", "1B", "1C"])[1])
+    rows = write_market_rows(db, [flight.id], [5], [None], datetime.utcnow())
+    db.commit()
+    db.refresh(flight)
+    assert flight.seats_available == rows[0].seats_available == 9
+def test_ingest_resize_carries_over_to_the_seat_map(db, make_flight):
+    from backend.schedule_ingest import upsert_flights
+    from backend.schemas import ScheduleFlightIn
+    flight = make_flight(total_seats=12, seats_available=12)
+    inventory = SeatInventory(SEAT_MAP_CACHE_TTL_SECONDS)
+    committed(db, inventory, inventory.claim(db, flight, ["1A", "2F"])[1])
+    feed = ScheduleFlightIn(**{**{name: getattr(flight, name) for name in ScheduleFlightIn.model_fields}, "total_seats": 6, "seats_available": 6})
+    upsert_flights(db, [feed])
+    db.refresh(flight)
+    seat_map = db.get(SeatMap, flight.id)
+    assert (seat_map.total_seats, seat_map.version) == (6, 2)
+    assert stored_bits(db, flight) == 0b1
+    # 12 free seats shrink by 6 to 6, then to the 5 the resized map can still assign
+    assert flight.seats_available == 5
+    # the stale cached map is refused by version and reloaded
+    seats, state = inventory.claim(db, flight, [None])
+    assert seats == ["1B"] and state.total_seats == 6
+def test_seat_map_free_seats_match_the_flight_counter(db, make_flight):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.models import Booking
+    client = TestClient(app)
+    # two bookings from before seat maps, one without a seat and one with a free-form seat number
+    flight = make_flight(total_seats=12, seats_available=10)
+    db.add_all([
+        Booking(pnr=f"OLD{flight.id}A", flight_id=flight.id, passenger_name="Kiran", seat_no=None, price=5000, status="CONFIRMED"),
+        Booking(pnr=f"OLD{flight.id}B", flight_id=flight.id, passenger_name="Lata", seat_no="W1", price=5000, status="CONFIRMED"),])
+    db.commit()
+    seat_map = client.get(f"/api/flights/{flight.id}/seats").json()
+    assert seat_map["seats_free"] == 10
+    assert client.post("/api/bookings", json={"flight_id": flight.id, "passenger_name": "Mira"}).status_code == 200
+    db.refresh(flight)
+    seat_map = client.get(f"/api/flights/{flight.id}/seats").json()
+    assert seat_map["seats_free"] == flight.seats_available == 9
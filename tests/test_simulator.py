@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from backend import simulator
+from backend.db import SessionLocal
+from backend.models import FareHistory,Flight
+from backend.simulator import run_shard_step,shard_ranges,write_market_rows
+def test_market_nudge_is_relative_to_committed_seats(db, make_flight):
+    flight = make_flight(seats_available=10)
+    # a booking commits after the simulator sampled the flight at 10 seats
+    other = SessionLocal()
+    other.get(Flight, flight.id).seats_available = 7
+    other.commit()
+    other.close()
+    rows = write_market_rows(db, [flight.id], [2], [None], flight.departure_time)
+    db.commit()
+    db.expire_all()
+    assert rows[0].seats_available == 9
+    assert db.get(Flight, flight.id).seats_available == 9
+    assert db.query(FareHistory).filter(FareHistory.flight_id == flight.id).one().seats_available == 9
+def test_market_nudge_is_clamped(db, make_flight):
+    low = make_flight(seats_available=2)
+    high = make_flight(seats_available=118)
+    write_market_rows(db, [high.id, low.id], [5, -5], [None, None], low.departure_time)
+    db.commit()
+    db.expire_all()
+    assert db.get(Flight, low.id).seats_available == 0
+    assert db.get(Flight, high.id).seats_available == 120
+def test_shard_ranges_split_the_ids_without_gaps_or_overlap():
+    for low, high, shards in ((1, 10, 3), (5, 5, 4), (1, 1000, 8)):
+        ranges = shard_ranges(low, high, shards)
+        assert len(ranges) == shards
+        ids = [i for start, end in ranges for i in range(start, end)]
+        assert ids == list(range(low, high + 1))
+def test_shard_step_only_touches_its_id_range(db, make_flight):
+    inside, outside = make_flight(seats_available=60), make_flight(seats_available=60)
+    touched, _, rows = run_shard_step(0, (inside.id, inside.id + 1), 7, 0, 1.0, inside.departure_time, True)
+    assert touched == 1 and [r.id for r in rows] == [inside.id]
+    db.expire_all()
+    assert db.query(FareHistory).filter(FareHistory.flight_id == outside.id).count() == 0
+def test_failed_tick_still_advances_the_seed(monkeypatch):
+    def fail():
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(simulator, "sync_read_models", fail)
+    monkeypatch.setitem(simulator.simulator_stats, "ticks", 3)
+    monkeypatch.setitem(simulator.simulator_stats, "errors", 0)
+    asyncio.run(simulator.simulate_market_step())
+    assert simulator.simulator_stats["ticks"] == 4 and simulator.simulator_stats["errors"] == 1
+def test_shard_pool_is_shut_down():
+    pool = simulator.shard_pool(1)
+    simulator.shutdown_shard_pool()
+    assert simulator._shard_pool is None
+    with pytest.raises(RuntimeError):
+        pool.submit(int)